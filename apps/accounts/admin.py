@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User
+from .models import User, IdempotencyKey
 
 class UserAdmin(BaseUserAdmin):
     model = User
@@ -23,3 +23,11 @@ class UserAdmin(BaseUserAdmin):
 
 admin.site.register(User, UserAdmin)
 
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ('scope', 'key', 'user', 'status', 'response_status', 'created_at', 'expires_at')
+    list_filter = ('scope', 'status')
+    search_fields = ('key', 'user__username')
+    readonly_fields = ('request_hash', 'response_body', 'created_at')
@@ -0,0 +1,150 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from .models import IdempotencyKey
+
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+
+def _ttl():
+    return getattr(settings, 'IDEMPOTENCY_KEY_TTL', timedelta(hours=24))
+
+
+def _in_progress_timeout():
+    return getattr(settings, 'IDEMPOTENCY_IN_PROGRESS_TIMEOUT', timedelta(minutes=5))
+
+
+def request_fingerprint(request):
+    """SHA-256 of the request path and body, used to detect reuse of a key"""
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    payload = json.dumps({'path': request.path, 'data': data}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def claim_key(user, scope, key, request_hash):
+    """
+    Claim an idempotency key for a new request.
+
+    The happy path is a single INSERT against the (user, scope, key)
+    unique index; only a conflicting insert probes the existing row.
+    Expired keys, and in-progress keys abandoned by a crashed worker,
+    are taken over with a conditional UPDATE so only one retry wins.
+
+    Returns:
+        (claimed record, None) or (None, existing record)
+    """
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            record = IdempotencyKey.objects.create(
+                user=user,
+                scope=scope,
+                key=key,
+                request_hash=request_hash,
+                expires_at=now + _ttl()
+            )
+            return record, None
+    except IntegrityError:
+        pass
+
+    existing = IdempotencyKey.objects.filter(user=user, scope=scope, key=key).first()
+    if existing is None:
+        # Purged between the insert and the probe; treat as in flight
+        return None, IdempotencyKey(request_hash=request_hash, status=IdempotencyKey.Status.IN_PROGRESS)
+
+    abandoned = (
+        existing.status == IdempotencyKey.Status.IN_PROGRESS and
+        existing.created_at <= now - _in_progress_timeout()
+    )
+    if existing.expires_at <= now or abandoned:
+        taken = IdempotencyKey.objects.filter(pk=existing.pk, created_at=existing.created_at).update(
+            request_hash=request_hash,
+            status=IdempotencyKey.Status.IN_PROGRESS,
+            response_status=None,
+            response_body=None,
+            created_at=now,
+            expires_at=now + _ttl()
+        )
+        if taken:
+            existing.refresh_from_db()
+            return existing, None
+
+    return None, existing
+
+
+def idempotent(scope):
+    """
+    Make a viewset POST handler honour the Idempotency-Key header.
+
+    Requests without the header run unchanged. With it, the first request
+    runs the handler and stores its response in the same transaction;
+    retries with the same key and body within the TTL replay that
+    response, concurrent duplicates get 409 and reuse of a key with a
+    different body gets 422. Server errors release the key.
+
+    Args:
+        scope: Endpoint name the keys are namespaced by, e.g. 'payments.create'
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return view_method(self, request, *args, **kwargs)
+
+            if len(key) > MAX_KEY_LENGTH:
+                return Response(
+                    {'error': f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            request_hash = request_fingerprint(request)
+            record, existing = claim_key(request.user, scope, key, request_hash)
+
+            if existing is not None:
+                if existing.request_hash != request_hash:
+                    return Response(
+                        {'error': f'{IDEMPOTENCY_HEADER} was already used for a different request'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                    )
+                if existing.status == IdempotencyKey.Status.IN_PROGRESS:
+                    return Response(
+                        {'error': 'A request with this Idempotency-Key is still being processed'},
+                        status=status.HTTP_409_CONFLICT,
+                        headers={'Retry-After': '1'}
+                    )
+                return Response(
+                    existing.response_body,
+                    status=existing.response_status,
+                    headers={REPLAYED_HEADER: 'true'}
+                )
+
+            try:
+                with transaction.atomic():
+                    response = view_method(self, request, *args, **kwargs)
+                    if response.status_code < 500:
+                        record.status = IdempotencyKey.Status.COMPLETED
+                        record.response_status = response.status_code
+                        record.response_body = getattr(response, 'data', None)
+                        record.save(update_fields=['status', 'response_status', 'response_body'])
+            except Exception:
+                record.delete()
+                raise
+
+            if response.status_code >= 500:
+                record.delete()
+            return response
+
+        return wrapper
+    return decorator
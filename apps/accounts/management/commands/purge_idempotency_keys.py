@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from apps.accounts.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Delete idempotency keys whose replay window has expired"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Maximum keys per DELETE")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        deleted = 0
+        while True:
+            ids = list(
+                IdempotencyKey.objects.filter(expires_at__lte=now)
+                .values_list('id', flat=True)[:options['batch_size']]
+            )
+            if not ids:
+                break
+            deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f"Purged {deleted} expired idempotency keys"))
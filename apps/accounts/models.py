@@ -1,4 +1,5 @@
 from django.contrib.auth.models import AbstractUser
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
@@ -53,4 +54,36 @@ class User(AbstractUser):
         }
         
         user_permissions = permission_map.get(self.role, [])
-        return 'all' in user_permissions or permission in user_permissions
\ No newline at end of file
+        return 'all' in user_permissions or permission in user_permissions
+
+class IdempotencyKey(models.Model):
+    """
+    Client-supplied Idempotency-Key for a money-moving POST.
+    
+    The first request claims the key; retries within the TTL replay the
+    stored response instead of repeating the operation.
+    """
+    
+    class Status(models.TextChoices):
+        IN_PROGRESS = 'in_progress', _('In Progress')
+        COMPLETED = 'completed', _('Completed')
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    scope = models.CharField(max_length=50, help_text=_("Endpoint the key was used on, e.g. 'payments.create'"))
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.IN_PROGRESS)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    
+    class Meta:
+        db_table = 'idempotency_keys'
+        unique_together = ['user', 'scope', 'key']
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.scope} {self.key} ({self.get_status_display()})"
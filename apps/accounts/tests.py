@@ -1,3 +1,153 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework import viewsets
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from apps.academic.models import AcademicYear, Class, Enrollment
+from apps.finance.models import FeeStructure, Payment
+from apps.finance.services import InvoiceService
+from apps.students.models import Student
+from .idempotency import idempotent
+from .models import IdempotencyKey
 
-# Create your tests here.
+User = get_user_model()
+
+
+class FlakyViewSet(viewsets.ViewSet):
+    """Counts calls and answers with the status code in the request body"""
+
+    calls = 0
+
+    @idempotent('tests.flaky')
+    def create(self, request):
+        FlakyViewSet.calls += 1
+        if request.data.get('raise'):
+            raise RuntimeError("handler failed")
+        return Response({'call': FlakyViewSet.calls}, status=int(request.data['status']))
+
+
+class IdempotencyTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='password', role='admin'
+        )
+        academic_year = AcademicYear.objects.create(
+            year_name='2024/2025', start_date=date(2024, 9, 1), end_date=date(2025, 7, 31), is_current=True
+        )
+        class_obj = Class.objects.create(class_name='Grade 1', grade_level=1, academic_year=academic_year)
+        student = Student.objects.create(
+            admission_number='ADM0001', first_name='Student', last_name='Test',
+            date_of_birth=date(2012, 1, 1), gender='male', admission_date=date(2024, 9, 1)
+        )
+        Enrollment.objects.create(student=student, class_obj=class_obj, roll_number=1)
+        FeeStructure.objects.create(academic_year=academic_year, category_name='Tuition', amount=Decimal('500.00'))
+        cls.invoice = InvoiceService().generate_invoice_for_student(student.id, academic_year.id, '1', cls.admin)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.body = {'invoice_id': self.invoice.id, 'amount_paid': '100.00', 'payment_method': 'cash'}
+
+    def pay(self, key=None, **changes):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        return self.client.post('/payments/', {**self.body, **changes}, format='json', **headers)
+
+    def claim_by_another_request(self, key):
+        """Leave the key claimed by a request that has not finished yet"""
+        self.pay(key)
+        Payment.objects.all().delete()
+        record = IdempotencyKey.objects.get(key=key)
+        IdempotencyKey.objects.filter(pk=record.pk).update(
+            status=IdempotencyKey.Status.IN_PROGRESS, response_status=None, response_body=None
+        )
+        return record
+
+    def test_retry_replays_the_stored_response(self):
+        first = self.pay('key-1')
+        retry = self.pay('key-1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(Payment.objects.count(), 1)
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.amount_paid, Decimal('100.00'))
+
+    def test_key_reused_for_a_different_body_is_rejected(self):
+        self.pay('key-1')
+
+        response = self.pay('key-1', amount_paid='5.00')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_concurrent_duplicate_gets_conflict(self):
+        self.claim_by_another_request('key-1')
+
+        response = self.pay('key-1')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertFalse(Payment.objects.exists())
+
+    def test_abandoned_and_expired_keys_are_taken_over(self):
+        record = self.claim_by_another_request('key-1')
+        IdempotencyKey.objects.filter(pk=record.pk).update(created_at=timezone.now() - timedelta(minutes=10))
+        self.assertEqual(self.pay('key-1').status_code, 201)
+
+        IdempotencyKey.objects.filter(pk=record.pk).update(expires_at=timezone.now())
+        response = self.pay('key-1')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Payment.objects.count(), 2)
+
+    def test_client_errors_are_stored_and_requests_without_a_key_run_unchanged(self):
+        failed = self.pay('key-1', amount_paid='99999.00')
+
+        self.assertEqual(failed.status_code, 400)
+        self.assertEqual(IdempotencyKey.objects.get(key='key-1').status, IdempotencyKey.Status.COMPLETED)
+        self.assertEqual(self.pay().status_code, 201)
+        self.assertEqual(self.pay().status_code, 201)
+        self.assertEqual(Payment.objects.count(), 2)
+
+    def test_overlong_key_is_rejected(self):
+        self.assertEqual(self.pay('k' * 256).status_code, 400)
+
+    def test_server_errors_release_the_key(self):
+        factory = APIRequestFactory()
+        view = FlakyViewSet.as_view({'post': 'create'})
+
+        def call(**data):
+            request = factory.post('/flaky/', data, format='json', HTTP_IDEMPOTENCY_KEY='key-1')
+            force_authenticate(request, self.admin)
+            return view(request)
+
+        FlakyViewSet.calls = 0
+        self.assertEqual(call(status=503).status_code, 503)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        with self.assertRaises(RuntimeError):
+            call(status=200, **{'raise': True})
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        self.assertEqual(call(status=200).data, {'call': 3})
+        self.assertEqual(call(status=200).data, {'call': 3})
+
+    def test_expired_keys_are_purged(self):
+        self.pay('key-1')
+        self.pay('key-2', amount_paid='1.00')
+        IdempotencyKey.objects.filter(key='key-1').update(expires_at=timezone.now() - timedelta(seconds=1))
+        out = StringIO()
+
+        call_command('purge_idempotency_keys', '--batch-size', '1', stdout=out)
+
+        self.assertIn("Purged 1 expired idempotency keys", out.getvalue())
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['key-2'])
@@ -1,3 +1,130 @@
+from datetime import date
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from apps.accounts.models import User
+from apps.academic.models import AcademicYear, Class, Enrollment
+from apps.students.models import Student
+from .models import Attendance
 
-# Create your tests here.
+
+class BulkMarkTests(TestCase):
+    """Grade 1 has six active students and one withdrawn; Grade 2 has one student"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='password', role='admin'
+        )
+        cls.teacher = User.objects.create_user(
+            username='teacher', email='teacher@example.com', password='password', role='teacher'
+        )
+        academic_year = AcademicYear.objects.create(
+            year_name='2024/2025', start_date=date(2024, 9, 1), end_date=date(2025, 7, 31), is_current=True
+        )
+        cls.class_obj, cls.other_class = [
+            Class.objects.create(class_name=f'Grade {level}', grade_level=level, academic_year=academic_year)
+            for level in (1, 2)
+        ]
+        cls.students = []
+        for number in range(1, 9):
+            student = Student.objects.create(
+                admission_number=f'ADM{number:04d}', first_name=f'Student{number}', last_name='Test',
+                date_of_birth=date(2018, 1, 1), gender='male', admission_date=date(2024, 9, 1)
+            )
+            Enrollment.objects.create(
+                student=student,
+                class_obj=cls.other_class if number == 8 else cls.class_obj,
+                status=Enrollment.EnrollmentStatus.WITHDRAWN if number == 7 else Enrollment.EnrollmentStatus.ACTIVE,
+                roll_number=number
+            )
+            cls.students.append(student)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def mark(self, records, attendance_date='2024-10-01'):
+        return self.client.post('/attendance/bulk_mark/', {
+            'class_id': self.class_obj.id, 'attendance_date': attendance_date, 'attendance_records': records
+        }, format='json')
+
+    def records(self, count, status='present', **extra):
+        return [{'student_id': student.id, 'status': status, **extra} for student in self.students[:count]]
+
+    def test_records_are_created_with_one_upsert(self):
+        with CaptureQueriesContext(connection) as few:
+            self.mark(self.records(2), attendance_date='2024-10-02')
+        with CaptureQueriesContext(connection) as many:
+            response = self.mark(self.records(6))
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data, {'created': 6, 'updated': 0, 'errors': []})
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(Attendance.objects.filter(attendance_date=date(2024, 10, 1), status='present').count(), 6)
+        record = Attendance.objects.get(student=self.students[0], attendance_date=date(2024, 10, 1))
+        self.assertEqual(record.marked_by, self.admin)
+
+    def test_marking_again_updates_records_in_place(self):
+        self.mark(self.records(6))
+        first_ids = set(Attendance.objects.values_list('id', flat=True))
+        self.client.force_authenticate(self.teacher)
+
+        response = self.mark(self.records(3, status='absent', remarks='sick'))
+
+        self.assertEqual(response.data, {'created': 0, 'updated': 3, 'errors': []})
+        self.assertEqual(set(Attendance.objects.values_list('id', flat=True)), first_ids)
+        record = Attendance.objects.get(student=self.students[0])
+        self.assertEqual((record.status, record.remarks, record.marked_by), ('absent', 'sick', self.teacher))
+        self.assertEqual(Attendance.objects.filter(status='present').count(), 3)
+
+    def test_partial_overlap_counts_created_and_updated(self):
+        self.mark(self.records(2))
+
+        response = self.mark(self.records(5, status='late'))
+
+        self.assertEqual((response.data['created'], response.data['updated']), (3, 2))
+        self.assertEqual(Attendance.objects.filter(status='late').count(), 5)
+
+    def test_a_student_listed_twice_keeps_the_last_record(self):
+        records = self.records(2) + [{'student_id': self.students[0].id, 'status': 'excused'}]
+
+        response = self.mark(records)
+
+        self.assertEqual(response.data, {'created': 2, 'updated': 0, 'errors': []})
+        self.assertEqual(Attendance.objects.get(student=self.students[0]).status, 'excused')
+
+    def test_invalid_records_are_reported_and_the_rest_written(self):
+        records = self.records(2) + [
+            {'student_id': self.students[6].id, 'status': 'present'},
+            {'student_id': self.students[7].id, 'status': 'present'},
+            {'student_id': self.students[2].id, 'status': 'asleep'},
+            {'student_id': 'x', 'status': 'present'},
+        ]
+
+        response = self.mark(records)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['updated']), (2, 0))
+        self.assertEqual(
+            [(error['index'], error['error']) for error in response.data['errors']],
+            [
+                (2, 'Student is not actively enrolled in this class'),
+                (3, 'Student is not actively enrolled in this class'),
+                (4, 'Invalid status asleep'),
+                (5, 'Invalid student_id'),
+            ]
+        )
+        self.assertEqual(Attendance.objects.count(), 2)
+
+    def test_nothing_valid_writes_nothing(self):
+        response = self.mark([{'student_id': self.students[7].id, 'status': 'present'}])
+
+        self.assertEqual((response.data['created'], response.data['updated']), (0, 0))
+        self.assertFalse(Attendance.objects.exists())
+
+    def test_malformed_requests_are_rejected(self):
+        self.assertEqual(self.mark([{'student_id': self.students[0].id}]).status_code, 400)
+        self.assertEqual(self.mark(self.records(1), attendance_date='not a date').status_code, 400)
+        self.assertFalse(Attendance.objects.exists())
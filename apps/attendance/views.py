@@ -2,19 +2,22 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.db import connection, transaction
 from django.db.models import Count, Q
 from datetime import datetime, timedelta
 from .models import Attendance
 from .serializers import AttendanceSerializer, BulkAttendanceSerializer, AttendanceReportSerializer
 from apps.accounts.permissions import CanManageStudents
+from config.pagination import OptionalKeysetPaginationMixin
 
 
-class AttendanceViewSet(viewsets.ModelViewSet):
+class AttendanceViewSet(OptionalKeysetPaginationMixin, viewsets.ModelViewSet):
     """ViewSet for Attendance management"""
     
     queryset = Attendance.objects.select_related('student', 'class_obj', 'marked_by').all()
     serializer_class = AttendanceSerializer
     permission_classes = [IsAuthenticated, CanManageStudents]
+    keyset_ordering = ('-attendance_date', '-id')
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -52,7 +55,14 @@ class AttendanceViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['post'])
     def bulk_mark(self, request):
-        """Mark attendance for multiple students at once"""
+        """
+        Mark attendance for multiple students at once.
+        
+        Students are checked against the class's active enrollments with
+        one query and all records are written with a single upsert on
+        (student, attendance_date). Records for students not enrolled in
+        the class, or with an invalid status, are reported in errors.
+        """
         serializer = BulkAttendanceSerializer(data=request.data)
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -61,35 +71,58 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         attendance_date = serializer.validated_data['attendance_date']
         attendance_records = serializer.validated_data['attendance_records']
         
-        created_records = []
-        updated_records = []
-        errors = []
+        from apps.academic.models import Enrollment
+        enrolled = set(Enrollment.objects.filter(
+            class_obj_id=class_id,
+            status=Enrollment.EnrollmentStatus.ACTIVE
+        ).values_list('student_id', flat=True))
         
-        for record in attendance_records:
-            student_id = record['student_id']
-            status_value = record['status']
-            remarks = record.get('remarks', '')
-            
-            # Check if attendance already exists
-            attendance, created = Attendance.objects.update_or_create(
+        # A student listed twice keeps their last record
+        records = {}
+        errors = []
+        for index, record in enumerate(attendance_records):
+            try:
+                student_id = int(record['student_id'])
+            except (TypeError, ValueError):
+                errors.append({'index': index, 'error': 'Invalid student_id'})
+                continue
+            if student_id not in enrolled:
+                errors.append({
+                    'index': index,
+                    'student_id': student_id,
+                    'error': 'Student is not actively enrolled in this class'
+                })
+                continue
+            if record['status'] not in Attendance.AttendanceStatus.values:
+                errors.append({'index': index, 'student_id': student_id, 'error': f"Invalid status {record['status']}"})
+                continue
+            records[student_id] = Attendance(
                 student_id=student_id,
+                class_obj_id=class_id,
                 attendance_date=attendance_date,
-                defaults={
-                    'class_obj_id': class_id,
-                    'status': status_value,
-                    'remarks': remarks,
-                    'marked_by': request.user
-                }
+                status=record['status'],
+                remarks=record.get('remarks') or '',
+                marked_by=request.user
             )
-            
-            if created:
-                created_records.append(attendance)
-            else:
-                updated_records.append(attendance)
+        
+        upsert = {
+            'update_conflicts': True,
+            'update_fields': ['class_obj', 'status', 'remarks', 'marked_by'],
+        }
+        # MySQL upserts on any unique key and rejects an explicit conflict target
+        if connection.features.supports_update_conflicts_with_target:
+            upsert['unique_fields'] = ['student', 'attendance_date']
+        
+        with transaction.atomic():
+            existing = Attendance.objects.filter(
+                attendance_date=attendance_date,
+                student_id__in=records
+            ).count() if records else 0
+            Attendance.objects.bulk_create(records.values(), batch_size=500, **upsert)
         
         return Response({
-            'created': AttendanceSerializer(created_records, many=True).data,
-            'updated': AttendanceSerializer(updated_records, many=True).data,
+            'created': len(records) - existing,
+            'updated': existing,
             'errors': errors
         }, status=status.HTTP_201_CREATED)
     
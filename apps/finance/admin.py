@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import FeeStructure, Invoice, InvoiceItem, Payment, Expenditure
+from .models import FeeStructure, Invoice, InvoiceItem, Payment, Expenditure, DocumentSequence, FinanceDailyRollup
 
 
 @admin.register(FeeStructure)
@@ -41,4 +41,20 @@ class ExpenditureAdmin(admin.ModelAdmin):
     list_filter = ('category', 'transaction_date')
     search_fields = ('expenditure_number', 'item_name', 'vendor_name')
     ordering = ('-transaction_date',)
-    readonly_fields = ('expenditure_number',)
\ No newline at end of file
+    readonly_fields = ('expenditure_number',)
+
+
+@admin.register(DocumentSequence)
+class DocumentSequenceAdmin(admin.ModelAdmin):
+    list_display = ('prefix', 'last_value', 'updated_at')
+    search_fields = ('prefix',)
+    ordering = ('prefix',)
+    readonly_fields = ('updated_at',)
+
+
+
+@admin.register(FinanceDailyRollup)
+class FinanceDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ('rollup_date', 'metric', 'dimension', 'amount', 'count')
+    list_filter = ('metric', 'rollup_date')
+    ordering = ('-rollup_date', 'metric', 'dimension')
@@ -0,0 +1,29 @@
+from django.core.cache import cache
+
+
+PERIOD_VERSION_KEY = 'finance:period-version:{academic_year_id}:{term}'
+
+
+def period_version(academic_year_id, term):
+    """Current cache version for an (academic year, term) slice of invoices"""
+    key = PERIOD_VERSION_KEY.format(academic_year_id=academic_year_id or 'all', term=term or 'all')
+    return cache.get_or_set(key, 1, timeout=None)
+
+
+def bump_period_versions(periods):
+    """
+    Invalidate cached reports for the given (academic_year_id, term) periods.
+
+    Reports that span every year or every term are invalidated as well.
+    """
+    keys = set()
+    for academic_year_id, term in periods:
+        for year_part in (academic_year_id, 'all'):
+            for term_part in (term, 'all'):
+                keys.add(PERIOD_VERSION_KEY.format(academic_year_id=year_part, term=term_part))
+
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
@@ -0,0 +1,50 @@
+from datetime import date, datetime, time, timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+
+def to_date(value):
+    """Coerce a date or 'YYYY-MM-DD' string to a date, raising ValueError if invalid"""
+    if isinstance(value, datetime):
+        return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+    if isinstance(value, date):
+        return value
+    parsed = parse_date(str(value)) if value else None
+    if parsed is None:
+        raise ValueError(f"'{value}' is not a date in YYYY-MM-DD format")
+    return parsed
+
+
+def day_range(start_date, end_date=None):
+    """
+    Half-open datetime range [start, end) covering whole local days.
+
+    Filtering a DateTimeField with __gte/__lt on these bounds keeps the
+    column bare, so its index stays usable, unlike __date or __range
+    with bare dates (which stops at midnight of the last day).
+
+    Args:
+        start_date: First day (date or 'YYYY-MM-DD')
+        end_date: Last day, inclusive; defaults to start_date
+
+    Returns:
+        (start, end) aware datetimes in the current time zone
+    """
+    start_date = to_date(start_date)
+    end_date = to_date(end_date) if end_date else start_date
+    if end_date < start_date:
+        raise ValueError("end_date must not be before start_date")
+
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(start_date, time.min), tz)
+    end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min), tz)
+    return start, end
+
+
+def filter_day_range(queryset, field, start_date=None, end_date=None):
+    """Filter a DateTimeField to whole days; open-ended when a bound is omitted"""
+    if start_date:
+        queryset = queryset.filter(**{f'{field}__gte': day_range(start_date)[0]})
+    if end_date:
+        queryset = queryset.filter(**{f'{field}__lt': day_range(end_date)[1]})
+    return queryset
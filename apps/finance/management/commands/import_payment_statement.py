@@ -0,0 +1,66 @@
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from apps.finance.models import Payment
+from apps.finance.services import StatementImportService
+
+
+class Command(BaseCommand):
+    help = "Import a bank or mobile-money statement CSV and record matched lines as payments"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV with transaction_reference, amount and optional reference, date, payment_method columns")
+        parser.add_argument(
+            '--payment-method',
+            default=Payment.PaymentMethod.BANK_TRANSFER,
+            choices=Payment.PaymentMethod.values,
+            help="Payment method for lines without a payment_method column"
+        )
+        parser.add_argument('--received-by', help="Username recorded as receiving the payments")
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Lines processed per batch")
+        parser.add_argument('--dry-run', action='store_true', help="Match and report without recording payments")
+
+    def handle(self, *args, **options):
+        received_by = None
+        if options['received_by']:
+            try:
+                received_by = get_user_model().objects.get(username=options['received_by'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"User {options['received_by']} not found")
+
+        service = StatementImportService()
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as statement:
+                report = service.import_statement(
+                    service.read_csv(statement),
+                    payment_method=options['payment_method'],
+                    received_by=received_by,
+                    dry_run=options['dry_run'],
+                    chunk_size=options['chunk_size']
+                )
+        except (OSError, ValidationError) as e:
+            raise CommandError(str(e))
+
+        for line in report['errors']:
+            self.stdout.write(self.style.ERROR(f"Line {line['line']}: {line['error']}"))
+        for line in report['duplicates']:
+            self.stdout.write(self.style.WARNING(
+                f"Line {line['line']}: duplicate {line['transaction_reference']} ({line['amount']})"
+            ))
+        for line in report['unmatched']:
+            self.stdout.write(self.style.WARNING(
+                f"Line {line['line']}: unmatched {line['transaction_reference']} "
+                f"'{line['reference']}' ({line['amount']}) - {line['reason']}"
+            ))
+
+        verb = "would be recorded" if options['dry_run'] else "recorded"
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['total_lines']} lines: {report['matched']} {verb} ({report['matched_amount']}), "
+            f"{report['unmatched_count']} unmatched, {report['duplicates_count']} duplicates, "
+            f"{report['errors_count']} errors"
+        ))
+        listed = len(report['unmatched']) + len(report['duplicates']) + len(report['errors'])
+        if listed < report['unmatched_count'] + report['duplicates_count'] + report['errors_count']:
+            self.stdout.write(
+                f"Only the first {service.MAX_DETAILS} lines of each kind are listed above"
+            )
@@ -0,0 +1,29 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from apps.finance.services import FinanceRollupService
+
+
+class Command(BaseCommand):
+    help = "Rebuild the finance_daily_rollup table from payments, expenditures and invoices"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', help="First day to rebuild (YYYY-MM-DD)")
+        parser.add_argument('--end-date', help="Last day to rebuild (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        start_date = options['start_date']
+        end_date = options['end_date']
+        if bool(start_date) != bool(end_date):
+            raise CommandError("--start-date and --end-date must be given together")
+
+        try:
+            if start_date:
+                start_date = date.fromisoformat(start_date)
+                end_date = date.fromisoformat(end_date)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        rows = FinanceRollupService().rebuild(start_date, end_date)
+
+        scope = f"{start_date} to {end_date}" if start_date else "all dates"
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} rollup rows for {scope}"))
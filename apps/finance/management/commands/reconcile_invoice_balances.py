@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from decimal import Decimal
+from apps.finance.models import Invoice, Payment
+
+
+class Command(BaseCommand):
+    help = "Re-derive invoice amount_paid, balance and status from recorded payments"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help="Invoices processed per batch")
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without writing changes")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        dry_run = options['dry_run']
+
+        last_id = 0
+        checked = 0
+        repaired = 0
+
+        while True:
+            # Invoices are locked for the chunk, so a payment recorded
+            # concurrently waits and applies its delta to the repaired row
+            with transaction.atomic():
+                invoices = list(
+                    Invoice.objects.select_for_update().filter(id__gt=last_id).order_by('id').only(
+                        'id', 'invoice_number', 'total_amount', 'amount_paid', 'balance', 'status'
+                    )[:chunk_size]
+                )
+                if not invoices:
+                    break
+                last_id = invoices[-1].id
+                checked += len(invoices)
+
+                paid_totals = dict(
+                    Payment.objects.filter(
+                        invoice_id__in=[invoice.id for invoice in invoices]
+                    ).values('invoice_id').annotate(
+                        total=Sum('amount_paid')
+                    ).values_list('invoice_id', 'total')
+                )
+
+                drifted = []
+                for invoice in invoices:
+                    amount_paid = paid_totals.get(invoice.id) or Decimal('0.00')
+                    balance = invoice.total_amount - amount_paid
+                    status = Invoice.resolve_status(invoice.total_amount, amount_paid, invoice.status)
+
+                    if (invoice.amount_paid, invoice.balance, invoice.status) != (amount_paid, balance, status):
+                        self.stdout.write(
+                            f"{invoice.invoice_number}: paid {invoice.amount_paid} -> {amount_paid}, "
+                            f"balance {invoice.balance} -> {balance}, status {invoice.status} -> {status}"
+                        )
+                        invoice.amount_paid = amount_paid
+                        invoice.balance = balance
+                        invoice.status = status
+                        invoice.updated_at = timezone.now()
+                        drifted.append(invoice)
+
+                repaired += len(drifted)
+                if drifted and not dry_run:
+                    Invoice.objects.bulk_update(
+                        drifted, ['amount_paid', 'balance', 'status', 'updated_at']
+                    )
+
+        verb = "would be repaired" if dry_run else "repaired"
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} invoices, {repaired} {verb}"))
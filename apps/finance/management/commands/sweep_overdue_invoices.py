@@ -0,0 +1,30 @@
+import logging
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from apps.finance.services import InvoiceService
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Mark past-due invoices as overdue and clear ones that have been paid or extended"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Maximum invoices per UPDATE")
+        parser.add_argument('--as-of', help="Treat this date (YYYY-MM-DD) as today")
+
+    def handle(self, *args, **options):
+        try:
+            as_of = date.fromisoformat(options['as_of']) if options['as_of'] else None
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        result = InvoiceService().sweep_overdue(as_of=as_of, batch_size=options['batch_size'])
+
+        message = (
+            f"Overdue sweep as of {result['as_of']}: {result['marked_overdue']} marked overdue, "
+            f"{result['cleared_overdue']} cleared"
+        )
+        logger.info(message)
+        self.stdout.write(self.style.SUCCESS(message))
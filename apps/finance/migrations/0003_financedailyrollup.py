@@ -0,0 +1,30 @@
+# Generated by Django 6.0.1 on 2026-10-17 06:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0002_documentsequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FinanceDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rollup_date', models.DateField()),
+                ('metric', models.CharField(choices=[('revenue', 'Revenue'), ('expenditure', 'Expenditure'), ('invoices_issued', 'Invoices Issued'), ('invoices_paid', 'Invoices Paid')], max_length=20)),
+                ('dimension', models.CharField(blank=True, help_text='Payment method for revenue, category for expenditure', max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'finance_daily_rollup',
+                'ordering': ['rollup_date', 'metric', 'dimension'],
+                'indexes': [models.Index(fields=['metric', 'rollup_date'], name='finance_dai_metric_192110_idx')],
+                'unique_together': {('rollup_date', 'metric', 'dimension')},
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-17 06:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0003_financedailyrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['created_at'], name='invoices_created_bfa8ab_idx'),
+        ),
+    ]
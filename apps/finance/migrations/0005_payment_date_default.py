@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-17 06:52
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0004_invoice_created_at_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='payment_date',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
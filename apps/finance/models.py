@@ -1,5 +1,9 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import F, Case, When, Value
+from django.db.models.lookups import GreaterThan, GreaterThanOrEqual
+from django.utils import timezone
 from decimal import Decimal
+from .cache import bump_period_versions
 from apps.students.models import Student
 from apps.academic.models import AcademicYear, Class
 from apps.accounts.models import User
@@ -91,6 +95,7 @@ class Invoice(models.Model):
             models.Index(fields=['student', 'academic_year']),
             models.Index(fields=['status']),
             models.Index(fields=['due_date']),
+            models.Index(fields=['created_at']),
         ]
 
     def __str__(self):
@@ -101,12 +106,121 @@ class Invoice(models.Model):
         self.balance = self.total_amount - self.amount_paid
 
         # Auto-update status
-        if self.amount_paid >= self.total_amount:
-            self.status = self.InvoiceStatus.PAID
-        elif self.amount_paid > 0:
-            self.status = self.InvoiceStatus.PARTIAL
+        self.status = self.resolve_status(self.total_amount, self.amount_paid, self.status)
 
-        super().save(*args, **kwargs)
+        is_new = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            bump_period_versions([(self.academic_year_id, self.term)])
+
+            if is_new:
+                FinanceDailyRollup.add(
+                    timezone.localdate(self.created_at),
+                    FinanceDailyRollup.Metric.INVOICES_ISSUED,
+                    amount=self.total_amount,
+                    count=1
+                )
+
+    @classmethod
+    def resolve_status(cls, total_amount, amount_paid, current_status):
+        """Status implied by the amount paid against the invoice total"""
+        if current_status == cls.InvoiceStatus.CANCELLED:
+            return current_status
+        if amount_paid >= total_amount:
+            return cls.InvoiceStatus.PAID
+        if current_status == cls.InvoiceStatus.OVERDUE:
+            return current_status
+        if amount_paid > 0:
+            return cls.InvoiceStatus.PARTIAL
+        if current_status in [cls.InvoiceStatus.PAID, cls.InvoiceStatus.PARTIAL]:
+            return cls.InvoiceStatus.UNPAID
+        return current_status
+
+    @classmethod
+    def apply_payment(cls, invoice_id, amount, paid_at=None):
+        """
+        Apply a payment delta to an invoice with a single UPDATE.
+
+        Only amount_paid, balance, status and updated_at are written.
+        A negative amount reverses a payment.
+        """
+        return cls.apply_payments({invoice_id: amount}, paid_at)
+
+    @classmethod
+    @transaction.atomic
+    def apply_payments(cls, amounts, paid_at=None):
+        """
+        Apply payment deltas, keyed by invoice id, with a single UPDATE.
+
+        The invoices are locked first, so the rollup's count of invoices
+        moving into or out of PAID is read from the rows being updated.
+        That count goes on the local date of the payment making the change,
+        as FinanceRollupService.rebuild() does.
+
+        Args:
+            amounts: {invoice_id: amount}
+            paid_at: Payment date, or {invoice_id: payment date}; defaults to now
+        """
+        if not amounts:
+            return 0
+        if not isinstance(paid_at, dict):
+            paid_at = dict.fromkeys(amounts, paid_at or timezone.now())
+
+        if len(amounts) == 1:
+            delta = Value(next(iter(amounts.values())))
+        else:
+            delta = Case(
+                *[When(id=invoice_id, then=Value(amount)) for invoice_id, amount in amounts.items()],
+                default=Value(Decimal('0.00')),
+                output_field=models.DecimalField(max_digits=10, decimal_places=2),
+            )
+        new_amount_paid = F('amount_paid') + delta
+
+        # Invoices moving into or out of PAID, for the daily rollup
+        paid = {}
+        periods = set()
+        locked = cls.objects.select_for_update().filter(id__in=list(amounts)).order_by('id')
+        current = [
+            row for row in locked.values_list(
+                'id', 'total_amount', 'balance', 'status', 'academic_year_id', 'term'
+            )
+            if row[3] != cls.InvoiceStatus.CANCELLED
+        ]
+        for invoice_id, total_amount, balance, status, academic_year_id, term in current:
+            periods.add((academic_year_id, term))
+            is_paid = balance - amounts[invoice_id] <= 0
+            if is_paid == (status == cls.InvoiceStatus.PAID):
+                continue
+            sign = 1 if is_paid else -1
+            day = timezone.localdate(paid_at[invoice_id])
+            amount, count = paid.get(day, (Decimal('0.00'), 0))
+            paid[day] = (amount + sign * total_amount, count + sign)
+
+        bump_period_versions(periods)
+
+        for day, (amount, count) in paid.items():
+            if count:
+                FinanceDailyRollup.add(day, FinanceDailyRollup.Metric.INVOICES_PAID, amount=amount, count=count)
+
+        return cls.objects.filter(id__in=list(amounts)).update(
+            # status is listed first so MySQL, which evaluates SET clauses
+            # left to right, still compares against the old amount_paid
+            status=Case(
+                When(status=cls.InvoiceStatus.CANCELLED, then=F('status')),
+                When(GreaterThanOrEqual(new_amount_paid, F('total_amount')), then=Value(cls.InvoiceStatus.PAID)),
+                When(status=cls.InvoiceStatus.OVERDUE, then=F('status')),
+                When(GreaterThan(new_amount_paid, Value(0)), then=Value(cls.InvoiceStatus.PARTIAL)),
+                When(
+                    status__in=[cls.InvoiceStatus.PAID, cls.InvoiceStatus.PARTIAL],
+                    then=Value(cls.InvoiceStatus.UNPAID)
+                ),
+                default=F('status'),
+            ),
+            amount_paid=new_amount_paid,
+            balance=F('balance') - delta,
+            updated_at=timezone.now(),
+        )
 
 class InvoiceItem(models.Model):
     """Line items in an invoice"""
@@ -147,7 +261,7 @@ class Payment(models.Model):
     amount_paid = models.DecimalField(max_digits=10, decimal_places=2)
     payment_method = models.CharField(max_length=20, choices=PaymentMethod.choices)
     transaction_reference = models.CharField(max_length=100, blank=True)
-    payment_date = models.DateTimeField(auto_now_add=True)
+    payment_date = models.DateTimeField(default=timezone.now)
     remarks = models.TextField(blank=True)
 
     received_by = models.ForeignKey(
@@ -170,13 +284,39 @@ class Payment(models.Model):
         return f"Payment {self.payment_number} - {self.amount_paid}"
 
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
+        previous = None
+        if not self._state.adding:
+            previous = Payment.objects.filter(pk=self.pk).values(
+                'invoice_id', 'amount_paid', 'payment_method', 'payment_date'
+            ).first()
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            # Update invoice balance by the change in amount paid
+            if previous and previous['invoice_id'] != self.invoice_id:
+                Invoice.apply_payment(previous['invoice_id'], -previous['amount_paid'], previous['payment_date'])
+                Invoice.apply_payment(self.invoice_id, self.amount_paid, self.payment_date)
+            else:
+                delta = self.amount_paid - (previous['amount_paid'] if previous else Decimal('0.00'))
+                if delta:
+                    Invoice.apply_payment(self.invoice_id, delta, self.payment_date)
+
+            # Keep the daily revenue rollup current
+            current = (self.amount_paid, self.payment_method, self.payment_date)
+            if previous and current == (previous['amount_paid'], previous['payment_method'], previous['payment_date']):
+                return
+            if previous:
+                FinanceDailyRollup.add_payment(
+                    previous['payment_date'], previous['payment_method'], -previous['amount_paid'], -1
+                )
+            FinanceDailyRollup.add_payment(self.payment_date, self.payment_method, self.amount_paid, 1)
 
-        # Update invoice amount_paid
-        self.invoice.amount_paid = self.invoice.payments.aggregate(
-            total=models.Sum('amount_paid')
-        )['total'] or Decimal('0.00')
-        self.invoice.save()
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            Invoice.apply_payment(self.invoice_id, -self.amount_paid, self.payment_date)
+            FinanceDailyRollup.add_payment(self.payment_date, self.payment_method, -self.amount_paid, -1)
+            return super().delete(*args, **kwargs)
 
 
 class Expenditure(models.Model):
@@ -229,4 +369,104 @@ class Expenditure(models.Model):
         ]
     
     def __str__(self):
-        return f"{self.expenditure_number} - {self.item_name} ({self.amount})"
\ No newline at end of file
+        return f"{self.expenditure_number} - {self.item_name} ({self.amount})"
+
+    def save(self, *args, **kwargs):
+        previous = None
+        if not self._state.adding:
+            previous = Expenditure.objects.filter(pk=self.pk).values(
+                'amount', 'category', 'transaction_date'
+            ).first()
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            # Keep the daily expenditure rollup current
+            current = (self.amount, self.category, self.transaction_date)
+            if previous and current == (previous['amount'], previous['category'], previous['transaction_date']):
+                return
+            if previous:
+                FinanceDailyRollup.add(
+                    previous['transaction_date'], FinanceDailyRollup.Metric.EXPENDITURE,
+                    previous['category'], -previous['amount'], -1
+                )
+            FinanceDailyRollup.add(
+                self.transaction_date, FinanceDailyRollup.Metric.EXPENDITURE,
+                self.category, self.amount, 1
+            )
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            FinanceDailyRollup.add(
+                self.transaction_date, FinanceDailyRollup.Metric.EXPENDITURE,
+                self.category, -self.amount, -1
+            )
+            return super().delete(*args, **kwargs)
+
+class DocumentSequence(models.Model):
+    """Per-prefix counters for invoice, payment and expenditure numbers"""
+    
+    prefix = models.CharField(max_length=50, unique=True, help_text="e.g., 'INV-2024-1' or 'PAY-20250114'")
+    last_value = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'document_sequences'
+        ordering = ['prefix']
+    
+    def __str__(self):
+        return f"{self.prefix} ({self.last_value})"
+
+
+
+class FinanceDailyRollup(models.Model):
+    """Per-day finance totals maintained incrementally for the dashboard"""
+    
+    class Metric(models.TextChoices):
+        REVENUE = 'revenue', 'Revenue'
+        EXPENDITURE = 'expenditure', 'Expenditure'
+        INVOICES_ISSUED = 'invoices_issued', 'Invoices Issued'
+        INVOICES_PAID = 'invoices_paid', 'Invoices Paid'
+    
+    rollup_date = models.DateField()
+    metric = models.CharField(max_length=20, choices=Metric.choices)
+    dimension = models.CharField(
+        max_length=20,
+        blank=True,
+        help_text="Payment method for revenue, category for expenditure"
+    )
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        db_table = 'finance_daily_rollup'
+        ordering = ['rollup_date', 'metric', 'dimension']
+        unique_together = ['rollup_date', 'metric', 'dimension']
+        indexes = [
+            models.Index(fields=['metric', 'rollup_date']),
+        ]
+    
+    def __str__(self):
+        return f"{self.rollup_date} {self.metric} {self.dimension}: {self.amount} ({self.count})"
+    
+    @classmethod
+    def add(cls, rollup_date, metric, dimension='', amount=0, count=0):
+        """Add amount and count to a day's bucket, creating it if needed"""
+        bucket = cls.objects.filter(rollup_date=rollup_date, metric=metric, dimension=dimension)
+        if bucket.update(amount=F('amount') + amount, count=F('count') + count):
+            return
+        
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    rollup_date=rollup_date, metric=metric, dimension=dimension,
+                    amount=amount, count=count
+                )
+        except IntegrityError:
+            # Another writer created the bucket first
+            bucket.update(amount=F('amount') + amount, count=F('count') + count)
+    
+    @classmethod
+    def add_payment(cls, payment_date, payment_method, amount, count):
+        """Add a payment to the revenue bucket for its local date"""
+        cls.add(timezone.localdate(payment_date), cls.Metric.REVENUE, payment_method, amount, count)
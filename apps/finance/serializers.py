@@ -113,7 +113,17 @@ class FinancialSummarySerializer(serializers.Serializer):
     
     total_revenue = serializers.DecimalField(max_digits=15, decimal_places=2, read_only=True)
     total_expenditure = serializers.DecimalField(max_digits=15, decimal_places=2, read_only=True)
+    net_income = serializers.DecimalField(max_digits=15, decimal_places=2, read_only=True)
     outstanding_fees = serializers.DecimalField(max_digits=15, decimal_places=2, read_only=True)
     paid_invoices = serializers.IntegerField(read_only=True)
     unpaid_invoices = serializers.IntegerField(read_only=True)
-    partial_invoices = serializers.IntegerField(read_only=True)
\ No newline at end of file
+    partial_invoices = serializers.IntegerField(read_only=True)
+    overdue_invoices = serializers.IntegerField(read_only=True)
+    invoices_issued = serializers.IntegerField(read_only=True)
+    invoices_settled = serializers.IntegerField(read_only=True)
+    revenue_by_method = serializers.DictField(
+        child=serializers.DecimalField(max_digits=15, decimal_places=2), read_only=True
+    )
+    expenditure_by_category = serializers.DictField(
+        child=serializers.DecimalField(max_digits=15, decimal_places=2), read_only=True
+    )
\ No newline at end of file
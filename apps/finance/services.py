@@ -1,10 +1,86 @@
-from django.db import transaction
+from django.db import connection, transaction, IntegrityError
+from django.db.models import Q, F, Sum, Count, Case, When, Exists, OuterRef, Subquery, DecimalField, Value
+from django.db.models.functions import Coalesce
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.core.exceptions import ValidationError
-from decimal import Decimal
-from .models import Invoice, InvoiceItem, Payment, FeeStructure
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+import csv
+from .cache import period_version, bump_period_versions
+from .dates import day_range, filter_day_range, to_date
+from .models import Invoice, InvoiceItem, Payment, FeeStructure, Expenditure, DocumentSequence, FinanceDailyRollup
 from apps.students.models import Student
-from apps.academic.models import AcademicYear, Class
-from datetime import datetime, timedelta
+from apps.academic.models import AcademicYear, Class, Enrollment
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+
+class SequenceService:
+    """Allocates document numbers from per-prefix counters"""
+    
+    @staticmethod
+    @transaction.atomic
+    def reserve(prefix, count=1, seed_model=None, seed_field=None):
+        """
+        Atomically reserve a block of consecutive numbers for a prefix.
+        
+        The counter row stays locked until the surrounding transaction
+        commits, so concurrent writers never receive the same number.
+        
+        Args:
+            prefix: Counter key, e.g. 'INV-2024-1'
+            count: Number of values to reserve
+            seed_model: Model whose existing numbers seed a new counter
+            seed_field: Number field on seed_model, e.g. 'invoice_number'
+        
+        Returns:
+            range of reserved numbers
+        """
+        if count < 1:
+            raise ValidationError("At least one number must be reserved")
+        
+        updated = DocumentSequence.objects.filter(prefix=prefix).update(
+            last_value=F('last_value') + count
+        )
+        
+        if not updated:
+            start = SequenceService._existing_max(prefix, seed_model, seed_field)
+            try:
+                with transaction.atomic():
+                    DocumentSequence.objects.create(prefix=prefix, last_value=start + count)
+            except IntegrityError:
+                # Another writer created the counter first
+                DocumentSequence.objects.filter(prefix=prefix).update(
+                    last_value=F('last_value') + count
+                )
+        
+        last_value = DocumentSequence.objects.filter(
+            prefix=prefix
+        ).values_list('last_value', flat=True).get()
+        
+        return range(last_value - count + 1, last_value + 1)
+    
+    @staticmethod
+    def next_value(prefix, seed_model=None, seed_field=None):
+        """Reserve a single number for a prefix"""
+        return SequenceService.reserve(prefix, 1, seed_model, seed_field)[0]
+    
+    @staticmethod
+    def _existing_max(prefix, seed_model, seed_field):
+        """Highest number already issued for a prefix before its counter existed"""
+        if seed_model is None:
+            return 0
+        
+        last_number = seed_model.objects.filter(
+            **{f"{seed_field}__startswith": f"{prefix}-"}
+        ).order_by(f"-{seed_field}").values_list(seed_field, flat=True).first()
+        
+        if last_number:
+            return int(last_number.split('-')[-1])
+        return 0
 
 
 class InvoiceService:
@@ -55,9 +131,9 @@ class InvoiceService:
             academic_year=academic_year,
             is_mandatory=True
         ).filter(
-            models.Q(class_obj=enrollment.class_obj) | models.Q(class_obj__isnull=True)
+            Q(class_obj=enrollment.class_obj) | Q(class_obj__isnull=True)
         ).filter(
-            models.Q(term=term) | models.Q(term='all')
+            Q(term=term) | Q(term='all')
         )
         
         if not fee_structures.exists():
@@ -96,55 +172,241 @@ class InvoiceService:
     
     def _generate_invoice_number(self, academic_year, term):
         """Generate unique invoice number"""
+        return self._generate_invoice_numbers(academic_year, term, 1)[0]
+    
+    def _generate_invoice_numbers(self, academic_year, term, count):
+        """Generate a block of consecutive unique invoice numbers"""
         year_code = academic_year.year_name.replace('/', '')[:4]
         term_code = term.upper()
+        prefix = f"INV-{year_code}-{term_code}"
         
-        # Get last invoice number for this period
-        last_invoice = Invoice.objects.filter(
-            invoice_number__startswith=f"INV-{year_code}-{term_code}"
-        ).order_by('-invoice_number').first()
-        
-        if last_invoice:
-            last_number = int(last_invoice.invoice_number.split('-')[-1])
-            new_number = last_number + 1
-        else:
-            new_number = 1
+        numbers = SequenceService.reserve(
+            prefix, count, seed_model=Invoice, seed_field='invoice_number'
+        )
         
-        return f"INV-{year_code}-{term_code}-{new_number:05d}"
+        return [f"{prefix}-{number:05d}" for number in numbers]
     
     @transaction.atomic
-    def generate_bulk_invoices(self, class_id, academic_year_id, term, generated_by):
+    def generate_bulk_invoices(self, class_id, academic_year_id, term, generated_by, due_days=30):
         """Generate invoices for all students in a class"""
         try:
             class_obj = Class.objects.get(id=class_id)
         except Class.DoesNotExist:
             raise ValidationError("Class not found")
         
-        # Get all active enrollments in this class
-        enrollments = class_obj.enrollments.filter(status='active').select_related('student')
+        academic_year = self._get_academic_year(academic_year_id)
+        
+        return self._generate_invoices_for_classes([class_obj], academic_year, term, generated_by, due_days)
+    
+    @transaction.atomic
+    def generate_school_invoices(self, academic_year_id, term, generated_by, due_days=30):
+        """Generate invoices for every class in an academic year"""
+        academic_year = self._get_academic_year(academic_year_id)
+        classes = list(Class.objects.filter(academic_year=academic_year))
+        
+        return self._generate_invoices_for_classes(classes, academic_year, term, generated_by, due_days)
+    
+    @staticmethod
+    def _get_academic_year(academic_year_id):
+        try:
+            return AcademicYear.objects.get(id=academic_year_id)
+        except AcademicYear.DoesNotExist:
+            raise ValidationError("Academic year not found")
+    
+    def _generate_invoices_for_classes(self, classes, academic_year, term, generated_by, due_days):
+        """
+        Set-based invoice generation for a group of classes.
+        
+        Fee structures are resolved once per class, students that already
+        have an invoice for the period are found with a single anti-join,
+        and all invoices and items are written with bulk_create.
+        
+        Returns:
+            dict with created invoices and per-student errors
+        """
+        class_ids = [class_obj.id for class_obj in classes]
+        
+        # Resolve applicable fee structures for every class in one query
+        fee_structures = FeeStructure.objects.filter(
+            academic_year=academic_year,
+            is_mandatory=True
+        ).filter(
+            Q(class_obj_id__in=class_ids) | Q(class_obj__isnull=True)
+        ).filter(
+            Q(term=term) | Q(term='all')
+        )
+        
+        common_fees = []
+        class_fees = {class_id: [] for class_id in class_ids}
+        for fee in fee_structures:
+            if fee.class_obj_id is None:
+                common_fees.append(fee)
+            else:
+                class_fees[fee.class_obj_id].append(fee)
+        
+        fees_by_class = {
+            class_id: sorted(common_fees + fees, key=lambda fee: fee.category_name)
+            for class_id, fees in class_fees.items()
+        }
+        
+        # Active enrollments, flagged when an invoice already exists for the period
+        enrollments = Enrollment.objects.filter(
+            class_obj_id__in=class_ids,
+            status=Enrollment.EnrollmentStatus.ACTIVE
+        ).select_related('student').annotate(
+            has_invoice=Exists(
+                Invoice.objects.filter(
+                    student_id=OuterRef('student_id'),
+                    academic_year=academic_year,
+                    term=term
+                )
+            )
+        ).order_by('class_obj_id', 'roll_number', 'id')
         
-        invoices = []
+        pending = []
         errors = []
+        seen_students = set()
         
         for enrollment in enrollments:
-            try:
-                invoice = self.generate_invoice_for_student(
-                    enrollment.student.id,
-                    academic_year_id,
-                    term,
-                    generated_by
-                )
-                invoices.append(invoice)
-            except ValidationError as e:
+            student = enrollment.student
+            if student.id in seen_students:
+                continue
+            seen_students.add(student.id)
+            
+            if enrollment.has_invoice:
+                errors.append({
+                    'student': student.full_name,
+                    'error': "Invoice already exists for this student and term"
+                })
+                continue
+            
+            fees = fees_by_class.get(enrollment.class_obj_id)
+            if not fees:
                 errors.append({
-                    'student': enrollment.student.full_name,
-                    'error': str(e)
+                    'student': student.full_name,
+                    'error': "No fee structures found for this student"
                 })
+                continue
+            
+            pending.append((student, fees))
+        
+        if not pending:
+            return {'invoices': [], 'errors': errors}
+        
+        invoice_numbers = self._generate_invoice_numbers(academic_year, term, len(pending))
+        due_date = datetime.now().date() + timedelta(days=due_days)
+        
+        new_invoices = []
+        for (student, fees), invoice_number in zip(pending, invoice_numbers):
+            total_amount = sum((fee.amount for fee in fees), Decimal('0.00'))
+            new_invoices.append(Invoice(
+                invoice_number=invoice_number,
+                student=student,
+                academic_year=academic_year,
+                term=term,
+                total_amount=total_amount,
+                amount_paid=Decimal('0.00'),
+                balance=total_amount,
+                due_date=due_date,
+                status=Invoice.InvoiceStatus.UNPAID,
+                generated_by=generated_by
+            ))
+        
+        Invoice.objects.bulk_create(new_invoices, batch_size=500)
+        
+        # bulk_create bypasses Invoice.save, so caches and the rollup are updated here
+        bump_period_versions([(academic_year.id, term)])
+        FinanceDailyRollup.add(
+            timezone.localdate(),
+            FinanceDailyRollup.Metric.INVOICES_ISSUED,
+            amount=sum((invoice.total_amount for invoice in new_invoices), Decimal('0.00')),
+            count=len(new_invoices)
+        )
+        
+        # MySQL does not return primary keys from bulk inserts
+        invoice_ids = dict(
+            Invoice.objects.filter(
+                invoice_number__in=invoice_numbers
+            ).values_list('invoice_number', 'id')
+        )
+        
+        items = []
+        for (student, fees), invoice_number in zip(pending, invoice_numbers):
+            for fee in fees:
+                items.append(InvoiceItem(
+                    invoice_id=invoice_ids[invoice_number],
+                    fee_structure=fee,
+                    description=fee.category_name,
+                    amount=fee.amount
+                ))
+        
+        InvoiceItem.objects.bulk_create(items, batch_size=1000)
+        
+        invoices = list(
+            Invoice.objects.filter(
+                id__in=invoice_ids.values()
+            ).select_related(
+                'student', 'academic_year', 'generated_by'
+            ).prefetch_related('items').order_by('invoice_number')
+        )
         
         return {
             'invoices': invoices,
             'errors': errors
         }
+    
+    def sweep_overdue(self, as_of=None, batch_size=1000):
+        """
+        Move past-due invoices to OVERDUE and release ones that no longer are.
+        
+        Rows are updated in bounded batches so each UPDATE holds its locks
+        briefly. The status and due-date conditions are repeated in every
+        UPDATE, so invoices paid in the meantime are left alone.
+        
+        Args:
+            as_of: Date invoices must be due before (defaults to today)
+            batch_size: Maximum rows per UPDATE
+        
+        Returns:
+            dict with counts of invoices marked and cleared
+        """
+        as_of = as_of or timezone.localdate()
+        
+        became_overdue = Q(
+            status__in=[Invoice.InvoiceStatus.UNPAID, Invoice.InvoiceStatus.PARTIAL],
+            due_date__lt=as_of,
+            balance__gt=0
+        )
+        no_longer_overdue = Q(status=Invoice.InvoiceStatus.OVERDUE) & (
+            Q(due_date__gte=as_of) | Q(balance__lte=0)
+        )
+        
+        marked = self._update_in_batches(
+            became_overdue, batch_size, status=Invoice.InvoiceStatus.OVERDUE
+        )
+        cleared = self._update_in_batches(
+            no_longer_overdue, batch_size,
+            status=Case(
+                When(balance__lte=0, then=Value(Invoice.InvoiceStatus.PAID)),
+                When(amount_paid__gt=0, then=Value(Invoice.InvoiceStatus.PARTIAL)),
+                default=Value(Invoice.InvoiceStatus.UNPAID),
+            )
+        )
+        
+        return {'as_of': as_of, 'marked_overdue': marked, 'cleared_overdue': cleared}
+    
+    @staticmethod
+    def _update_in_batches(condition, batch_size, **values):
+        touched = 0
+        while True:
+            ids = list(Invoice.objects.filter(condition).order_by('id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return touched
+            
+            with transaction.atomic():
+                touched += Invoice.objects.filter(condition, id__in=ids).update(
+                    updated_at=timezone.now(), **values
+                )
 
 
 class PaymentService:
@@ -166,7 +428,8 @@ class PaymentService:
             Payment object
         """
         try:
-            invoice = Invoice.objects.get(id=invoice_id)
+            # Lock the invoice so parallel payments cannot overpay it
+            invoice = Invoice.objects.select_for_update().get(id=invoice_id)
         except Invoice.DoesNotExist:
             raise ValidationError("Invoice not found")
         
@@ -196,21 +459,18 @@ class PaymentService:
     
     def _generate_payment_number(self):
         """Generate unique payment number"""
+        return self._generate_payment_numbers(1)[0]
+    
+    def _generate_payment_numbers(self, count):
+        """Generate a block of consecutive unique payment numbers"""
         today = datetime.now()
-        date_code = today.strftime('%Y%m%d')
-        
-        # Get last payment number for today
-        last_payment = Payment.objects.filter(
-            payment_number__startswith=f"PAY-{date_code}"
-        ).order_by('-payment_number').first()
+        prefix = f"PAY-{today.strftime('%Y%m%d')}"
         
-        if last_payment:
-            last_number = int(last_payment.payment_number.split('-')[-1])
-            new_number = last_number + 1
-        else:
-            new_number = 1
+        numbers = SequenceService.reserve(
+            prefix, count, seed_model=Payment, seed_field='payment_number'
+        )
         
-        return f"PAY-{date_code}-{new_number:04d}"
+        return [f"{prefix}-{number:04d}" for number in numbers]
     
     @staticmethod
     def get_payment_history(invoice_id):
@@ -222,4 +482,661 @@ class PaymentService:
         """Get all payments for a student across all invoices"""
         return Payment.objects.filter(
             invoice__student_id=student_id
-        ).select_related('invoice').order_by('-payment_date')
\ No newline at end of file
+        ).select_related('invoice').order_by('-payment_date')
+
+
+class StatementImportService:
+    """Import bank and mobile-money statements as payments"""
+    
+    REQUIRED_COLUMNS = {'transaction_reference', 'amount'}
+    # Lines of each kind listed in the report; the rest are only counted
+    MAX_DETAILS = 100
+    
+    @classmethod
+    def read_csv(cls, text_file):
+        """Lazy CSV reader over a statement, after checking its header"""
+        reader = csv.DictReader(text_file)
+        columns = {(name or '').strip().lower() for name in reader.fieldnames or []}
+        missing = cls.REQUIRED_COLUMNS - columns
+        if missing:
+            raise ValidationError(f"Statement is missing columns: {', '.join(sorted(missing))}")
+        return reader
+    
+    @staticmethod
+    def parse_date(value):
+        """Statement date or datetime as an aware datetime, raising ValueError if invalid"""
+        parsed = parse_datetime(value)
+        if parsed is None:
+            return day_range(to_date(value))[0]
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+    
+    def _note(self, report, kind, detail):
+        report[f'{kind}_count'] += 1
+        if len(report[kind]) < self.MAX_DETAILS:
+            report[kind].append(detail)
+    
+    def import_statement(self, rows, payment_method, received_by=None, dry_run=False, chunk_size=1000):
+        """
+        Match statement lines to invoices and record them as payments.
+        
+        Lines are consumed lazily in fixed-size chunks, so memory use does
+        not grow with the size of the statement. Each line is matched on its
+        reference (or transaction reference) as an invoice number, then as
+        an admission number against the student's oldest outstanding
+        invoice. Lines whose transaction reference was already recorded are
+        reported as duplicates. Payments are dated with the statement's
+        date column when present.
+        
+        Unmatched, duplicate and error lines are counted; only the first
+        MAX_DETAILS of each are listed.
+        
+        Args:
+            rows: Iterable of dicts with transaction_reference, amount and
+                optionally reference, date and payment_method
+            payment_method: Default payment method for lines without one
+            received_by: User recording the payments
+            dry_run: Match and report without writing anything
+            chunk_size: Number of lines handled per batch
+        
+        Returns:
+            dict with totals plus counts and examples of unmatched,
+            duplicate and error lines
+        """
+        report = {
+            'total_lines': 0,
+            'matched': 0,
+            'matched_amount': Decimal('0.00'),
+            'unmatched_count': 0,
+            'duplicates_count': 0,
+            'errors_count': 0,
+            'unmatched': [],
+            'duplicates': [],
+            'errors': [],
+            'dry_run': dry_run,
+        }
+        seen_references = set()
+        rows = iter(rows)
+        line_number = 1  # header
+        
+        while True:
+            chunk = []
+            for row in islice(rows, chunk_size):
+                line_number += 1
+                chunk.append((line_number, row))
+            if not chunk:
+                break
+            
+            report['total_lines'] += len(chunk)
+            if dry_run:
+                self._import_chunk(chunk, payment_method, received_by, dry_run, seen_references, report)
+            else:
+                with transaction.atomic():
+                    self._import_chunk(chunk, payment_method, received_by, dry_run, seen_references, report)
+        
+        return report
+    
+    def _import_chunk(self, chunk, payment_method, received_by, dry_run, seen_references, report):
+        lines = []
+        for line_number, row in chunk:
+            row = {(key or '').strip().lower(): (value or '').strip() for key, value in row.items()}
+            missing = self.REQUIRED_COLUMNS - {key for key, value in row.items() if value}
+            if missing:
+                self._note(report, 'errors', {
+                    'line': line_number,
+                    'error': f"Missing {', '.join(sorted(missing))}"
+                })
+                continue
+            
+            try:
+                amount = Decimal(row['amount'].replace(',', ''))
+            except InvalidOperation:
+                amount = None
+            if amount is None or amount <= 0:
+                self._note(report, 'errors', {'line': line_number, 'error': f"Invalid amount '{row['amount']}'"})
+                continue
+            
+            method = row.get('payment_method') or payment_method
+            if method not in Payment.PaymentMethod.values:
+                self._note(report, 'errors', {'line': line_number, 'error': f"Invalid payment method '{method}'"})
+                continue
+            
+            payment_date = None
+            if row.get('date'):
+                try:
+                    payment_date = self.parse_date(row['date'])
+                except ValueError:
+                    self._note(report, 'errors', {'line': line_number, 'error': f"Invalid date '{row['date']}'"})
+                    continue
+            
+            lines.append({
+                'line': line_number,
+                'transaction_reference': row['transaction_reference'],
+                'reference': row.get('reference', ''),
+                'payment_date': payment_date,
+                'amount': amount,
+                'payment_method': method,
+            })
+        
+        if not lines:
+            return
+        
+        # Already recorded, either in an earlier import or earlier in this file
+        transaction_references = {line['transaction_reference'] for line in lines}
+        recorded = set(
+            Payment.objects.filter(
+                transaction_reference__in=transaction_references
+            ).values_list('transaction_reference', flat=True)
+        )
+        
+        candidates = set()
+        for line in lines:
+            candidates.update(filter(None, [line['reference'], line['transaction_reference']]))
+        
+        invoices = Invoice.objects.filter(invoice_number__in=candidates)
+        outstanding = Invoice.objects.filter(
+            student__admission_number__in=candidates,
+            status__in=[
+                Invoice.InvoiceStatus.UNPAID,
+                Invoice.InvoiceStatus.PARTIAL,
+                Invoice.InvoiceStatus.OVERDUE,
+            ]
+        ).order_by('due_date', 'id')
+        if not dry_run:
+            invoices = invoices.select_for_update()
+            outstanding = outstanding.select_for_update()
+        
+        invoice_fields = ('id', 'invoice_number', 'balance', 'status')
+        by_number = {invoice['invoice_number']: invoice for invoice in invoices.values(*invoice_fields)}
+        by_admission = {}
+        for invoice in outstanding.values(*invoice_fields, 'student__admission_number'):
+            by_admission.setdefault(invoice['student__admission_number'], invoice)
+        
+        balances = {}
+        matched = []
+        for line in lines:
+            reference = line['transaction_reference']
+            if reference in recorded or reference in seen_references:
+                self._note(report, 'duplicates', {
+                    'line': line['line'],
+                    'transaction_reference': reference,
+                    'amount': line['amount'],
+                })
+                continue
+            seen_references.add(reference)
+            
+            invoice = None
+            for candidate in filter(None, [line['reference'], reference]):
+                invoice = by_number.get(candidate) or by_admission.get(candidate)
+                if invoice:
+                    break
+            
+            if not invoice or invoice['status'] == Invoice.InvoiceStatus.CANCELLED:
+                self._note(report, 'unmatched', {
+                    'line': line['line'],
+                    'transaction_reference': reference,
+                    'reference': line['reference'],
+                    'amount': line['amount'],
+                    'reason': 'No matching invoice',
+                })
+                continue
+            
+            balance = balances.get(invoice['id'], invoice['balance'])
+            if line['amount'] > balance:
+                self._note(report, 'unmatched', {
+                    'line': line['line'],
+                    'transaction_reference': reference,
+                    'reference': line['reference'],
+                    'amount': line['amount'],
+                    'reason': f"Amount exceeds balance ({balance}) on {invoice['invoice_number']}",
+                })
+                continue
+            
+            balances[invoice['id']] = balance - line['amount']
+            matched.append((line, invoice))
+        
+        report['matched'] += len(matched)
+        report['matched_amount'] += sum((line['amount'] for line, invoice in matched), Decimal('0.00'))
+        
+        if dry_run or not matched:
+            return
+        
+        payment_numbers = PaymentService()._generate_payment_numbers(len(matched))
+        imported_at = timezone.now()
+        payments = []
+        amounts = {}
+        paid_at = {}
+        day_totals = {}
+        for (line, invoice), payment_number in zip(matched, payment_numbers):
+            payment_date = line['payment_date'] or imported_at
+            payments.append(Payment(
+                payment_number=payment_number,
+                invoice_id=invoice['id'],
+                amount_paid=line['amount'],
+                payment_method=line['payment_method'],
+                transaction_reference=line['transaction_reference'],
+                payment_date=payment_date,
+                remarks=f"Statement import, line {line['line']}",
+                received_by=received_by,
+            ))
+            amounts[invoice['id']] = amounts.get(invoice['id'], Decimal('0.00')) + line['amount']
+            # An invoice settled by several lines is paid on the latest of them
+            paid_at[invoice['id']] = max(paid_at.get(invoice['id'], payment_date), payment_date)
+            key = (timezone.localdate(payment_date), line['payment_method'])
+            total, count = day_totals.get(key, (Decimal('0.00'), 0))
+            day_totals[key] = (total + line['amount'], count + 1)
+        
+        # bulk_create bypasses Payment.save, so balances and rollups are applied here
+        Payment.objects.bulk_create(payments)
+        Invoice.apply_payments(amounts, paid_at)
+        for (day, method), (total, count) in day_totals.items():
+            FinanceDailyRollup.add(day, FinanceDailyRollup.Metric.REVENUE, method, total, count)
+
+
+class FinanceRollupService:
+    """Reads and rebuilds the daily finance rollup"""
+    
+    @staticmethod
+    def totals(start_date=None, end_date=None):
+        """
+        Totals per (metric, dimension) over an inclusive date range.
+        
+        Returns:
+            dict mapping metric to {dimension: {'amount', 'count'}}
+        """
+        rows = FinanceDailyRollup.objects.all()
+        if start_date and end_date:
+            rows = rows.filter(rollup_date__range=[start_date, end_date])
+        
+        totals = {metric: {} for metric in FinanceDailyRollup.Metric.values}
+        for row in rows.values('metric', 'dimension').annotate(
+            total=Sum('amount'), total_count=Sum('count')
+        ).order_by():
+            totals[row['metric']][row['dimension']] = {
+                'amount': row['total'] or Decimal('0.00'),
+                'count': row['total_count'] or 0,
+            }
+        return totals
+    
+    @staticmethod
+    def metric_total(totals, metric, field='amount'):
+        """Sum of one field across every dimension of a metric"""
+        default = Decimal('0.00') if field == 'amount' else 0
+        return sum((bucket[field] for bucket in totals[metric].values()), default)
+    
+    @transaction.atomic
+    def rebuild(self, start_date=None, end_date=None):
+        """
+        Recompute rollup rows from payments, expenditures and invoices.
+        
+        Args:
+            start_date: First day (date) to rebuild, all history when omitted
+            end_date: Last day (date) to rebuild
+        
+        Returns:
+            Number of rollup rows written
+        """
+        rollups = FinanceDailyRollup.objects.all()
+        payments = Payment.objects.annotate(day=TruncDate('payment_date'))
+        expenditures = Expenditure.objects.all()
+        invoices = Invoice.objects.annotate(day=TruncDate('created_at'))
+        if start_date and end_date:
+            rollups = rollups.filter(rollup_date__range=[start_date, end_date])
+            payments = filter_day_range(payments, 'payment_date', start_date, end_date)
+            expenditures = expenditures.filter(transaction_date__range=[start_date, end_date])
+            invoices = filter_day_range(invoices, 'created_at', start_date, end_date)
+        
+        rollups.delete()
+        buckets = {}
+        
+        def add(day, metric, dimension, amount, count):
+            key = (day, metric, dimension)
+            total, total_count = buckets.get(key, (Decimal('0.00'), 0))
+            buckets[key] = (total + amount, total_count + count)
+        
+        for row in payments.values('day', 'payment_method').annotate(
+            total=Sum('amount_paid'), total_count=Count('id')
+        ).order_by():
+            add(row['day'], FinanceDailyRollup.Metric.REVENUE, row['payment_method'], row['total'], row['total_count'])
+        
+        for row in expenditures.values('transaction_date', 'category').annotate(
+            total=Sum('amount'), total_count=Count('id')
+        ).order_by():
+            add(row['transaction_date'], FinanceDailyRollup.Metric.EXPENDITURE, row['category'], row['total'], row['total_count'])
+        
+        for row in invoices.values('day').annotate(
+            total=Sum('total_amount'), total_count=Count('id')
+        ).order_by():
+            add(row['day'], FinanceDailyRollup.Metric.INVOICES_ISSUED, '', row['total'], row['total_count'])
+        
+        # An invoice is counted as paid on the day its payments reach the total
+        paid_payments = Payment.objects.filter(invoice__status=Invoice.InvoiceStatus.PAID)
+        if start_date and end_date:
+            # Only invoices with a payment in range can close in range
+            paid_payments = paid_payments.filter(invoice_id__in=payments.values('invoice_id'))
+        paid_payments = paid_payments.order_by('invoice_id', 'payment_date', 'id').values_list(
+            'invoice_id', 'payment_date', 'amount_paid', 'invoice__total_amount'
+        )
+        current_invoice = None
+        running_total = Decimal('0.00')
+        for invoice_id, payment_date, amount_paid, total_amount in paid_payments.iterator(chunk_size=2000):
+            if invoice_id != current_invoice:
+                current_invoice = invoice_id
+                running_total = Decimal('0.00')
+            before = running_total
+            running_total += amount_paid
+            if before < total_amount <= running_total:
+                day = timezone.localdate(payment_date)
+                if not (start_date and end_date) or start_date <= day <= end_date:
+                    add(day, FinanceDailyRollup.Metric.INVOICES_PAID, '', total_amount, 1)
+        
+        FinanceDailyRollup.objects.bulk_create([
+            FinanceDailyRollup(rollup_date=day, metric=metric, dimension=dimension, amount=amount, count=count)
+            for (day, metric, dimension), (amount, count) in buckets.items()
+        ], batch_size=1000)
+        
+        return len(buckets)
+
+
+class ReceivablesAgingService:
+    """Outstanding balances bucketed by days past due"""
+    
+    BUCKETS = ['current', '0_30', '31_60', '61_90', '90_plus']
+    GROUP_BY = ['class', 'academic_year', 'term', 'student', 'none']
+    CACHE_TIMEOUT = 900
+    
+    def report(self, as_of, academic_year_id=None, term=None, class_id=None, group_by='class'):
+        """
+        Aging report as of a date, cached per (year, term, as-of date).
+        
+        Args:
+            as_of: Date the days past due are measured from
+            academic_year_id: Limit to one academic year (optional)
+            term: Limit to one term (optional)
+            class_id: Limit to students enrolled in one class (optional)
+            group_by: 'class', 'academic_year', 'term', 'student' or 'none'
+        
+        Returns:
+            dict with overall totals and one row per group
+        """
+        if group_by not in self.GROUP_BY:
+            raise ValidationError(f"group_by must be one of {', '.join(self.GROUP_BY)}")
+        
+        version = period_version(academic_year_id, term)
+        cache_key = (
+            f"finance:aging:{version}:{academic_year_id or 'all'}:{term or 'all'}:"
+            f"{as_of}:{class_id or 'all'}:{group_by}"
+        )
+        report = cache.get(cache_key)
+        if report is None:
+            report = self._build_report(as_of, academic_year_id, term, class_id, group_by)
+            cache.set(cache_key, report, self.CACHE_TIMEOUT)
+        return report
+    
+    def _build_report(self, as_of, academic_year_id, term, class_id, group_by):
+        invoices = Invoice.objects.filter(
+            status__in=[
+                Invoice.InvoiceStatus.UNPAID,
+                Invoice.InvoiceStatus.PARTIAL,
+                Invoice.InvoiceStatus.OVERDUE,
+            ],
+            balance__gt=0
+        )
+        if academic_year_id:
+            invoices = invoices.filter(academic_year_id=academic_year_id)
+        if term:
+            invoices = invoices.filter(term=term)
+        
+        if group_by == 'class' or class_id:
+            # The class the student was enrolled in for the invoice's academic year
+            invoices = invoices.annotate(
+                class_id=Subquery(
+                    Enrollment.objects.filter(
+                        student_id=OuterRef('student_id'),
+                        class_obj__academic_year_id=OuterRef('academic_year_id')
+                    ).order_by('-enrollment_date', '-id').values('class_obj_id')[:1]
+                )
+            )
+        if class_id:
+            invoices = invoices.filter(class_id=class_id)
+        
+        group_fields = {
+            'class': ['class_id'],
+            'academic_year': ['academic_year_id', 'academic_year__year_name'],
+            'term': ['term'],
+            'student': ['student_id', 'student__admission_number', 'student__first_name', 'student__last_name'],
+            'none': [],
+        }[group_by]
+        
+        cutoffs = [as_of - timedelta(days=days) for days in (30, 60, 90)]
+        bucket_filters = {
+            'current': Q(due_date__gte=as_of),
+            '0_30': Q(due_date__lt=as_of, due_date__gte=cutoffs[0]),
+            '31_60': Q(due_date__lt=cutoffs[0], due_date__gte=cutoffs[1]),
+            '61_90': Q(due_date__lt=cutoffs[1], due_date__gte=cutoffs[2]),
+            '90_plus': Q(due_date__lt=cutoffs[2]),
+        }
+        zero = Value(Decimal('0.00'), output_field=DecimalField(max_digits=12, decimal_places=2))
+        aggregates = {
+            bucket: Coalesce(Sum('balance', filter=condition), zero)
+            for bucket, condition in bucket_filters.items()
+        }
+        
+        # Every bucket for every group in one grouped query
+        if group_fields:
+            rows = list(
+                invoices.values(*group_fields).annotate(
+                    invoice_count=Count('id'), **aggregates
+                ).order_by(*group_fields)
+            )
+        else:
+            rows = [invoices.aggregate(invoice_count=Count('id'), **aggregates)]
+        
+        class_names = {}
+        if group_by == 'class':
+            class_names = dict(
+                Class.objects.filter(
+                    id__in=[row['class_id'] for row in rows if row['class_id']]
+                ).values_list('id', 'class_name')
+            )
+        
+        totals = {bucket: Decimal('0.00') for bucket in self.BUCKETS}
+        totals['invoice_count'] = 0
+        result_rows = []
+        for row in rows:
+            buckets = {bucket: row[bucket] for bucket in self.BUCKETS}
+            totals['invoice_count'] += row['invoice_count']
+            for bucket, amount in buckets.items():
+                totals[bucket] += amount
+            
+            entry = self._group_label(group_by, row, class_names)
+            entry.update(buckets)
+            entry['total'] = sum(buckets.values(), Decimal('0.00'))
+            entry['invoice_count'] = row['invoice_count']
+            result_rows.append(entry)
+        totals['total'] = sum((totals[bucket] for bucket in self.BUCKETS), Decimal('0.00'))
+        
+        return {
+            'as_of': as_of,
+            'academic_year_id': academic_year_id,
+            'term': term,
+            'class_id': class_id,
+            'group_by': group_by,
+            'totals': totals,
+            'rows': result_rows if group_fields else [],
+        }
+    
+    @staticmethod
+    def _group_label(group_by, row, class_names):
+        if group_by == 'class':
+            return {'class_id': row['class_id'], 'class_name': class_names.get(row['class_id'], 'Not enrolled')}
+        if group_by == 'academic_year':
+            return {'academic_year_id': row['academic_year_id'], 'year_name': row['academic_year__year_name']}
+        if group_by == 'term':
+            return {'term': row['term']}
+        if group_by == 'student':
+            return {
+                'student_id': row['student_id'],
+                'admission_number': row['student__admission_number'],
+                'student_name': f"{row['student__first_name']} {row['student__last_name']}",
+            }
+        return {}
+
+
+class StudentStatementService:
+    """Chronological account statement of a student's invoices and payments"""
+    
+    DETAIL_FIELDS = [
+        'invoice_number', 'academic_year', 'term', 'payment_method', 'transaction_reference', 'status'
+    ]
+    
+    def statement(self, student_id, start_date=None, end_date=None, compact=False):
+        """
+        Merge a student's invoices and payments with a running balance.
+        
+        Invoices are debits and payments are credits. The balance is a
+        window sum over the student's whole history, computed in a single
+        query, so a date range still reports the true balance on each line.
+        Cancelled invoices and their payments are left out.
+        
+        Args:
+            student_id: Student ID
+            start_date: First day to include (optional)
+            end_date: Last day to include (optional)
+            compact: Omit invoice/payment detail columns from each line
+        
+        Returns:
+            dict with opening/closing balance, totals and entries
+        """
+        invoices = connection.ops.quote_name(Invoice._meta.db_table)
+        payments = connection.ops.quote_name(Payment._meta.db_table)
+        academic_years = connection.ops.quote_name(AcademicYear._meta.db_table)
+        cancelled = Invoice.InvoiceStatus.CANCELLED
+        
+        start = day_range(start_date)[0] if start_date else None
+        end = day_range(end_date)[1] if end_date else None
+        
+        columns = (
+            "entry_type, entry_id, entry_date, sort_order, reference, invoice_number, "
+            "academic_year, term, payment_method, transaction_reference, status, debit, credit"
+        )
+        conditions, range_params = [], []
+        if start:
+            conditions.append("entry_date >= %s")
+            range_params.append(start)
+        if end:
+            conditions.append("entry_date < %s")
+            range_params.append(end)
+        
+        sql = f"""
+            WITH ledger AS (
+                SELECT {columns},
+                       SUM(debit - credit) OVER (
+                           ORDER BY entry_date, sort_order, entry_id
+                           ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+                       ) AS balance
+                FROM (
+                    SELECT 'invoice' AS entry_type, i.id AS entry_id, i.created_at AS entry_date,
+                           0 AS sort_order, i.invoice_number AS reference, i.invoice_number AS invoice_number,
+                           y.year_name AS academic_year, i.term AS term, '' AS payment_method,
+                           '' AS transaction_reference, i.status AS status,
+                           i.total_amount AS debit, 0 AS credit
+                    FROM {invoices} i
+                    JOIN {academic_years} y ON y.id = i.academic_year_id
+                    WHERE i.student_id = %s AND i.status <> %s
+                    UNION ALL
+                    SELECT 'payment', p.id, p.payment_date, 1, p.payment_number, i.invoice_number,
+                           y.year_name, i.term, p.payment_method, p.transaction_reference, '',
+                           0, p.amount_paid
+                    FROM {payments} p
+                    JOIN {invoices} i ON i.id = p.invoice_id
+                    JOIN {academic_years} y ON y.id = i.academic_year_id
+                    WHERE i.student_id = %s AND i.status <> %s
+                ) entries
+            )
+        """
+        params = [student_id, cancelled, student_id, cancelled]
+        
+        if start:
+            # Leading row carrying the balance brought forward
+            sql += """
+                SELECT 0 AS section, 'opening' AS entry_type, 0 AS entry_id, NULL AS entry_date, 0 AS sort_order,
+                       '' AS reference, '' AS invoice_number, '' AS academic_year, '' AS term,
+                       '' AS payment_method, '' AS transaction_reference, '' AS status,
+                       0 AS debit, 0 AS credit, COALESCE(SUM(debit - credit), 0) AS balance
+                FROM ledger WHERE entry_date < %s
+                UNION ALL
+            """
+            params.append(start)
+        
+        sql += f"""
+            SELECT 1 AS section, {columns}, balance FROM ledger
+            {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+            ORDER BY section, entry_date, sort_order, entry_id
+        """
+        params.extend(range_params)
+        
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            names = [column[0].lower() for column in cursor.description]
+            rows = [dict(zip(names, row)) for row in cursor.fetchall()]
+        
+        opening_balance = self._decimal(rows.pop(0)['balance']) if start else Decimal('0.00')
+        entries = []
+        total_debits = total_credits = Decimal('0.00')
+        for row in rows:
+            entry = {
+                'date': self._datetime(row['entry_date']),
+                'entry_type': row['entry_type'],
+                'entry_id': row['entry_id'],
+                'reference': row['reference'],
+                'debit': self._decimal(row['debit']),
+                'credit': self._decimal(row['credit']),
+                'balance': self._decimal(row['balance']),
+            }
+            if not compact:
+                entry.update({field: row[field] or '' for field in self.DETAIL_FIELDS})
+            total_debits += entry['debit']
+            total_credits += entry['credit']
+            entries.append(entry)
+        
+        return {
+            'student_id': student_id,
+            'start_date': start_date,
+            'end_date': end_date,
+            'opening_balance': opening_balance,
+            'total_debits': total_debits,
+            'total_credits': total_credits,
+            'closing_balance': opening_balance + total_debits - total_credits,
+            'entries': entries,
+        }
+    
+    @staticmethod
+    def _decimal(value):
+        return Decimal(str(value or 0)).quantize(Decimal('0.01'))
+    
+    @staticmethod
+    def _datetime(value):
+        # Raw cursors return driver values: strings on SQLite, naive UTC on MySQL
+        if isinstance(value, str):
+            value = parse_datetime(value)
+        if value is not None and settings.USE_TZ and timezone.is_naive(value):
+            value = timezone.make_aware(value, dt_timezone.utc)
+        return value
+
+
+class ExpenditureService:
+    """Service layer for Expenditure operations"""
+    
+    @staticmethod
+    def generate_expenditure_number():
+        """Generate unique expenditure number"""
+        today = datetime.now()
+        prefix = f"EXP-{today.strftime('%Y%m%d')}"
+        
+        new_number = SequenceService.next_value(
+            prefix, seed_model=Expenditure, seed_field='expenditure_number'
+        )
+        
+        return f"{prefix}-{new_number:04d}"
@@ -1,3 +1,866 @@
-from django.test import TestCase
+import csv
+import zipfile
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.academic.models import AcademicYear, Class, Enrollment
+from apps.students.models import Student
+from .dates import day_range, filter_day_range
+from .exports import CONTENT_TYPES, iterate_values
+from .models import DocumentSequence, Expenditure, FeeStructure, FinanceDailyRollup, Invoice, InvoiceItem, Payment
+from .services import (
+    FinanceRollupService, InvoiceService, PaymentService, ReceivablesAgingService, SequenceService,
+    StatementImportService, StudentStatementService
+)
 
-# Create your tests here.
+User = get_user_model()
+
+
+class FinanceTestCase(TestCase):
+    """Two classes of three students, a school-wide tuition fee and a term 1 lab fee for the first class"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='password', role='admin'
+        )
+        cls.academic_year = AcademicYear.objects.create(
+            year_name='2024/2025', start_date=date(2024, 9, 1), end_date=date(2025, 7, 31), is_current=True
+        )
+        cls.classes = [
+            Class.objects.create(class_name=f'Grade {level}', grade_level=level, academic_year=cls.academic_year)
+            for level in (1, 2)
+        ]
+        cls.students = []
+        for class_obj in cls.classes:
+            for roll_number in range(1, 4):
+                number = len(cls.students) + 1
+                student = Student.objects.create(
+                    admission_number=f'ADM{number:04d}', first_name=f'Student{number}', last_name='Test',
+                    date_of_birth=date(2012, 1, 1), gender='male', admission_date=date(2024, 9, 1)
+                )
+                Enrollment.objects.create(student=student, class_obj=class_obj, roll_number=roll_number)
+                cls.students.append(student)
+        FeeStructure.objects.create(
+            academic_year=cls.academic_year, category_name='Tuition', amount=Decimal('500.00')
+        )
+        FeeStructure.objects.create(
+            academic_year=cls.academic_year, class_obj=cls.classes[0], category_name='Lab',
+            amount=Decimal('50.00'), term='1'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def generate_invoices(self, term='1'):
+        return InvoiceService().generate_school_invoices(self.academic_year.id, term, self.admin)['invoices']
+
+
+class BulkInvoiceGenerationTests(FinanceTestCase):
+
+    def test_class_invoices_include_class_and_school_fees(self):
+        result = InvoiceService().generate_bulk_invoices(
+            self.classes[0].id, self.academic_year.id, '1', self.admin
+        )
+
+        self.assertEqual(result['errors'], [])
+        self.assertEqual(len(result['invoices']), 3)
+        for invoice in result['invoices']:
+            self.assertEqual(invoice.total_amount, Decimal('550.00'))
+            self.assertEqual(invoice.balance, Decimal('550.00'))
+            self.assertEqual(invoice.status, Invoice.InvoiceStatus.UNPAID)
+            self.assertEqual([item.description for item in invoice.items.all()], ['Lab', 'Tuition'])
+
+    def test_school_invoices_skip_students_already_invoiced(self):
+        InvoiceService().generate_invoice_for_student(self.students[0].id, self.academic_year.id, '1', self.admin)
+
+        result = InvoiceService().generate_school_invoices(self.academic_year.id, '1', self.admin)
+
+        self.assertEqual(len(result['invoices']), 5)
+        self.assertEqual(result['errors'], [{
+            'student': self.students[0].full_name,
+            'error': "Invoice already exists for this student and term"
+        }])
+        self.assertEqual(Invoice.objects.count(), 6)
+        # 3 first-class invoices with two items, 3 second-class invoices with one
+        self.assertEqual(InvoiceItem.objects.count(), 9)
+
+    def test_students_without_fees_are_reported(self):
+        FeeStructure.objects.filter(class_obj__isnull=True).delete()
+
+        result = InvoiceService().generate_school_invoices(self.academic_year.id, '1', self.admin)
+
+        self.assertEqual(len(result['invoices']), 3)
+        self.assertEqual(
+            [error['error'] for error in result['errors']],
+            ["No fee structures found for this student"] * 3
+        )
+
+    def test_query_count_does_not_grow_with_students(self):
+        # Create the number counters and rollup row up front, so both runs take the same path
+        for term in ('1', '2'):
+            InvoiceService().generate_invoice_for_student(self.students[0].id, self.academic_year.id, term, self.admin)
+
+        with CaptureQueriesContext(connection) as class_queries:
+            InvoiceService().generate_bulk_invoices(self.classes[0].id, self.academic_year.id, '1', self.admin)
+        with CaptureQueriesContext(connection) as school_queries:
+            InvoiceService().generate_school_invoices(self.academic_year.id, '2', self.admin)
+
+        self.assertEqual(len(school_queries), len(class_queries))
+
+    def test_school_wide_endpoint(self):
+        response = self.client.post('/invoices/bulk_generate/', {
+            'academic_year_id': self.academic_year.id, 'term': '2', 'school_wide': True
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['success'], 6)
+        self.assertEqual(response.data['errors'], 0)
+
+
+class SequenceServiceTests(FinanceTestCase):
+
+    def test_reserve_returns_consecutive_blocks(self):
+        self.assertEqual(list(SequenceService.reserve('TEST', 3)), [1, 2, 3])
+        self.assertEqual(list(SequenceService.reserve('TEST', 2)), [4, 5])
+        self.assertEqual(SequenceService.next_value('TEST'), 6)
+        self.assertEqual(DocumentSequence.objects.get(prefix='TEST').last_value, 6)
+
+    def test_reserve_rejects_empty_block(self):
+        with self.assertRaises(ValidationError):
+            SequenceService.reserve('TEST', 0)
+
+    def test_new_counter_continues_from_existing_numbers(self):
+        Invoice.objects.create(
+            invoice_number='INV-2024-1-00041', student=self.students[0], academic_year=self.academic_year,
+            term='1', total_amount=Decimal('10.00'), due_date=date(2025, 1, 31)
+        )
+
+        invoices = self.generate_invoices()
+
+        self.assertEqual(invoices[0].invoice_number, 'INV-2024-1-00042')
+        self.assertEqual(invoices[-1].invoice_number, 'INV-2024-1-00046')
+
+    def test_counter_created_concurrently_is_incremented(self):
+        def create_counter_first(*args):
+            # Another writer creates the counter between our UPDATE and INSERT
+            DocumentSequence.objects.create(prefix='TEST', last_value=5)
+            return 0
+
+        with mock.patch.object(SequenceService, '_existing_max', side_effect=create_counter_first):
+            numbers = SequenceService.reserve('TEST', 2)
+
+        self.assertEqual(list(numbers), [6, 7])
+        self.assertEqual(DocumentSequence.objects.get(prefix='TEST').last_value, 7)
+
+    def test_payment_numbers_are_unique_per_day(self):
+        service = PaymentService()
+        first, second = service._generate_payment_number(), service._generate_payment_number()
+
+        self.assertNotEqual(first, second)
+        self.assertTrue(second.endswith('-0002'))
+
+
+class PaymentDeltaTests(FinanceTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.invoice = self.generate_invoices()[0]
+        self.service = PaymentService()
+
+    def assertInvoice(self, amount_paid, balance, status, invoice=None):
+        invoice = invoice or self.invoice
+        invoice.refresh_from_db()
+        self.assertEqual((invoice.amount_paid, invoice.balance, invoice.status), (Decimal(amount_paid), Decimal(balance), status))
+
+    def test_payments_move_invoice_through_partial_to_paid(self):
+        self.service.record_payment(self.invoice.id, Decimal('100.00'), 'cash', received_by=self.admin)
+        self.assertInvoice('100.00', '450.00', Invoice.InvoiceStatus.PARTIAL)
+
+        self.service.record_payment(self.invoice.id, Decimal('450.00'), 'cash', received_by=self.admin)
+        self.assertInvoice('550.00', '0.00', Invoice.InvoiceStatus.PAID)
+
+    def test_overpayment_is_rejected(self):
+        with self.assertRaises(ValidationError):
+            self.service.record_payment(self.invoice.id, Decimal('550.01'), 'cash')
+        self.assertInvoice('0.00', '550.00', Invoice.InvoiceStatus.UNPAID)
+
+    def test_editing_and_deleting_payments_apply_the_difference(self):
+        payment = self.service.record_payment(self.invoice.id, Decimal('550.00'), 'cash')
+
+        payment.amount_paid = Decimal('50.00')
+        payment.save()
+        self.assertInvoice('50.00', '500.00', Invoice.InvoiceStatus.PARTIAL)
+
+        payment.delete()
+        self.assertInvoice('0.00', '550.00', Invoice.InvoiceStatus.UNPAID)
+
+    def test_moving_a_payment_updates_both_invoices(self):
+        other = Invoice.objects.exclude(id=self.invoice.id).first()
+        payment = self.service.record_payment(self.invoice.id, Decimal('100.00'), 'cash')
+
+        payment.invoice = other
+        payment.save()
+
+        self.assertInvoice('0.00', '550.00', Invoice.InvoiceStatus.UNPAID)
+        self.assertInvoice('100.00', str(other.total_amount - 100), Invoice.InvoiceStatus.PARTIAL, invoice=other)
+
+    def test_overdue_invoice_stays_overdue_until_paid(self):
+        Invoice.objects.filter(id=self.invoice.id).update(status=Invoice.InvoiceStatus.OVERDUE)
+
+        payment = self.service.record_payment(self.invoice.id, Decimal('100.00'), 'cash')
+        self.assertInvoice('100.00', '450.00', Invoice.InvoiceStatus.OVERDUE)
+
+        payment.amount_paid = Decimal('550.00')
+        payment.save()
+        self.assertInvoice('550.00', '0.00', Invoice.InvoiceStatus.PAID)
+
+    def test_cancelled_invoice_keeps_its_status(self):
+        Invoice.objects.filter(id=self.invoice.id).update(status=Invoice.InvoiceStatus.CANCELLED)
+
+        Invoice.apply_payment(self.invoice.id, Decimal('550.00'))
+
+        self.assertInvoice('550.00', '0.00', Invoice.InvoiceStatus.CANCELLED)
+
+    def test_apply_payments_locks_the_invoices(self):
+        with mock.patch.object(QuerySet, 'select_for_update', autospec=True, side_effect=lambda qs: qs) as lock:
+            Invoice.apply_payments({self.invoice.id: Decimal('10.00')})
+
+        lock.assert_called_once()
+        self.assertInvoice('10.00', '540.00', Invoice.InvoiceStatus.PARTIAL)
+
+
+class ReconcileInvoiceBalancesTests(FinanceTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.invoices = self.generate_invoices()
+        PaymentService().record_payment(self.invoices[0].id, Decimal('100.00'), 'cash')
+        Invoice.objects.filter(id=self.invoices[0].id).update(
+            amount_paid=Decimal('7.00'), balance=Decimal('3.00'), status=Invoice.InvoiceStatus.PAID
+        )
+
+    def test_drift_is_repaired(self):
+        out = StringIO()
+        call_command('reconcile_invoice_balances', chunk_size=2, stdout=out)
+
+        invoice = Invoice.objects.get(id=self.invoices[0].id)
+        self.assertEqual(
+            (invoice.amount_paid, invoice.balance, invoice.status),
+            (Decimal('100.00'), Decimal('450.00'), Invoice.InvoiceStatus.PARTIAL)
+        )
+        self.assertIn("Checked 6 invoices, 1 repaired", out.getvalue())
+
+    def test_dry_run_only_reports(self):
+        out = StringIO()
+        call_command('reconcile_invoice_balances', '--dry-run', stdout=out)
+
+        self.assertEqual(Invoice.objects.get(id=self.invoices[0].id).amount_paid, Decimal('7.00'))
+        self.assertIn("1 would be repaired", out.getvalue())
+
+    def test_each_chunk_is_locked_in_its_own_transaction(self):
+        with mock.patch.object(QuerySet, 'select_for_update', autospec=True, side_effect=lambda qs: qs) as lock, \
+                mock.patch('apps.finance.management.commands.reconcile_invoice_balances.transaction.atomic',
+                           wraps=transaction.atomic) as atomic:
+            call_command('reconcile_invoice_balances', chunk_size=2, stdout=StringIO())
+
+        # Three chunks of two invoices plus the empty chunk that ends the loop,
+        # and the transaction bulk_update opens for the one repair
+        self.assertEqual(lock.call_count, 4)
+        self.assertEqual(atomic.call_count, 5)
+
+
+class StatementImportTests(FinanceTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.invoices = self.generate_invoices()
+        self.service = StatementImportService()
+
+    def import_lines(self, lines, **kwargs):
+        rows = [dict(zip(('transaction_reference', 'reference', 'amount', 'date'), line)) for line in lines]
+        return self.service.import_statement(rows, Payment.PaymentMethod.BANK_TRANSFER, received_by=self.admin, **kwargs)
+
+    def test_lines_match_invoice_and_admission_numbers(self):
+        report = self.import_lines([
+            ('T1', self.invoices[0].invoice_number, '100', '2025-01-15'),
+            ('T2', self.students[4].admission_number, '1,00', ''),
+        ])
+
+        self.assertEqual((report['matched'], report['matched_amount']), (2, Decimal('200.00')))
+        self.invoices[0].refresh_from_db()
+        self.assertEqual(self.invoices[0].balance, Decimal('450.00'))
+        self.assertEqual(Invoice.objects.get(student=self.students[4], term='1').amount_paid, Decimal('100.00'))
+        self.assertEqual(
+            Payment.objects.get(transaction_reference='T1').remarks, "Statement import, line 2"
+        )
+
+    def test_payment_date_comes_from_the_statement(self):
+        self.import_lines([
+            ('T1', self.invoices[0].invoice_number, '10', '2025-01-15'),
+            ('T2', self.invoices[0].invoice_number, '10', '2025-01-16T09:30:00'),
+        ])
+
+        dates = dict(Payment.objects.values_list('transaction_reference', 'payment_date'))
+        self.assertEqual(timezone.localtime(dates['T1']).date(), date(2025, 1, 15))
+        self.assertEqual(timezone.localtime(dates['T2']).time(), time(9, 30))
+        self.assertEqual(
+            FinanceDailyRollup.objects.get(
+                rollup_date=date(2025, 1, 15), metric=FinanceDailyRollup.Metric.REVENUE
+            ).amount,
+            Decimal('10.00')
+        )
+
+    def test_settled_invoices_count_as_paid_on_the_statement_date(self):
+        self.import_lines([
+            ('T1', self.invoices[0].invoice_number, '300', '2025-01-15'),
+            ('T2', self.invoices[0].invoice_number, '250', '2025-01-20'),
+        ])
+
+        paid = FinanceDailyRollup.objects.get(metric=FinanceDailyRollup.Metric.INVOICES_PAID)
+        self.assertEqual((paid.rollup_date, paid.count), (date(2025, 1, 20), 1))
+        rows = FinanceDailyRollup.objects.values_list('rollup_date', 'metric', 'dimension', 'amount', 'count')
+        incremental = sorted(rows)
+        FinanceRollupService().rebuild()
+        self.assertEqual(sorted(rows.all()), incremental)
+
+    def test_duplicates_unmatched_and_invalid_lines_are_reported(self):
+        PaymentService().record_payment(self.invoices[1].id, Decimal('5.00'), 'cash', transaction_reference='OLD')
+
+        report = self.import_lines([
+            ('T1', self.invoices[0].invoice_number, '100', ''),
+            ('T1', self.invoices[0].invoice_number, '100', ''),
+            ('OLD', self.invoices[1].invoice_number, '5', ''),
+            ('T3', 'NOPE', '5', ''),
+            ('T4', self.invoices[0].invoice_number, '9999', ''),
+            ('T5', '', 'abc', ''),
+            ('T6', self.invoices[0].invoice_number, '5', '2025-13-01'),
+        ])
+
+        self.assertEqual(report['matched'], 1)
+        self.assertEqual(report['duplicates_count'], 2)
+        self.assertEqual([line['reason'] for line in report['unmatched']], [
+            'No matching invoice', 'Amount exceeds balance (450.00) on ' + self.invoices[0].invoice_number
+        ])
+        self.assertEqual([line['error'] for line in report['errors']], [
+            "Invalid amount 'abc'", "Invalid date '2025-13-01'"
+        ])
+
+    def test_balance_is_tracked_across_lines_and_chunks(self):
+        number = self.invoices[0].invoice_number
+
+        report = self.import_lines([('T1', number, '300', ''), ('T2', number, '300', ''), ('T3', number, '250', '')], chunk_size=1)
+
+        self.assertEqual(report['matched'], 2)
+        self.assertEqual(report['unmatched'][0]['transaction_reference'], 'T2')
+        self.invoices[0].refresh_from_db()
+        self.assertEqual(self.invoices[0].status, Invoice.InvoiceStatus.PAID)
+
+    def test_dry_run_writes_nothing(self):
+        report = self.import_lines([('T1', self.invoices[0].invoice_number, '100', '')], dry_run=True)
+
+        self.assertEqual(report['matched'], 1)
+        self.assertFalse(Payment.objects.exists())
+
+    def test_detail_lists_are_capped(self):
+        with mock.patch.object(StatementImportService, 'MAX_DETAILS', 2):
+            report = self.import_lines([(f'T{n}', 'NOPE', '1', '') for n in range(5)])
+
+        self.assertEqual(report['unmatched_count'], 5)
+        self.assertEqual(len(report['unmatched']), 2)
+
+    def test_upload_endpoint(self):
+        statement = SimpleUploadedFile(
+            'statement.csv', f"Transaction_Reference,Reference,Amount\nZ1,{self.invoices[3].invoice_number},10\n".encode()
+        )
+
+        response = self.client.post(
+            '/payments/import_statement/', {'file': statement, 'payment_method': 'mobile_money'}, format='multipart'
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['matched'], 1)
+        self.assertEqual(Payment.objects.get().payment_method, 'mobile_money')
+
+    def test_upload_without_required_columns_is_rejected(self):
+        statement = SimpleUploadedFile('statement.csv', b"a,b\n1,2\n")
+
+        response = self.client.post('/payments/import_statement/', {'file': statement}, format='multipart')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('amount, transaction_reference', response.data['error'])
+
+
+class FinanceRollupTests(FinanceTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.invoices = self.generate_invoices()
+        service = PaymentService()
+        service.record_payment(self.invoices[0].id, Decimal('550.00'), 'cash', received_by=self.admin)
+        payment = service.record_payment(self.invoices[1].id, Decimal('100.00'), 'mobile_money', received_by=self.admin)
+        payment.amount_paid = Decimal('120.00')
+        payment.save()
+        Expenditure.objects.create(
+            expenditure_number='EXP-1', item_name='Chalk', category='supplies',
+            amount=Decimal('30.00'), transaction_date=timezone.localdate()
+        )
+
+    def rollup_rows(self):
+        return sorted(FinanceDailyRollup.objects.values_list('rollup_date', 'metric', 'dimension', 'amount', 'count'))
+
+    def test_writes_keep_the_rollup_current(self):
+        totals = FinanceRollupService.totals()
+        Metric = FinanceDailyRollup.Metric
+
+        self.assertEqual(totals[Metric.REVENUE]['cash'], {'amount': Decimal('550.00'), 'count': 1})
+        self.assertEqual(totals[Metric.REVENUE]['mobile_money'], {'amount': Decimal('120.00'), 'count': 1})
+        self.assertEqual(totals[Metric.EXPENDITURE]['supplies'], {'amount': Decimal('30.00'), 'count': 1})
+        self.assertEqual(FinanceRollupService.metric_total(totals, Metric.INVOICES_ISSUED, 'count'), 6)
+        self.assertEqual(FinanceRollupService.metric_total(totals, Metric.INVOICES_PAID, 'count'), 1)
+
+    def test_reversing_a_payment_reverses_the_rollup(self):
+        Payment.objects.get(invoice=self.invoices[0]).delete()
+
+        totals = FinanceRollupService.totals()
+        self.assertEqual(totals[FinanceDailyRollup.Metric.REVENUE]['cash'], {'amount': Decimal('0.00'), 'count': 0})
+        self.assertEqual(FinanceRollupService.metric_total(totals, FinanceDailyRollup.Metric.INVOICES_PAID, 'count'), 0)
+
+    def test_rebuild_matches_incremental_rollup(self):
+        incremental = self.rollup_rows()
+
+        call_command('rebuild_finance_rollups', stdout=StringIO())
+        self.assertEqual(self.rollup_rows(), incremental)
+
+        today = str(timezone.localdate())
+        call_command('rebuild_finance_rollups', '--start-date', today, '--end-date', today, stdout=StringIO())
+        self.assertEqual(self.rollup_rows(), incremental)
+
+    def test_back_dated_payments_count_invoices_paid_on_the_payment_date(self):
+        paid_at = timezone.now() - timedelta(days=10)
+        payment = Payment.objects.create(
+            payment_number='PAY-BACK-1', invoice=self.invoices[2], amount_paid=self.invoices[2].balance,
+            payment_method='cash', payment_date=paid_at
+        )
+        paid = FinanceDailyRollup.objects.filter(metric=FinanceDailyRollup.Metric.INVOICES_PAID)
+        self.assertEqual(paid.get(rollup_date=timezone.localdate(paid_at)).count, 1)
+        incremental = self.rollup_rows()
+
+        FinanceRollupService().rebuild()
+
+        self.assertEqual(self.rollup_rows(), incremental)
+        payment.delete()
+        self.assertEqual(paid.get(rollup_date=timezone.localdate(paid_at)).count, 0)
+
+    def test_range_rebuild_only_walks_invoices_paid_in_range(self):
+        Payment.objects.create(
+            payment_number='PAY-BACK-1', invoice=self.invoices[2], amount_paid=self.invoices[2].balance,
+            payment_method='cash', payment_date=timezone.now() - timedelta(days=10)
+        )
+        incremental = self.rollup_rows()
+        today = timezone.localdate()
+
+        with CaptureQueriesContext(connection) as queries:
+            FinanceRollupService().rebuild(today, today)
+
+        self.assertEqual(self.rollup_rows(), incremental)
+        walk = next(query['sql'] for query in queries if 'ORDER BY' in query['sql'] and 'payment_date' in query['sql'])
+        self.assertIn('invoice_id" IN (SELECT', walk)
+
+    def test_rebuild_repairs_a_drifted_rollup(self):
+        incremental = self.rollup_rows()
+        FinanceDailyRollup.objects.update(amount=Decimal('1.00'))
+
+        FinanceRollupService().rebuild()
+
+        self.assertEqual(self.rollup_rows(), incremental)
+
+    def test_rebuild_requires_both_dates(self):
+        with self.assertRaises(CommandError):
+            call_command('rebuild_finance_rollups', '--start-date', '2025-01-01')
+
+    def test_dashboard_summary_reads_the_rollup(self):
+        response = self.client.get('/financial-dashboard/summary/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_revenue'], '670.00')
+        self.assertEqual(response.data['net_income'], '640.00')
+        self.assertEqual(response.data['invoices_issued'], 6)
+        self.assertEqual(response.data['invoices_settled'], 1)
+
+    def test_category_summary_reads_the_rollup_and_rejects_bad_dates(self):
+        today = str(timezone.localdate())
+
+        response = self.client.get('/expenditures/category_summary/', {'start_date': today, 'end_date': today})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_expenditure'], Decimal('30.00'))
+        self.assertEqual(response.data['by_category'], [{'category': 'supplies', 'total': Decimal('30.00'), 'count': 1}])
+        response = self.client.get('/expenditures/category_summary/', {'start_date': '2025-13-01', 'end_date': today})
+        self.assertEqual(response.status_code, 400)
+
+
+class ReceivablesAgingTests(FinanceTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.invoices = self.generate_invoices()
+        self.today = timezone.localdate()
+        # One invoice per bucket in the first class, the second class not yet due
+        for invoice, days in zip(self.invoices, [-5, 10, 45, 75, 200]):
+            Invoice.objects.filter(id=invoice.id).update(due_date=self.today - timedelta(days=days))
+
+    def aging(self, **params):
+        return self.client.get('/invoices/aging/', {'academic_year_id': self.academic_year.id, 'term': '1', **params})
+
+    def test_balances_are_bucketed_by_days_past_due(self):
+        response = self.aging()
+
+        self.assertEqual(response.status_code, 200)
+        totals = response.data['totals']
+        self.assertEqual(
+            [totals[bucket] for bucket in ReceivablesAgingService.BUCKETS],
+            [Decimal('1050.00'), Decimal('550.00'), Decimal('550.00'), Decimal('500.00'), Decimal('500.00')]
+        )
+        self.assertEqual((totals['invoice_count'], totals['total']), (6, Decimal('3150.00')))
+        self.assertEqual(
+            [(row['class_name'], row['total']) for row in response.data['rows']],
+            [('Grade 1', Decimal('1650.00')), ('Grade 2', Decimal('1500.00'))]
+        )
+
+    def test_report_is_cached_until_a_payment_changes_the_period(self):
+        self.aging()
+        with self.assertNumQueries(0):
+            self.aging()
+
+        PaymentService().record_payment(self.invoices[4].id, Decimal('100.00'), 'cash')
+
+        self.assertEqual(self.aging().data['totals']['90_plus'], Decimal('400.00'))
+
+    def test_paid_and_cancelled_invoices_are_left_out(self):
+        PaymentService().record_payment(self.invoices[0].id, Decimal('550.00'), 'cash')
+        Invoice.objects.filter(id=self.invoices[1].id).update(status=Invoice.InvoiceStatus.CANCELLED)
+
+        totals = self.aging(group_by='none').data['totals']
+
+        self.assertEqual(totals['invoice_count'], 4)
+        self.assertEqual(totals['current'], Decimal('500.00'))
+        self.assertEqual(totals['0_30'], Decimal('0.00'))
+
+    def test_student_rows_limited_to_a_class(self):
+        rows = self.aging(group_by='student', class_id=self.classes[1].id).data['rows']
+
+        self.assertEqual([row['admission_number'] for row in rows], ['ADM0004', 'ADM0005', 'ADM0006'])
+
+    def test_invalid_parameters_are_rejected(self):
+        self.assertEqual(self.aging(group_by='teacher').status_code, 400)
+        self.assertEqual(self.aging(as_of='yesterday').status_code, 400)
+
+
+class OverdueSweepTests(FinanceTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.invoices = self.generate_invoices()
+        self.today = timezone.localdate()
+        Invoice.objects.filter(id__in=[invoice.id for invoice in self.invoices[:4]]).update(
+            due_date=self.today - timedelta(days=3)
+        )
+
+    def statuses(self):
+        return list(Invoice.objects.filter(
+            id__in=[invoice.id for invoice in self.invoices]
+        ).order_by('id').values_list('status', flat=True))
+
+    def test_past_due_invoices_are_marked_in_batches(self):
+        result = InvoiceService().sweep_overdue(batch_size=3)
+
+        self.assertEqual((result['marked_overdue'], result['cleared_overdue']), (4, 0))
+        self.assertEqual(self.statuses(), ['overdue'] * 4 + ['unpaid'] * 2)
+        self.assertEqual(InvoiceService().sweep_overdue()['marked_overdue'], 0)
+
+    def test_paid_and_extended_invoices_are_cleared(self):
+        InvoiceService().sweep_overdue()
+        PaymentService().record_payment(self.invoices[0].id, Decimal('100.00'), 'cash')
+        Invoice.objects.filter(id=self.invoices[1].id).update(
+            status=Invoice.InvoiceStatus.OVERDUE, amount_paid=Decimal('550.00'), balance=Decimal('0.00')
+        )
+        Invoice.objects.filter(id=self.invoices[2].id).update(due_date=self.today + timedelta(days=3))
+
+        result = InvoiceService().sweep_overdue()
+
+        self.assertEqual(result['cleared_overdue'], 2)
+        self.assertEqual(self.statuses(), ['overdue', 'paid', 'unpaid', 'overdue', 'unpaid', 'unpaid'])
+
+        Invoice.objects.filter(id=self.invoices[0].id).update(due_date=self.today)
+        InvoiceService().sweep_overdue()
+        self.assertEqual(self.statuses()[0], 'partial')
+
+    def test_command_and_overdue_filter(self):
+        out = StringIO()
+        call_command('sweep_overdue_invoices', '--as-of', str(self.today), stdout=out)
+
+        self.assertIn("4 marked overdue, 0 cleared", out.getvalue())
+        self.assertEqual(self.client.get('/invoices/', {'overdue': 'true'}).data['count'], 4)
+        with self.assertRaises(CommandError):
+            call_command('sweep_overdue_invoices', '--as-of', 'tomorrow')
+
+
+class ExportTests(FinanceTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.invoices = self.generate_invoices()
+
+    def download(self, url, **params):
+        response = self.client.get(url, params)
+        return response, b''.join(response.streaming_content)
+
+    def test_invoice_csv_follows_the_list_filters(self):
+        response, body = self.download('/invoices/export/', term='1', status='unpaid')
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertRegex(response['Content-Disposition'], r'attachment; filename="invoices-\d{8}-\d{6}\.csv"')
+        rows = list(csv.reader(StringIO(body.decode())))
+        self.assertEqual(rows[0][:3], ['Invoice Number', 'Admission Number', 'First Name'])
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(sorted(row[0] for row in rows[1:]), [invoice.invoice_number for invoice in self.invoices])
+
+    def test_formula_cells_are_neutralised(self):
+        PaymentService().record_payment(
+            self.invoices[0].id, Decimal('100.00'), 'cash', transaction_reference='=HYPERLINK("x")'
+        )
+
+        _, body = self.download('/payments/export/')
+
+        rows = list(csv.reader(StringIO(body.decode())))
+        self.assertEqual(rows[1][5], '\'=HYPERLINK("x")')
+        self.assertEqual(rows[1][3], '100.00')
+
+    def test_xlsx_workbook(self):
+        response, body = self.download('/invoices/export/', file_format='xlsx')
+
+        self.assertEqual(response['Content-Type'], CONTENT_TYPES['xlsx'])
+        workbook = zipfile.ZipFile(BytesIO(body))
+        self.assertIn('xl/worksheets/sheet1.xml', workbook.namelist())
+        sheet = workbook.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(sheet.count('<row>'), 7)
+        self.assertIn('<c><v>550.00</v></c>', sheet)
+
+    def test_unknown_format_is_rejected(self):
+        response = self.client.get('/expenditures/export/', {'file_format': 'pdf'})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_rows_are_read_in_bounded_chunks(self):
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(iterate_values(Invoice.objects.all(), ['invoice_number'], chunk_size=4))
+
+        self.assertEqual(sorted(rows), [[invoice.invoice_number] for invoice in self.invoices])
+        # Two full or partial chunks and the empty one that ends the loop
+        self.assertEqual(len(queries), 3)
+
+
+class StudentStatementTests(FinanceTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.student = self.students[0]
+        term_1 = self.generate_invoices('1')[0]
+        term_2 = self.generate_invoices('2')[0]
+        service = PaymentService()
+        first = service.record_payment(term_1.id, Decimal('100.00'), 'cash')
+        service.record_payment(term_2.id, Decimal('50.25'), 'mobile_money', transaction_reference='MM1')
+        self.now = timezone.now()
+        Invoice.objects.filter(id=term_1.id).update(created_at=self.now - timedelta(days=10))
+        Payment.objects.filter(id=first.id).update(payment_date=self.now - timedelta(days=5))
+
+    def test_entries_carry_a_running_balance(self):
+        statement = StudentStatementService().statement(self.student.id)
+
+        self.assertEqual(
+            [(entry['entry_type'], entry['debit'], entry['credit'], entry['balance']) for entry in statement['entries']],
+            [
+                ('invoice', Decimal('550.00'), Decimal('0.00'), Decimal('550.00')),
+                ('payment', Decimal('0.00'), Decimal('100.00'), Decimal('450.00')),
+                ('invoice', Decimal('500.00'), Decimal('0.00'), Decimal('950.00')),
+                ('payment', Decimal('0.00'), Decimal('50.25'), Decimal('899.75')),
+            ]
+        )
+        self.assertEqual(statement['closing_balance'], Decimal('899.75'))
+        self.assertEqual(statement['entries'][3]['transaction_reference'], 'MM1')
+        self.assertIsNotNone(statement['entries'][0]['date'].tzinfo)
+
+    def test_date_range_brings_the_balance_forward(self):
+        statement = StudentStatementService().statement(
+            self.student.id, start_date=timezone.localdate(self.now - timedelta(days=7)), compact=True
+        )
+
+        self.assertEqual(statement['opening_balance'], Decimal('550.00'))
+        self.assertEqual(len(statement['entries']), 3)
+        self.assertEqual(statement['entries'][0]['balance'], Decimal('450.00'))
+        self.assertEqual(statement['closing_balance'], Decimal('899.75'))
+        self.assertNotIn('invoice_number', statement['entries'][0])
+
+    def test_cancelled_invoices_and_their_payments_are_left_out(self):
+        Invoice.objects.filter(student=self.student, term='2').update(status=Invoice.InvoiceStatus.CANCELLED)
+
+        statement = StudentStatementService().statement(self.student.id)
+
+        self.assertEqual(len(statement['entries']), 2)
+        self.assertEqual(statement['closing_balance'], Decimal('450.00'))
+
+    def test_endpoint(self):
+        response = self.client.get(f'/students/{self.student.id}/statement/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['admission_number'], 'ADM0001')
+        self.assertEqual(response.data['closing_balance'], Decimal('899.75'))
+        self.assertEqual(
+            self.client.get(f'/students/{self.student.id}/statement/', {'start_date': 'bad'}).status_code, 400
+        )
+
+
+class KeysetPaginationTests(FinanceTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.invoices = self.generate_invoices()
+        paid_at = timezone.now()
+        # Many payments share a payment_date, so pages must break ties on id
+        Payment.objects.bulk_create([
+            Payment(
+                payment_number=f'PAY-TEST-{number:04d}', invoice=self.invoices[number % 6],
+                amount_paid=Decimal('1.00'), payment_method='cash',
+                payment_date=paid_at - timedelta(days=number // 10)
+            )
+            for number in range(45)
+        ])
+        self.expected = list(Payment.objects.order_by('-payment_date', '-id').values_list('id', flat=True))
+
+    def test_pages_cover_every_row_once_in_order(self):
+        seen = []
+        url = '/payments/?pagination=cursor'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            seen += [payment['id'] for payment in response.data['results']]
+            url = response.data['next']
+
+        self.assertEqual(seen, self.expected)
+
+    def test_previous_link_returns_the_page_before(self):
+        first = self.client.get('/payments/?pagination=cursor').data
+        second = self.client.get(first['next']).data
+        third = self.client.get(second['next']).data
+
+        self.assertIsNone(first['previous'])
+        self.assertIsNone(third['next'])
+        back = self.client.get(third['previous']).data
+        self.assertEqual([payment['id'] for payment in back['results']], self.expected[20:40])
+        self.assertIsNotNone(back['next'])
+        self.assertIsNotNone(back['previous'])
+
+    def test_filters_are_kept_across_pages(self):
+        response = self.client.get('/invoices/', {'pagination': 'cursor', 'term': '1'})
+
+        self.assertEqual(len(response.data['results']), 6)
+        self.assertIsNone(response.data['next'])
+
+    def test_accept_header_opts_in_and_page_numbers_stay_the_default(self):
+        keyset = self.client.get('/payments/', HTTP_ACCEPT='application/json; pagination=cursor')
+        numbered = self.client.get('/payments/')
+
+        self.assertEqual(sorted(keyset.data), ['next', 'previous', 'results'])
+        self.assertEqual(numbered.data['count'], 45)
+
+    def test_invalid_cursor_is_not_found(self):
+        self.assertEqual(self.client.get('/payments/', {'cursor': 'zzz'}).status_code, 404)
+
+
+class DayRangeTests(FinanceTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.invoices = self.generate_invoices()
+        self.today = timezone.localdate()
+        self.yesterday = self.today - timedelta(days=1)
+        service = PaymentService()
+        service.record_payment(self.invoices[0].id, Decimal('10.00'), 'cash')
+        service.record_payment(self.invoices[1].id, Decimal('20.00'), 'mobile_money')
+        late = service.record_payment(self.invoices[2].id, Decimal('30.00'), 'cash')
+        # The last instant of yesterday, which a __range on bare dates would miss
+        Payment.objects.filter(id=late.id).update(
+            payment_date=timezone.make_aware(datetime.combine(self.yesterday, time.max))
+        )
+
+    def test_day_range_is_half_open_over_whole_days(self):
+        start, end = day_range('2025-03-01', date(2025, 3, 2))
+
+        self.assertEqual((start.date(), start.time()), (date(2025, 3, 1), time.min))
+        self.assertEqual((end.date(), end.time()), (date(2025, 3, 3), time.min))
+        self.assertTrue(timezone.is_aware(start))
+        with self.assertRaises(ValueError):
+            day_range('2025-03-02', '2025-03-01')
+        with self.assertRaises(ValueError):
+            day_range('2025-02-30')
+
+    @override_settings(TIME_ZONE='Africa/Nairobi')
+    def test_days_follow_the_local_time_zone(self):
+        start, end = day_range('2025-03-01')
+
+        self.assertEqual(start, datetime(2025, 2, 28, 21, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual(end - start, timedelta(days=1))
+
+    def test_filter_includes_the_end_of_the_last_day(self):
+        payments = filter_day_range(Payment.objects.all(), 'payment_date', self.yesterday, self.yesterday)
+
+        self.assertEqual(list(payments.values_list('amount_paid', flat=True)), [Decimal('30.00')])
+        self.assertEqual(filter_day_range(Payment.objects.all(), 'payment_date', start_date=self.yesterday).count(), 3)
+
+    def test_daily_collection(self):
+        response = self.client.get('/payments/daily_collection/')
+
+        self.assertEqual(response.data['total_collection'], Decimal('30.00'))
+        self.assertEqual(response.data['total_transactions'], 2)
+        self.assertEqual(
+            self.client.get('/payments/daily_collection/', {'date': str(self.yesterday)}).data['total_collection'],
+            Decimal('30.00')
+        )
+
+    def test_cash_up_lists_every_day_and_method(self):
+        response = self.client.get('/payments/cash_up/', {
+            'start_date': str(self.yesterday - timedelta(days=1)), 'end_date': str(self.today)
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(day['date'], day['total_collection']) for day in response.data['days']],
+            [(self.yesterday - timedelta(days=1), Decimal('0.00')), (self.yesterday, Decimal('30.00')),
+             (self.today, Decimal('30.00'))]
+        )
+        self.assertEqual(response.data['by_payment_method']['cash'], {'count': 2, 'total': Decimal('40.00')})
+        self.assertEqual(response.data['total_collection'], Decimal('60.00'))
+
+    def test_invalid_ranges_are_rejected(self):
+        self.assertEqual(self.client.get('/payments/cash_up/', {'start_date': '2020-01-01'}).status_code, 400)
+        self.assertEqual(self.client.get('/payments/cash_up/', {
+            'start_date': str(self.today), 'end_date': str(self.yesterday)
+        }).status_code, 400)
+        self.assertEqual(self.client.get('/payments/', {'start_date': str(self.today), 'end_date': 'bad'}).status_code, 400)
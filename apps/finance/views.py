@@ -2,17 +2,28 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
 from django.db.models import Sum, Q, Count
+from django.db.models.functions import ExtractMonth, TruncDate
+from django.utils import timezone
 from decimal import Decimal
 from datetime import datetime, timedelta
-from .models import FeeStructure, Invoice, InvoiceItem, Payment, Expenditure
+import io
+from .models import FeeStructure, Invoice, InvoiceItem, Payment, Expenditure, FinanceDailyRollup
+from .exports import CONTENT_TYPES, iterate_values, export_response
+from .dates import to_date, day_range, filter_day_range
 from .serializers import (
     FeeStructureSerializer, InvoiceSerializer, InvoiceItemSerializer,
     PaymentSerializer, PaymentCreateSerializer, ExpenditureSerializer,
     FinancialSummarySerializer
 )
-from .services import InvoiceService, PaymentService
+from .services import (
+    InvoiceService, PaymentService, ExpenditureService,
+    StatementImportService, FinanceRollupService, ReceivablesAgingService
+)
 from apps.accounts.permissions import CanManageFinance
+from apps.accounts.idempotency import idempotent
+from config.pagination import OptionalKeysetPaginationMixin
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 
 
@@ -44,12 +55,63 @@ class FeeStructureViewSet(viewsets.ModelViewSet):
         return queryset
 
 
-class InvoiceViewSet(viewsets.ModelViewSet):
+class ExportMixin:
+    """
+    Adds a streaming /export/ action to a viewset.
+    
+    Subclasses define export_columns as (header, field) pairs; rows are read
+    from the filtered queryset with .values() in bounded chunks.
+    """
+    
+    export_columns = []
+    export_filename = 'export'
+    
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name='file_format', type=str, description='csv (default) or xlsx'),
+        ],
+        description="Stream the filtered list as a CSV or XLSX download"
+    )
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream the filtered list as a file"""
+        file_format = request.query_params.get('file_format', 'csv').lower()
+        if file_format not in CONTENT_TYPES:
+            return Response(
+                {'error': f"file_format must be one of {', '.join(CONTENT_TYPES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        queryset = self.filter_queryset(self.get_queryset())
+        headers = [header for header, _ in self.export_columns]
+        fields = [field for _, field in self.export_columns]
+        filename = f"{self.export_filename}-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        
+        return export_response(iterate_values(queryset, fields), headers, filename, file_format)
+
+
+class InvoiceViewSet(OptionalKeysetPaginationMixin, ExportMixin, viewsets.ModelViewSet):
     """ViewSet for Invoice management"""
     
     queryset = Invoice.objects.select_related('student', 'academic_year', 'generated_by').prefetch_related('items').all()
     serializer_class = InvoiceSerializer
     permission_classes = [IsAuthenticated, CanManageFinance]
+    keyset_ordering = ('-created_at', '-id')
+    export_filename = 'invoices'
+    export_columns = [
+        ('Invoice Number', 'invoice_number'),
+        ('Admission Number', 'student__admission_number'),
+        ('First Name', 'student__first_name'),
+        ('Last Name', 'student__last_name'),
+        ('Academic Year', 'academic_year__year_name'),
+        ('Term', 'term'),
+        ('Total Amount', 'total_amount'),
+        ('Amount Paid', 'amount_paid'),
+        ('Balance', 'balance'),
+        ('Due Date', 'due_date'),
+        ('Status', 'status'),
+        ('Created At', 'created_at'),
+    ]
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -74,17 +136,15 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         if status_filter:
             queryset = queryset.filter(status=status_filter)
         
-        # Filter overdue invoices
+        # Filter overdue invoices (status is maintained by sweep_overdue_invoices)
         overdue = self.request.query_params.get('overdue', None)
         if overdue and overdue.lower() == 'true':
-            queryset = queryset.filter(
-                due_date__lt=datetime.now().date(),
-                status__in=['unpaid', 'partial']
-            )
+            queryset = queryset.filter(status=Invoice.InvoiceStatus.OVERDUE)
         
         return queryset
     
     @action(detail=False, methods=['post'])
+    @idempotent('invoices.generate')
     def generate(self, request):
         """Generate invoice for a student"""
         student_id = request.data.get('student_id')
@@ -114,26 +174,38 @@ class InvoiceViewSet(viewsets.ModelViewSet):
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
     @action(detail=False, methods=['post'])
+    @idempotent('invoices.bulk_generate')
     def bulk_generate(self, request):
-        """Generate invoices for all students in a class"""
+        """Generate invoices for all students in a class, or the whole school"""
         class_id = request.data.get('class_id')
         academic_year_id = request.data.get('academic_year_id')
         term = request.data.get('term')
+        due_days = request.data.get('due_days', 30)
+        school_wide = str(request.data.get('school_wide', '')).lower() == 'true'
         
-        if not all([class_id, academic_year_id, term]):
+        if not all([class_id or school_wide, academic_year_id, term]):
             return Response(
-                {'error': 'class_id, academic_year_id, and term are required'},
+                {'error': 'class_id (or school_wide), academic_year_id, and term are required'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
         service = InvoiceService()
         try:
-            result = service.generate_bulk_invoices(
-                class_id=class_id,
-                academic_year_id=academic_year_id,
-                term=term,
-                generated_by=request.user
-            )
+            if school_wide:
+                result = service.generate_school_invoices(
+                    academic_year_id=academic_year_id,
+                    term=term,
+                    generated_by=request.user,
+                    due_days=int(due_days)
+                )
+            else:
+                result = service.generate_bulk_invoices(
+                    class_id=class_id,
+                    academic_year_id=academic_year_id,
+                    term=term,
+                    generated_by=request.user,
+                    due_days=int(due_days)
+                )
             
             return Response({
                 'success': len(result['invoices']),
@@ -144,6 +216,41 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name='as_of', type=str, description='Aging date (YYYY-MM-DD), defaults to today'),
+            OpenApiParameter(name='academic_year_id', type=int, description='Limit to one academic year'),
+            OpenApiParameter(name='term', type=str, description='Limit to one term'),
+            OpenApiParameter(name='class_id', type=int, description='Limit to one class'),
+            OpenApiParameter(name='group_by', type=str, description='class, academic_year, term, student or none'),
+        ],
+        description="Outstanding balances bucketed by days past due date"
+    )
+    @action(detail=False, methods=['get'])
+    def aging(self, request):
+        """Receivables aging report"""
+        as_of = request.query_params.get('as_of')
+        try:
+            as_of = datetime.strptime(as_of, '%Y-%m-%d').date() if as_of else datetime.now().date()
+        except ValueError:
+            return Response(
+                {'error': 'as_of must be a date in YYYY-MM-DD format'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        service = ReceivablesAgingService()
+        try:
+            report = service.report(
+                as_of=as_of,
+                academic_year_id=request.query_params.get('academic_year_id'),
+                term=request.query_params.get('term'),
+                class_id=request.query_params.get('class_id'),
+                group_by=request.query_params.get('group_by', 'class')
+            )
+            return Response(report)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
     @action(detail=True, methods=['get'])
     def payment_history(self, request, pk=None):
         """Get payment history for an invoice"""
@@ -154,11 +261,24 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(OptionalKeysetPaginationMixin, ExportMixin, viewsets.ModelViewSet):
     """ViewSet for Payment management"""
     
     queryset = Payment.objects.select_related('invoice', 'received_by').all()
     permission_classes = [IsAuthenticated, CanManageFinance]
+    keyset_ordering = ('-payment_date', '-id')
+    export_filename = 'payments'
+    export_columns = [
+        ('Payment Number', 'payment_number'),
+        ('Invoice Number', 'invoice__invoice_number'),
+        ('Admission Number', 'invoice__student__admission_number'),
+        ('Amount Paid', 'amount_paid'),
+        ('Payment Method', 'payment_method'),
+        ('Transaction Reference', 'transaction_reference'),
+        ('Payment Date', 'payment_date'),
+        ('Received By', 'received_by__username'),
+        ('Remarks', 'remarks'),
+    ]
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -187,10 +307,14 @@ class PaymentViewSet(viewsets.ModelViewSet):
         start_date = self.request.query_params.get('start_date', None)
         end_date = self.request.query_params.get('end_date', None)
         if start_date and end_date:
-            queryset = queryset.filter(payment_date__range=[start_date, end_date])
+            try:
+                queryset = filter_day_range(queryset, 'payment_date', start_date, end_date)
+            except ValueError as e:
+                raise ValidationError({'error': str(e)})
         
         return queryset
     
+    @idempotent('payments.create')
     def create(self, request, *args, **kwargs):
         """Record a payment"""
         serializer = self.get_serializer(data=request.data)
@@ -214,32 +338,143 @@ class PaymentViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def daily_collection(self, request):
         """Get daily collection summary"""
-        date = request.query_params.get('date', datetime.now().date())
-        
-        payments = Payment.objects.filter(
-            payment_date__date=date
-        )
+        try:
+            date = to_date(request.query_params.get('date') or timezone.localdate())
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        total_collection = payments.aggregate(total=Sum('amount_paid'))['total'] or Decimal('0.00')
-        payment_methods = payments.values('payment_method').annotate(
+        # Single grouped query over a half-open range on the indexed column
+        start, end = day_range(date)
+        payment_methods = list(Payment.objects.filter(
+            payment_date__gte=start,
+            payment_date__lt=end
+        ).values('payment_method').annotate(
             count=Count('id'),
             total=Sum('amount_paid')
-        )
+        ).order_by('payment_method'))
         
         return Response({
             'date': date,
-            'total_collection': total_collection,
-            'total_transactions': payments.count(),
-            'by_payment_method': list(payment_methods)
+            'total_collection': sum((row['total'] for row in payment_methods), Decimal('0.00')),
+            'total_transactions': sum(row['count'] for row in payment_methods),
+            'by_payment_method': payment_methods
         })
+    
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name='start_date', type=str, description='First day (YYYY-MM-DD), defaults to the start of the week'),
+            OpenApiParameter(name='end_date', type=str, description='Last day (YYYY-MM-DD), defaults to today'),
+        ],
+        description="Per-day, per-method collection totals for a cash-up sheet"
+    )
+    @action(detail=False, methods=['get'])
+    def cash_up(self, request):
+        """Cash-up sheet of collections per day and payment method"""
+        today = timezone.localdate()
+        try:
+            start_date = to_date(request.query_params.get('start_date') or today - timedelta(days=today.weekday()))
+            end_date = to_date(request.query_params.get('end_date') or today)
+            start, end = day_range(start_date, end_date)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if (end_date - start_date).days >= 366:
+            return Response(
+                {'error': 'The cash-up range cannot exceed one year'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        rows = Payment.objects.filter(
+            payment_date__gte=start,
+            payment_date__lt=end
+        ).annotate(
+            day=TruncDate('payment_date')
+        ).values('day', 'payment_method').annotate(
+            count=Count('id'),
+            total=Sum('amount_paid')
+        ).order_by()
+        
+        methods = Payment.PaymentMethod.values
+        
+        def empty():
+            return {method: {'count': 0, 'total': Decimal('0.00')} for method in methods}
+        
+        days = {start_date + timedelta(days=offset): empty() for offset in range((end_date - start_date).days + 1)}
+        method_totals = empty()
+        for row in rows:
+            days[row['day']][row['payment_method']] = {'count': row['count'], 'total': row['total']}
+            method_totals[row['payment_method']]['count'] += row['count']
+            method_totals[row['payment_method']]['total'] += row['total']
+        
+        return Response({
+            'start_date': start_date,
+            'end_date': end_date,
+            'payment_methods': methods,
+            'days': [
+                {
+                    'date': day,
+                    'by_payment_method': by_method,
+                    'total_transactions': sum(bucket['count'] for bucket in by_method.values()),
+                    'total_collection': sum((bucket['total'] for bucket in by_method.values()), Decimal('0.00')),
+                }
+                for day, by_method in days.items()
+            ],
+            'by_payment_method': method_totals,
+            'total_transactions': sum(bucket['count'] for bucket in method_totals.values()),
+            'total_collection': sum((bucket['total'] for bucket in method_totals.values()), Decimal('0.00')),
+        })
+    
+    @action(detail=False, methods=['post'])
+    def import_statement(self, request):
+        """Import a bank or mobile-money statement CSV and auto-match payments"""
+        statement = request.FILES.get('file')
+        payment_method = request.data.get('payment_method', Payment.PaymentMethod.BANK_TRANSFER)
+        dry_run = str(request.data.get('dry_run', '')).lower() == 'true'
+        
+        if not statement:
+            return Response(
+                {'error': 'file is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if payment_method not in Payment.PaymentMethod.values:
+            return Response(
+                {'error': f'Invalid payment_method {payment_method}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        service = StatementImportService()
+        try:
+            rows = service.read_csv(io.TextIOWrapper(statement.file, encoding='utf-8-sig', newline=''))
+            report = service.import_statement(
+                rows,
+                payment_method=payment_method,
+                received_by=request.user,
+                dry_run=dry_run
+            )
+            return Response(report, status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
-class ExpenditureViewSet(viewsets.ModelViewSet):
+class ExpenditureViewSet(ExportMixin, viewsets.ModelViewSet):
     """ViewSet for Expenditure management"""
     
     queryset = Expenditure.objects.select_related('approved_by', 'processed_by').all()
     serializer_class = ExpenditureSerializer
     permission_classes = [IsAuthenticated, CanManageFinance]
+    export_filename = 'expenditures'
+    export_columns = [
+        ('Expenditure Number', 'expenditure_number'),
+        ('Item', 'item_name'),
+        ('Category', 'category'),
+        ('Amount', 'amount'),
+        ('Vendor', 'vendor_name'),
+        ('Transaction Date', 'transaction_date'),
+        ('Payment Method', 'payment_method'),
+        ('Approved By', 'approved_by__username'),
+        ('Processed By', 'processed_by__username'),
+    ]
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -258,24 +493,8 @@ class ExpenditureViewSet(viewsets.ModelViewSet):
         return queryset
     
     def perform_create(self, serializer):
-        # Generate expenditure number
-        today = datetime.now()
-        date_code = today.strftime('%Y%m%d')
-        
-        last_expenditure = Expenditure.objects.filter(
-            expenditure_number__startswith=f"EXP-{date_code}"
-        ).order_by('-expenditure_number').first()
-        
-        if last_expenditure:
-            last_number = int(last_expenditure.expenditure_number.split('-')[-1])
-            new_number = last_number + 1
-        else:
-            new_number = 1
-    
-        expenditure_number = f"EXP-{date_code}-{new_number:04d}"
-
         serializer.save(
-            expenditure_number=expenditure_number,
+            expenditure_number=ExpenditureService.generate_expenditure_number(),
             processed_by=self.request.user
         )
 
@@ -285,23 +504,25 @@ class ExpenditureViewSet(viewsets.ModelViewSet):
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
 
-        query = Expenditure.objects.all()
-
-        if start_date and end_date:
-            query = query.filter(transaction_date__range=[start_date, end_date])
+        try:
+            start_date = to_date(start_date) if start_date else None
+            end_date = to_date(end_date) if end_date else None
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        category_totals = query.values('category').annotate(
-            total=Sum('amount'),
-            count=Count('id')
-        )
+        totals = FinanceRollupService.totals(start_date, end_date)
+        expenditure = totals[FinanceDailyRollup.Metric.EXPENDITURE]
 
-        total_expenditure = query.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
+        category_totals = [
+            {'category': category, 'total': bucket['amount'], 'count': bucket['count']}
+            for category, bucket in sorted(expenditure.items())
+        ]
 
         return Response({
             'start_date': start_date,
             'end_date': end_date,
-            'total_expenditure': total_expenditure,
-            'by_category': list(category_totals)
+            'total_expenditure': FinanceRollupService.metric_total(totals, FinanceDailyRollup.Metric.EXPENDITURE),
+            'by_category': category_totals
         })
 
 class FinancialDashboardViewSet(viewsets.ViewSet):
@@ -326,79 +547,98 @@ class FinancialDashboardViewSet(viewsets.ViewSet):
         
         # Default to current month
         if not start_date or not end_date:
-            today = datetime.now().date()
+            today = timezone.localdate()
             start_date = today.replace(day=1)
             end_date = today
         
-        # Revenue (payments received)
-        payments = Payment.objects.filter(
-            payment_date__range=[start_date, end_date]
-        )
-        total_revenue = payments.aggregate(total=Sum('amount_paid'))['total'] or Decimal('0.00')
-        
-        # Expenditure
-        expenditures = Expenditure.objects.filter(
-            transaction_date__range=[start_date, end_date]
-        )
-        total_expenditure = expenditures.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
+        try:
+            start_date, end_date = to_date(start_date), to_date(end_date)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Outstanding fees
-        outstanding_invoices = Invoice.objects.filter(
-            status__in=['unpaid', 'partial']
+        # Revenue, expenditure and invoice activity from the daily rollup
+        totals = FinanceRollupService.totals(start_date, end_date)
+        total_revenue = FinanceRollupService.metric_total(totals, FinanceDailyRollup.Metric.REVENUE)
+        total_expenditure = FinanceRollupService.metric_total(totals, FinanceDailyRollup.Metric.EXPENDITURE)
+        
+        # Outstanding fees and invoice statistics in one grouped query
+        by_status = {
+            row['status']: row
+            for row in Invoice.objects.values('status').annotate(
+                count=Count('id'),
+                outstanding=Sum('balance')
+            ).order_by()
+        }
+        outstanding_fees = sum(
+            (by_status[value]['outstanding'] or Decimal('0.00') for value in ['unpaid', 'partial', 'overdue'] if value in by_status),
+            Decimal('0.00')
         )
-        outstanding_fees = outstanding_invoices.aggregate(total=Sum('balance'))['total'] or Decimal('0.00')
-        
-        # Invoice statistics
-        paid_invoices = Invoice.objects.filter(status='paid').count()
-        unpaid_invoices = Invoice.objects.filter(status='unpaid').count()
-        partial_invoices = Invoice.objects.filter(status='partial').count()
         
         summary_data = {
             'total_revenue': total_revenue,
             'total_expenditure': total_expenditure,
             'net_income': total_revenue - total_expenditure,
             'outstanding_fees': outstanding_fees,
-            'paid_invoices': paid_invoices,
-            'unpaid_invoices': unpaid_invoices,
-            'partial_invoices': partial_invoices,
+            'paid_invoices': by_status.get('paid', {}).get('count', 0),
+            'unpaid_invoices': by_status.get('unpaid', {}).get('count', 0),
+            'partial_invoices': by_status.get('partial', {}).get('count', 0),
+            'overdue_invoices': by_status.get('overdue', {}).get('count', 0),
+            'invoices_issued': FinanceRollupService.metric_total(
+                totals, FinanceDailyRollup.Metric.INVOICES_ISSUED, 'count'
+            ),
+            'invoices_settled': FinanceRollupService.metric_total(
+                totals, FinanceDailyRollup.Metric.INVOICES_PAID, 'count'
+            ),
+            'revenue_by_method': {
+                method: bucket['amount']
+                for method, bucket in totals[FinanceDailyRollup.Metric.REVENUE].items()
+            },
+            'expenditure_by_category': {
+                category: bucket['amount']
+                for category, bucket in totals[FinanceDailyRollup.Metric.EXPENDITURE].items()
+            },
         }
         
         serializer = FinancialSummarySerializer(summary_data)
         return Response(serializer.data)
     
-@action(detail=False, methods=['get'])
-def monthly_trends(self, request):
-    """Get monthly financial trends for the year"""
-    year = int(request.query_params.get('year', datetime.now().year))
-    
-    monthly_data = []
-    
-    for month in range(1, 13):
-        month_start = datetime(year, month, 1).date()
-        if month == 12:
-            month_end = datetime(year, 12, 31).date()
-        else:
-            month_end = datetime(year, month + 1, 1).date() - timedelta(days=1)
-        
-        # Revenue
-        revenue = Payment.objects.filter(
-            payment_date__range=[month_start, month_end]
-        ).aggregate(total=Sum('amount_paid'))['total'] or Decimal('0.00')
-        
-        # Expenditure
-        expenditure = Expenditure.objects.filter(
-            transaction_date__range=[month_start, month_end]
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-        
-        monthly_data.append({
-            'month': month,
-            'month_name': month_start.strftime('%B'),
-            'revenue': float(revenue),
-            'expenditure': float(expenditure),
-            'net': float(revenue - expenditure)
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name='year', type=int, description='Calendar year (defaults to current year)'),
+        ],
+        description="Get monthly revenue and expenditure for a year"
+    )
+    @action(detail=False, methods=['get'])
+    def monthly_trends(self, request):
+        """Get monthly financial trends for the year"""
+        year = int(request.query_params.get('year', datetime.now().year))
+        
+        # One grouped query over the daily rollup for the whole year
+        monthly_totals = FinanceDailyRollup.objects.filter(
+            rollup_date__year=year,
+            metric__in=[FinanceDailyRollup.Metric.REVENUE, FinanceDailyRollup.Metric.EXPENDITURE]
+        ).annotate(
+            month=ExtractMonth('rollup_date')
+        ).values('month', 'metric').annotate(
+            total=Sum('amount')
+        ).order_by()
+        
+        totals = {(row['month'], row['metric']): row['total'] for row in monthly_totals}
+        
+        monthly_data = []
+        for month in range(1, 13):
+            revenue = totals.get((month, FinanceDailyRollup.Metric.REVENUE)) or Decimal('0.00')
+            expenditure = totals.get((month, FinanceDailyRollup.Metric.EXPENDITURE)) or Decimal('0.00')
+            
+            monthly_data.append({
+                'month': month,
+                'month_name': datetime(year, month, 1).strftime('%B'),
+                'revenue': float(revenue),
+                'expenditure': float(expenditure),
+                'net': float(revenue - expenditure)
+            })
+        
+        return Response({
+            'year': year,
+            'monthly_data': monthly_data
         })
-    
-    return Response({
-        'year': year,
-        'monthly_data': monthly_data
-    })
\ No newline at end of file
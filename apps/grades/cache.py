@@ -0,0 +1,63 @@
+from django.core.cache import cache
+
+
+STATISTICS_VERSION_KEY = 'grades:statistics-version:{subject_id}:{term}'
+
+
+def statistics_version(subject_id, term):
+    """Current cache version for a (subject, term) slice of grades"""
+    key = STATISTICS_VERSION_KEY.format(subject_id=subject_id, term=term or 'all')
+    return cache.get_or_set(key, 1, timeout=None)
+
+
+def bump_statistics_versions(slices):
+    """
+    Invalidate cached statistics for the given (subject_id, term) slices.
+
+    Statistics that span every term of a subject are invalidated as well.
+    """
+    keys = set()
+    for subject_id, term in slices:
+        for term_part in (term, 'all'):
+            keys.add(STATISTICS_VERSION_KEY.format(subject_id=subject_id, term=term_part))
+
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+GRADING_SCALE_VERSION_KEY = 'grades:grading-scale-version'
+GRADING_SCALE_CACHE_KEY = 'grades:grading-scales:{version}'
+GRADING_SCALE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def grading_scale_version():
+    """Current cache version for compiled grading scales"""
+    return cache.get_or_set(GRADING_SCALE_VERSION_KEY, 1, timeout=None)
+
+
+def bump_grading_scale_version():
+    """Invalidate compiled grading scales and statistics bucketed by them"""
+    try:
+        cache.incr(GRADING_SCALE_VERSION_KEY)
+    except ValueError:
+        cache.set(GRADING_SCALE_VERSION_KEY, 1, timeout=None)
+
+
+WEIGHTING_VERSION_KEY = 'grades:weighting-version'
+WEIGHTING_CACHE_KEY = 'grades:weightings:{version}'
+
+
+def weighting_version():
+    """Current cache version for assessment weighting policies"""
+    return cache.get_or_set(WEIGHTING_VERSION_KEY, 1, timeout=None)
+
+
+def bump_weighting_version():
+    """Invalidate cached assessment weighting policies"""
+    try:
+        cache.incr(WEIGHTING_VERSION_KEY)
+    except ValueError:
+        cache.set(WEIGHTING_VERSION_KEY, 1, timeout=None)
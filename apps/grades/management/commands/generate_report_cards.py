@@ -0,0 +1,32 @@
+import logging
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from apps.grades.services import ReportCardService
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Compute and store term report cards with class positions"
+
+    def add_arguments(self, parser):
+        parser.add_argument('term', choices=['1', '2', '3'])
+        parser.add_argument('--academic-year', type=int, help="Academic year id, defaults to the current year")
+        parser.add_argument('--class-id', type=int, help="Limit to one class")
+        parser.add_argument('--weighted', action='store_true', help="Use assessment-weighted scores")
+
+    def handle(self, *args, **options):
+        try:
+            result = ReportCardService().generate(
+                term=options['term'],
+                academic_year_id=options['academic_year'],
+                class_id=options['class_id'],
+                weighted=options['weighted']
+            )
+        except ValidationError as e:
+            raise CommandError(' '.join(e.messages))
+
+        message = f"Term {result['term']}: {result['generated']} report cards generated, {result['removed']} stale removed"
+        logger.info(message)
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from apps.grades.services import GradeSummaryService
+
+
+class Command(BaseCommand):
+    help = "Rebuild the grade_summaries table from grades"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--term', choices=['1', '2', '3'], help="Rebuild one term only")
+        parser.add_argument('--academic-year', type=int, help="Rebuild one academic year only")
+
+    def handle(self, *args, **options):
+        rows = GradeSummaryService().rebuild(term=options['term'], academic_year_id=options['academic_year'])
+
+        scope = ', '.join(filter(None, [
+            f"term {options['term']}" if options['term'] else None,
+            f"academic year {options['academic_year']}" if options['academic_year'] else None,
+        ])) or "all grades"
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} grade summaries for {scope}"))
@@ -0,0 +1,36 @@
+import logging
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from apps.grades.services import ReportCardRenderService
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Render term report card PDFs to media storage, skipping unchanged ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument('term', choices=['1', '2', '3'])
+        parser.add_argument('--academic-year', type=int, help="Academic year id, defaults to the current year")
+        parser.add_argument('--class-id', type=int, help="Limit to one class")
+        parser.add_argument('--weighted', action='store_true', help="Use assessment-weighted scores")
+        parser.add_argument('--workers', type=int, help="Render processes, defaults to REPORT_CARD_RENDER_WORKERS")
+        parser.add_argument('--force', action='store_true', help="Render every report card even if unchanged")
+
+    def handle(self, *args, **options):
+        try:
+            result = ReportCardRenderService().render(
+                term=options['term'],
+                academic_year_id=options['academic_year'],
+                class_id=options['class_id'],
+                weighted=options['weighted'],
+                workers=options['workers'],
+                force=options['force']
+            )
+        except ValidationError as e:
+            raise CommandError(' '.join(e.messages))
+
+        message = f"Term {result['term']}: {result['rendered']} report cards rendered, {result['unchanged']} unchanged"
+        logger.info(message)
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-17 06:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='grade',
+            index=models.Index(fields=['exam_date'], name='grades_exam_da_b13b76_idx'),
+        ),
+    ]
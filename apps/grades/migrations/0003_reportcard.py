@@ -0,0 +1,39 @@
+# Generated by Django 6.0.1 on 2026-10-17 06:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0002_initial'),
+        ('grades', '0002_grade_exam_date_index'),
+        ('students', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportCard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(choices=[('1', 'Term 1'), ('2', 'Term 2'), ('3', 'Term 3')], max_length=1)),
+                ('total_marks', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('total_max_marks', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('overall_percentage', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('position', models.PositiveIntegerField(help_text='Position in class, ties share a position')),
+                ('class_size', models.PositiveIntegerField()),
+                ('subjects', models.JSONField(default=list, help_text='Per-subject marks, percentage, rank and class average')),
+                ('generated_at', models.DateTimeField()),
+                ('class_obj', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_cards', to='academic.class')),
+                ('enrollment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_cards', to='academic.enrollment')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_cards', to='students.student')),
+            ],
+            options={
+                'db_table': 'report_cards',
+                'ordering': ['class_obj', 'position'],
+                'indexes': [models.Index(fields=['class_obj', 'term'], name='report_card_class_o_791a6e_idx'), models.Index(fields=['student', 'term'], name='report_card_student_295304_idx')],
+                'unique_together': {('enrollment', 'term')},
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 6.0.1 on 2026-10-17 06:36
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_summaries(apps, schema_editor):
+    Grade = apps.get_model('grades', 'Grade')
+    GradeSummary = apps.get_model('grades', 'GradeSummary')
+    rows = Grade.objects.values('student_id', 'enrollment_id', 'subject_id', 'term').annotate(
+        grade_count=Count('id'), total_marks=Sum('marks'), total_max_marks=Sum('max_marks')
+    ).order_by()
+    GradeSummary.objects.bulk_create([
+        GradeSummary(
+            **row,
+            percentage=(
+                (row['total_marks'] / row['total_max_marks'] * 100).quantize(Decimal('0.01'))
+                if row['total_max_marks'] else Decimal('0.00')
+            )
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0002_initial'),
+        ('grades', '0003_reportcard'),
+        ('students', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GradeSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(choices=[('1', 'Term 1'), ('2', 'Term 2'), ('3', 'Term 3')], max_length=1)),
+                ('grade_count', models.PositiveIntegerField(default=0)),
+                ('total_marks', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('total_max_marks', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('percentage', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('enrollment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='grade_summaries', to='academic.enrollment')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='grade_summaries', to='students.student')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='grade_summaries', to='academic.subject')),
+            ],
+            options={
+                'db_table': 'grade_summaries',
+                'ordering': ['subject__subject_code'],
+                'indexes': [models.Index(fields=['student', 'term'], name='grade_summa_student_bdcdbf_idx'), models.Index(fields=['subject', 'term'], name='grade_summa_subject_2ddd48_idx')],
+                'unique_together': {('student', 'enrollment', 'subject', 'term')},
+            },
+        ),
+        migrations.RunPython(populate_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 6.0.1 on 2026-10-17 06:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0002_initial'),
+        ('grades', '0004_gradesummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GradingScale',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('grade_level', models.IntegerField(blank=True, help_text='Leave blank for every grade level', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('academic_year', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='grading_scales', to='academic.academicyear')),
+            ],
+            options={
+                'db_table': 'grading_scales',
+                'ordering': ['academic_year', 'grade_level'],
+                'unique_together': {('academic_year', 'grade_level')},
+            },
+        ),
+        migrations.CreateModel(
+            name='GradingBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('letter', models.CharField(max_length=5)),
+                ('min_percentage', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('scale', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bands', to='grades.gradingscale')),
+            ],
+            options={
+                'db_table': 'grading_bands',
+                'ordering': ['scale', '-min_percentage'],
+                'unique_together': {('scale', 'letter'), ('scale', 'min_percentage')},
+            },
+        ),
+    ]
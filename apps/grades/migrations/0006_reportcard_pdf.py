@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-17 06:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0005_gradingscale'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportcard',
+            name='content_hash',
+            field=models.CharField(blank=True, help_text='SHA-256 of the document the PDF was rendered from', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='reportcard',
+            name='pdf',
+            field=models.FileField(blank=True, upload_to='report_cards/'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0.1 on 2026-10-17 06:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academic', '0002_initial'),
+        ('grades', '0006_reportcard_pdf'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gradesummary',
+            name='weighted_percentage',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Percentage weighted by assessment type; empty when no weighting applies', max_digits=5, null=True),
+        ),
+        migrations.CreateModel(
+            name='AssessmentWeighting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weights', models.JSONField(default=dict, help_text="e.g. {'quiz': 10, 'assignment': 20, 'midterm': 30, 'final': 40}")),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('academic_year', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assessment_weightings', to='academic.academicyear')),
+                ('subject', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='assessment_weightings', to='academic.subject')),
+            ],
+            options={
+                'db_table': 'assessment_weightings',
+                'ordering': ['academic_year', 'subject'],
+                'unique_together': {('academic_year', 'subject')},
+            },
+        ),
+    ]
@@ -1,12 +1,27 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Sum, Value, When
+from django.db.models.lookups import GreaterThanOrEqual
+from django.core.cache import cache
+from django.utils import timezone
+from bisect import bisect_right
+from decimal import Decimal
+import numpy as np
 from apps.students.models import Student
-from apps.academic.models import Subject, Enrollment
+from apps.academic.models import AcademicYear, Class, Subject, Enrollment
 from apps.accounts.models import User
+from .cache import (
+    GRADING_SCALE_CACHE_KEY, GRADING_SCALE_CACHE_TIMEOUT, WEIGHTING_CACHE_KEY,
+    bump_statistics_versions, grading_scale_version, bump_grading_scale_version,
+    weighting_version, bump_weighting_version
+)
 
 
 class Grade(models.Model):
     """Student grades/marks"""
     
+    # Default lower percentage bound of each letter grade, highest first
+    LETTER_GRADES = [(90, 'A+'), (80, 'A'), (70, 'B'), (60, 'C'), (50, 'D'), (0, 'F')]
+    
     class GradeType(models.TextChoices):
         ASSIGNMENT = 'assignment', 'Assignment'
         QUIZ = 'quiz', 'Quiz'
@@ -47,30 +62,544 @@ class Grade(models.Model):
             models.Index(fields=['student', 'subject']),
             models.Index(fields=['enrollment']),
             models.Index(fields=['term']),
+            models.Index(fields=['exam_date']),
         ]
     
     def __str__(self):
         return f"{self.student.full_name} - {self.subject.subject_name}: {self.marks}/{self.max_marks}"
     
+    SUMMARY_FIELDS = ['student_id', 'enrollment_id', 'subject_id', 'term', 'marks', 'max_marks']
+    
+    def summary_delta(self, sign=1):
+        """(summary key, (count, marks, max_marks)) this grade contributes"""
+        key = (self.student_id, self.enrollment_id, self.subject_id, self.term)
+        return key, (sign, sign * Decimal(str(self.marks)), sign * Decimal(str(self.max_marks)))
+    
+    def save(self, *args, **kwargs):
+        previous = None
+        if not self._state.adding:
+            previous = Grade.objects.filter(pk=self.pk).values(*self.SUMMARY_FIELDS).first()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Annotated percentage and letter are stale once marks change
+            self.__dict__.pop('pct', None)
+            self.__dict__.pop('letter', None)
+            deltas = [self.summary_delta()]
+            slices = {(self.subject_id, self.term)}
+            if previous:
+                # A grade moved to another subject or term changes both slices
+                deltas.append(Grade(**previous).summary_delta(-1))
+                slices.add((previous['subject_id'], previous['term']))
+            GradeSummary.apply(deltas)
+            transaction.on_commit(lambda: bump_statistics_versions(slices))
+    
+    def delete(self, *args, **kwargs):
+        slices = {(self.subject_id, self.term)}
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            GradeSummary.apply([self.summary_delta(-1)])
+            transaction.on_commit(lambda: bump_statistics_versions(slices))
+        return result
+    
     @property
     def percentage(self):
+        # Querysets from Grade.with_letters() carry it already
+        if 'pct' in self.__dict__:
+            return self.pct
         if self.max_marks > 0:
             return (self.marks / self.max_marks) * 100
         return 0
     
     @property
     def letter_grade(self):
-        """Convert percentage to letter grade"""
-        pct = self.percentage
-        if pct >= 90:
-            return 'A+'
-        elif pct >= 80:
-            return 'A'
-        elif pct >= 70:
-            return 'B'
-        elif pct >= 60:
-            return 'C'
-        elif pct >= 50:
-            return 'D'
-        else:
-            return 'F'
\ No newline at end of file
+        """Convert percentage to letter grade on the class's grading scale"""
+        if 'letter' in self.__dict__:
+            return self.letter
+        return GradingScale.letter_for_enrollment(self.percentage, self)
+    
+    @classmethod
+    def letter_for_percentage(cls, pct):
+        """Letter on the school-wide grading scale"""
+        return GradingScale.letter_for(pct)
+    
+    @staticmethod
+    def percentage_expression():
+        """Percentage (marks / max_marks * 100) as a database expression"""
+        return Case(
+            When(max_marks__gt=0, then=F('marks') * Value(Decimal('100')) / F('max_marks')),
+            default=Value(Decimal('0')),
+            output_field=models.DecimalField(max_digits=9, decimal_places=4)
+        )
+    
+    @classmethod
+    def with_letters(cls, queryset=None):
+        """Annotate pct and letter (on each class's grading scale) in SQL"""
+        queryset = cls.objects.all() if queryset is None else queryset
+        return queryset.annotate(pct=cls.percentage_expression()).annotate(
+            letter=GradingScale.letter_expression(F('pct'), 'enrollment__class_obj')
+        )
+
+
+class GradingScale(models.Model):
+    """
+    Letter grade bands for an academic year and/or grade level.
+    
+    The most specific scale applies: year and level, then year only, then
+    level only, then a scale with neither. Without any scale the bands in
+    Grade.LETTER_GRADES are used.
+    """
+    
+    name = models.CharField(max_length=100)
+    academic_year = models.ForeignKey(
+        AcademicYear,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='grading_scales'
+    )
+    grade_level = models.IntegerField(null=True, blank=True, help_text="Leave blank for every grade level")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'grading_scales'
+        unique_together = ['academic_year', 'grade_level']
+        ordering = ['academic_year', 'grade_level']
+    
+    def __str__(self):
+        return self.name
+    
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            transaction.on_commit(bump_grading_scale_version)
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            transaction.on_commit(bump_grading_scale_version)
+        return result
+    
+    @classmethod
+    def compiled(cls):
+        """
+        Every scale as (academic_year_id, grade_level, bounds, letters), most specific first.
+        
+        bounds ascend and letters align with them, ready for bisect. The
+        school-wide scale (None, None) is always last. Cached until a
+        scale or band changes.
+        """
+        cache_key = GRADING_SCALE_CACHE_KEY.format(version=grading_scale_version())
+        scales = cache.get(cache_key)
+        if scales is not None:
+            return scales
+        
+        bands = {}
+        for scale_id, academic_year_id, grade_level, min_percentage, letter in GradingBand.objects.order_by(
+            'scale_id', 'min_percentage'
+        ).values_list('scale_id', 'scale__academic_year_id', 'scale__grade_level', 'min_percentage', 'letter'):
+            scale = bands.setdefault(scale_id, (academic_year_id, grade_level, [], []))
+            scale[2].append(min_percentage)
+            scale[3].append(letter)
+        
+        scales = sorted(
+            bands.values(),
+            key=lambda scale: (scale[0] is None, scale[1] is None)
+        )
+        if not scales or scales[-1][:2] != (None, None):
+            default = sorted(Grade.LETTER_GRADES)
+            scales.append((
+                None, None,
+                [Decimal(bound) for bound, _ in default],
+                [letter for _, letter in default]
+            ))
+        
+        cache.set(cache_key, scales, GRADING_SCALE_CACHE_TIMEOUT)
+        return scales
+    
+    @classmethod
+    def table_for(cls, academic_year_id=None, grade_level=None):
+        """(bounds, letters) of the scale that applies to a year and grade level"""
+        for scale_year, scale_level, bounds, letters in cls.compiled():
+            if scale_year not in (None, academic_year_id) or scale_level not in (None, grade_level):
+                continue
+            return bounds, letters
+    
+    @classmethod
+    def letter_for(cls, percentage, academic_year_id=None, grade_level=None):
+        """Letter for a percentage; below the lowest band gets the lowest letter"""
+        bounds, letters = cls.table_for(academic_year_id, grade_level)
+        return letters[max(bisect_right(bounds, Decimal(str(percentage))) - 1, 0)]
+    
+    @classmethod
+    def letter_for_enrollment(cls, percentage, instance):
+        """
+        Letter for a Grade or GradeSummary read without with_letters().
+        
+        The instance's class is only loaded when a scale other than the
+        school-wide one exists; select_related('enrollment__class_obj')
+        avoids the query then.
+        """
+        if len(cls.compiled()) == 1:
+            return cls.letter_for(percentage)
+        class_obj = instance.enrollment.class_obj
+        return cls.letter_for(percentage, class_obj.academic_year_id, class_obj.grade_level)
+    
+    @classmethod
+    def letters(cls):
+        """Every letter in use, best first"""
+        ordered = {}
+        for _, _, bounds, letters in cls.compiled():
+            for bound, letter in zip(bounds, letters):
+                ordered[letter] = max(bound, ordered.get(letter, bound))
+        return sorted(ordered, key=ordered.get, reverse=True)
+    
+    @classmethod
+    def letter_expression(cls, percentage, class_path):
+        """
+        Case/When computing the letter for a percentage expression in SQL.
+        
+        Args:
+            percentage: Expression giving the percentage (e.g. F('percentage'))
+            class_path: Lookup path from the queried model to its Class
+        """
+        def bands(bounds, letters):
+            return Case(
+                *[
+                    When(GreaterThanOrEqual(percentage, Value(bound)), then=Value(letter))
+                    for bound, letter in reversed(list(zip(bounds, letters)))
+                ],
+                default=Value(letters[0]),
+                output_field=models.CharField()
+            )
+        
+        scales = cls.compiled()
+        scoped = []
+        for academic_year_id, grade_level, bounds, letters in scales[:-1]:
+            scope = Q()
+            if academic_year_id is not None:
+                scope &= Q(**{f'{class_path}__academic_year_id': academic_year_id})
+            if grade_level is not None:
+                scope &= Q(**{f'{class_path}__grade_level': grade_level})
+            scoped.append(When(scope, then=bands(bounds, letters)))
+        
+        default = bands(*scales[-1][2:])
+        if not scoped:
+            return default
+        return Case(*scoped, default=default, output_field=models.CharField())
+
+
+class GradingBand(models.Model):
+    """One letter of a grading scale and the lowest percentage that earns it"""
+    
+    scale = models.ForeignKey(GradingScale, on_delete=models.CASCADE, related_name='bands')
+    letter = models.CharField(max_length=5)
+    min_percentage = models.DecimalField(max_digits=5, decimal_places=2)
+    
+    class Meta:
+        db_table = 'grading_bands'
+        unique_together = [['scale', 'letter'], ['scale', 'min_percentage']]
+        ordering = ['scale', '-min_percentage']
+    
+    def __str__(self):
+        return f"{self.scale.name}: {self.letter} >= {self.min_percentage}%"
+    
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            transaction.on_commit(bump_grading_scale_version)
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            transaction.on_commit(bump_grading_scale_version)
+        return result
+
+
+class GradeSummary(models.Model):
+    """Per-term totals of a student's grades in one subject, maintained as grades change"""
+    
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='grade_summaries')
+    enrollment = models.ForeignKey(Enrollment, on_delete=models.CASCADE, related_name='grade_summaries')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='grade_summaries')
+    term = models.CharField(max_length=1, choices=Grade.Term.choices)
+    grade_count = models.PositiveIntegerField(default=0)
+    total_marks = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    total_max_marks = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    percentage = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    weighted_percentage = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text="Percentage weighted by assessment type; empty when no weighting applies"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'grade_summaries'
+        unique_together = ['student', 'enrollment', 'subject', 'term']
+        ordering = ['subject__subject_code']
+        indexes = [
+            models.Index(fields=['student', 'term']),
+            models.Index(fields=['subject', 'term']),
+        ]
+    
+    def __str__(self):
+        return f"{self.student.full_name} - {self.subject.subject_name} Term {self.term}: {self.percentage}%"
+    
+    @property
+    def letter_grade(self):
+        if 'letter' in self.__dict__:
+            return self.letter
+        return GradingScale.letter_for_enrollment(self.percentage, self)
+    
+    @classmethod
+    def with_letters(cls, queryset=None):
+        """Annotate letter (on each class's grading scale) in SQL"""
+        queryset = cls.objects.all() if queryset is None else queryset
+        return queryset.annotate(letter=GradingScale.letter_expression(F('percentage'), 'enrollment__class_obj'))
+    
+    @staticmethod
+    def percentage_of(total_marks, total_max_marks):
+        if total_max_marks > 0:
+            return (total_marks / total_max_marks * 100).quantize(Decimal('0.01'))
+        return Decimal('0.00')
+    
+    @classmethod
+    def apply(cls, deltas):
+        """
+        Add grade deltas to their summaries.
+        
+        Summary rows are locked, changed in memory and written back with
+        one bulk_update and one bulk_create; rows left with no grades are
+        deleted. Call inside the transaction that changed the grades.
+        
+        Args:
+            deltas: iterable of ((student_id, enrollment_id, subject_id, term),
+                    (count, marks, max_marks))
+        """
+        totals = {}
+        for key, (count, marks, max_marks) in deltas:
+            current = totals.get(key, (0, Decimal('0'), Decimal('0')))
+            totals[key] = (current[0] + count, current[1] + marks, current[2] + max_marks)
+        if not totals:
+            return
+        touched = set(totals)
+        
+        changed, empty = [], []
+        for summary in cls.objects.select_for_update().filter(
+            student_id__in={key[0] for key in totals},
+            subject_id__in={key[2] for key in totals},
+            term__in={key[3] for key in totals}
+        ):
+            key = (summary.student_id, summary.enrollment_id, summary.subject_id, summary.term)
+            if key not in totals:
+                continue
+            count, marks, max_marks = totals.pop(key)
+            summary.grade_count += count
+            summary.total_marks += marks
+            summary.total_max_marks += max_marks
+            if summary.grade_count <= 0:
+                empty.append(summary.pk)
+                continue
+            summary.percentage = cls.percentage_of(summary.total_marks, summary.total_max_marks)
+            changed.append(summary)
+        
+        if empty:
+            cls.objects.filter(pk__in=empty).delete()
+        if changed:
+            for summary in changed:
+                summary.updated_at = timezone.now()
+            cls.objects.bulk_update(
+                changed, ['grade_count', 'total_marks', 'total_max_marks', 'percentage', 'updated_at']
+            )
+        
+        cls.objects.bulk_create([
+            cls(
+                student_id=student_id, enrollment_id=enrollment_id, subject_id=subject_id, term=term,
+                grade_count=count, total_marks=marks, total_max_marks=max_marks,
+                percentage=cls.percentage_of(marks, max_marks)
+            )
+            for (student_id, enrollment_id, subject_id, term), (count, marks, max_marks) in totals.items()
+            if count > 0
+        ])
+        
+        if AssessmentWeighting.policies():
+            cls.refresh_weighted(keys=touched)
+    
+    @classmethod
+    def refresh_weighted(cls, keys=None, academic_year_id=None, subject_id=None, term=None):
+        """
+        Recompute weighted_percentage from grades with one grouped query.
+        
+        Marks are summed per (summary, grade type); each type's percentage
+        is then weighted by the applicable AssessmentWeighting and combined
+        with NumPy, normalising over the types that have grades so far.
+        
+        Args:
+            keys: (student_id, enrollment_id, subject_id, term) summaries to refresh
+            academic_year_id: Or refresh every summary of an academic year
+            subject_id: Limit to one subject
+            term: Limit to one term
+        
+        Returns:
+            Number of summaries updated
+        """
+        filters = {}
+        if keys is not None:
+            if not keys:
+                return 0
+            filters.update(
+                student_id__in={key[0] for key in keys},
+                subject_id__in={key[2] for key in keys},
+                term__in={key[3] for key in keys}
+            )
+        if academic_year_id:
+            filters['enrollment__class_obj__academic_year_id'] = academic_year_id
+        if subject_id:
+            filters['subject_id'] = subject_id
+        if term:
+            filters['term'] = term
+        
+        rows = [
+            row for row in Grade.objects.filter(**filters).values_list(
+                'student_id', 'enrollment_id', 'subject_id', 'term', 'grade_type',
+                'enrollment__class_obj__academic_year_id'
+            ).annotate(marks=Sum('marks'), max_marks=Sum('max_marks')).order_by()
+            if keys is None or row[:4] in keys
+        ]
+        
+        weighted = {}
+        if rows:
+            summary_keys = [row[:4] for row in rows]
+            unique_keys = list(dict.fromkeys(summary_keys))
+            index = {key: position for position, key in enumerate(unique_keys)}
+            inverse = np.array([index[key] for key in summary_keys])
+            marks = np.array([float(row[6]) for row in rows])
+            max_marks = np.array([float(row[7]) for row in rows])
+            weights = np.array([
+                (AssessmentWeighting.weights_for(row[5], row[2]) or {}).get(row[4], 0.0) for row in rows
+            ])
+            
+            type_pct = np.where(max_marks > 0, marks / np.where(max_marks > 0, max_marks, 1) * 100, 0.0)
+            weights = np.where(max_marks > 0, weights, 0.0)
+            numerator = np.bincount(inverse, weights=weights * type_pct, minlength=len(unique_keys))
+            denominator = np.bincount(inverse, weights=weights, minlength=len(unique_keys))
+            
+            for position, key in enumerate(unique_keys):
+                if denominator[position] > 0:
+                    weighted[key] = Decimal(str(round(numerator[position] / denominator[position], 2)))
+        
+        changed = []
+        for summary in cls.objects.filter(**filters).only(
+            'id', 'student_id', 'enrollment_id', 'subject_id', 'term', 'weighted_percentage'
+        ):
+            key = (summary.student_id, summary.enrollment_id, summary.subject_id, summary.term)
+            if keys is not None and key not in keys:
+                continue
+            value = weighted.get(key)
+            if summary.weighted_percentage != value:
+                summary.weighted_percentage = value
+                changed.append(summary)
+        cls.objects.bulk_update(changed, ['weighted_percentage'], batch_size=1000)
+        return len(changed)
+
+
+class AssessmentWeighting(models.Model):
+    """
+    Weight of each assessment type in a subject's term score.
+    
+    A policy without a subject applies to every subject of the academic
+    year that has no policy of its own. Weights are percentages summing
+    to 100, keyed on Grade.GradeType.
+    """
+    
+    academic_year = models.ForeignKey(AcademicYear, on_delete=models.CASCADE, related_name='assessment_weightings')
+    subject = models.ForeignKey(
+        Subject,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='assessment_weightings'
+    )
+    weights = models.JSONField(default=dict, help_text="e.g. {'quiz': 10, 'assignment': 20, 'midterm': 30, 'final': 40}")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'assessment_weightings'
+        unique_together = ['academic_year', 'subject']
+        ordering = ['academic_year', 'subject']
+    
+    def __str__(self):
+        subject = self.subject.subject_name if self.subject else 'All subjects'
+        return f"{self.academic_year.year_name} - {subject}"
+    
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self._refresh()
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            self._refresh()
+        return result
+    
+    def _refresh(self):
+        # Compile the changed policies before recomputing the scores they drive
+        bump_weighting_version()
+        transaction.on_commit(bump_weighting_version)
+        GradeSummary.refresh_weighted(academic_year_id=self.academic_year_id, subject_id=self.subject_id)
+    
+    @classmethod
+    def policies(cls):
+        """{(academic_year_id, subject_id or None): {grade_type: weight}}, cached"""
+        cache_key = WEIGHTING_CACHE_KEY.format(version=weighting_version())
+        policies = cache.get(cache_key)
+        if policies is None:
+            policies = {
+                (academic_year_id, subject_id): {grade_type: float(weight) for grade_type, weight in weights.items()}
+                for academic_year_id, subject_id, weights in cls.objects.values_list(
+                    'academic_year_id', 'subject_id', 'weights'
+                )
+            }
+            cache.set(cache_key, policies, GRADING_SCALE_CACHE_TIMEOUT)
+        return policies
+    
+    @classmethod
+    def weights_for(cls, academic_year_id, subject_id):
+        """Weights for a subject in a year, falling back to the year's default policy"""
+        policies = cls.policies()
+        return policies.get((academic_year_id, subject_id)) or policies.get((academic_year_id, None))
+
+
+class ReportCard(models.Model):
+    """Term report card for one enrollment, generated from grades"""
+    
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='report_cards')
+    enrollment = models.ForeignKey(Enrollment, on_delete=models.CASCADE, related_name='report_cards')
+    class_obj = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='report_cards')
+    term = models.CharField(max_length=1, choices=Grade.Term.choices)
+    total_marks = models.DecimalField(max_digits=8, decimal_places=2)
+    total_max_marks = models.DecimalField(max_digits=8, decimal_places=2)
+    overall_percentage = models.DecimalField(max_digits=5, decimal_places=2)
+    position = models.PositiveIntegerField(help_text="Position in class, ties share a position")
+    class_size = models.PositiveIntegerField()
+    subjects = models.JSONField(default=list, help_text="Per-subject marks, percentage, rank and class average")
+    generated_at = models.DateTimeField()
+    pdf = models.FileField(upload_to='report_cards/', blank=True)
+    content_hash = models.CharField(max_length=64, blank=True, help_text="SHA-256 of the document the PDF was rendered from")
+    
+    class Meta:
+        db_table = 'report_cards'
+        unique_together = ['enrollment', 'term']
+        ordering = ['class_obj', 'position']
+        indexes = [
+            models.Index(fields=['class_obj', 'term']),
+            models.Index(fields=['student', 'term']),
+        ]
+    
+    def __str__(self):
+        return f"{self.student.full_name} - Term {self.term}: {self.overall_percentage}%"
\ No newline at end of file
@@ -0,0 +1,133 @@
+import hashlib
+import json
+from io import BytesIO
+from PIL import Image, ImageDraw, ImageFont
+
+
+# Bump when the layout changes so every report card is rendered again
+LAYOUT_VERSION = 2
+
+# A4 at 150 dpi
+PAGE_SIZE = (1240, 1754)
+RESOLUTION = 150
+MARGIN = 90
+LINE = 34
+# Totals and attendance, kept together on the last page
+FOOTER_HEIGHT = 170
+
+SUBJECT_COLUMNS = [
+    ('Subject', 0), ('Marks', 400), ('%', 560), ('Grade', 680), ('Position', 790), ('Class avg', 930),
+]
+
+
+def content_hash(document):
+    """SHA-256 of a report card document and the layout version"""
+    payload = json.dumps({'layout': LAYOUT_VERSION, 'document': document}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _fonts():
+    return {
+        'title': ImageFont.load_default(size=40),
+        'heading': ImageFont.load_default(size=26),
+        'body': ImageFont.load_default(size=22),
+    }
+
+
+def _new_page(pages):
+    pages.append(Image.new('RGB', PAGE_SIZE, 'white'))
+    return ImageDraw.Draw(pages[-1]), MARGIN
+
+
+def _subject_header(draw, y, fonts):
+    for title, offset in SUBJECT_COLUMNS:
+        draw.text((MARGIN + offset, y), title, font=fonts['heading'], fill='black')
+    y += 40
+    draw.line((MARGIN, y, PAGE_SIZE[0] - MARGIN, y), fill='gray', width=1)
+    return y + 12
+
+
+def render_report_card(document):
+    """
+    Render one report card document to PDF bytes.
+
+    Only Pillow is used and nothing touches the database, so documents
+    can be rendered in worker processes. Subjects that do not fit on
+    the first page continue on further pages under repeated headings.
+
+    Args:
+        document: dict built by ReportCardRenderService.documents()
+
+    Returns:
+        (enrollment_id, PDF bytes)
+    """
+    fonts = _fonts()
+    pages = []
+    draw, y = _new_page(pages)
+    width = PAGE_SIZE[0] - 2 * MARGIN
+    bottom = PAGE_SIZE[1] - MARGIN
+
+    draw.text((MARGIN, y), document['school_name'], font=fonts['title'], fill='black')
+    y += 60
+    draw.text(
+        (MARGIN, y), f"Report Card - {document['academic_year']}, Term {document['term']}",
+        font=fonts['heading'], fill='black'
+    )
+    y += 50
+    draw.line((MARGIN, y, MARGIN + width, y), fill='black', width=2)
+    y += 25
+
+    for label, value in [
+        ('Student', document['student_name']),
+        ('Admission number', document['admission_number']),
+        ('Class', document['class_name']),
+    ]:
+        draw.text((MARGIN, y), f"{label}:", font=fonts['body'], fill='black')
+        draw.text((MARGIN + 260, y), str(value), font=fonts['body'], fill='black')
+        y += LINE
+    y += 20
+    y = _subject_header(draw, y, fonts)
+
+    for subject in document['subjects']:
+        if y + LINE > bottom:
+            draw, y = _new_page(pages)
+            y = _subject_header(draw, y, fonts)
+        values = [
+            subject['subject_name'][:32],
+            f"{subject['marks']:g}/{subject['max_marks']:g}",
+            f"{subject['percentage']:.2f}",
+            subject['letter_grade'],
+            f"{subject['rank']} of {subject['students']}",
+            f"{subject['class_average']:.2f}",
+        ]
+        for value, (_, offset) in zip(values, SUBJECT_COLUMNS):
+            draw.text((MARGIN + offset, y), value, font=fonts['body'], fill='black')
+        y += LINE
+
+    if y + FOOTER_HEIGHT > bottom:
+        draw, y = _new_page(pages)
+    y += 12
+    draw.line((MARGIN, y, MARGIN + width, y), fill='gray', width=1)
+    y += 20
+    draw.text(
+        (MARGIN, y),
+        f"Total: {document['total_marks']:g}/{document['total_max_marks']:g}    "
+        f"Overall: {document['overall_percentage']:.2f}% ({document['letter_grade']})    "
+        f"Position: {document['position']} of {document['class_size']}",
+        font=fonts['heading'], fill='black'
+    )
+    y += 60
+
+    attendance = document['attendance']
+    draw.text((MARGIN, y), 'Attendance', font=fonts['heading'], fill='black')
+    y += 40
+    draw.text(
+        (MARGIN, y),
+        f"Days recorded: {attendance['total']}    Present: {attendance['present']}    "
+        f"Late: {attendance['late']}    Absent: {attendance['absent']}    Excused: {attendance['excused']}",
+        font=fonts['body'], fill='black'
+    )
+
+    output = BytesIO()
+    pages[0].save(output, 'PDF', resolution=RESOLUTION, save_all=True, append_images=pages[1:])
+    return document['enrollment_id'], output.getvalue()
@@ -1,5 +1,7 @@
 from rest_framework import serializers
-from .models import Grade
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from .models import AssessmentWeighting, Grade, GradeSummary, GradingBand, GradingScale
 from apps.students.serializers import StudentSerializer
 from apps.academic.serializers import SubjectSerializer
 
@@ -47,6 +49,27 @@ class GradeCreateSerializer(serializers.Serializer):
         if data['marks'] > data['max_marks']:
             raise serializers.ValidationError("Marks cannot exceed max marks")
         return data
+    
+    def create(self, validated_data):
+        return Grade.objects.create(**validated_data)
+
+
+class GradeSummarySerializer(serializers.ModelSerializer):
+    """Serializer for a student's term totals in one subject"""
+    
+    subject_code = serializers.CharField(source='subject.subject_code', read_only=True)
+    subject_name = serializers.CharField(source='subject.subject_name', read_only=True)
+    student_name = serializers.CharField(source='student.full_name', read_only=True)
+    letter_grade = serializers.CharField(read_only=True)
+    
+    class Meta:
+        model = GradeSummary
+        fields = [
+            'id', 'student', 'student_name', 'enrollment', 'subject', 'subject_code', 'subject_name',
+            'term', 'grade_count', 'total_marks', 'total_max_marks', 'percentage', 'weighted_percentage',
+            'letter_grade', 'updated_at'
+        ]
+        read_only_fields = fields
 
 
 class StudentGradeReportSerializer(serializers.Serializer):
@@ -55,6 +78,108 @@ class StudentGradeReportSerializer(serializers.Serializer):
     student = StudentSerializer(read_only=True)
     term = serializers.CharField()
     grades = GradeSerializer(many=True, read_only=True)
+    subjects = GradeSummarySerializer(many=True, read_only=True)
     total_marks = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     total_max_marks = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
-    overall_percentage = serializers.DecimalField(max_digits=5, decimal_places=2, read_only=True)
\ No newline at end of file
+    overall_percentage = serializers.DecimalField(max_digits=5, decimal_places=2, read_only=True)
+    weighted_percentage = serializers.DecimalField(max_digits=5, decimal_places=2, read_only=True)
+
+
+class GradingBandSerializer(serializers.ModelSerializer):
+    """Serializer for one band of a grading scale"""
+    
+    min_percentage = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=0, max_value=100)
+    
+    class Meta:
+        model = GradingBand
+        fields = ['id', 'letter', 'min_percentage']
+        read_only_fields = ['id']
+
+
+class GradingScaleSerializer(serializers.ModelSerializer):
+    """Serializer for GradingScale with its bands written in place"""
+    
+    academic_year_id = serializers.IntegerField(required=False, allow_null=True)
+    bands = GradingBandSerializer(many=True)
+    
+    class Meta:
+        model = GradingScale
+        fields = ['id', 'name', 'academic_year_id', 'grade_level', 'bands', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'created_at', 'updated_at']
+        validators = []
+    
+    def validate_bands(self, bands):
+        if not bands:
+            raise serializers.ValidationError("At least one band is required")
+        letters = [band['letter'] for band in bands]
+        bounds = [band['min_percentage'] for band in bands]
+        if len(set(letters)) != len(letters):
+            raise serializers.ValidationError("Letters must be unique")
+        if len(set(bounds)) != len(bounds):
+            raise serializers.ValidationError("Minimum percentages must be unique")
+        return sorted(bands, key=lambda band: band['min_percentage'], reverse=True)
+    
+    def validate(self, data):
+        academic_year_id = data.get('academic_year_id', getattr(self.instance, 'academic_year_id', None))
+        grade_level = data.get('grade_level', getattr(self.instance, 'grade_level', None))
+        clash = GradingScale.objects.filter(academic_year_id=academic_year_id, grade_level=grade_level)
+        if self.instance:
+            clash = clash.exclude(pk=self.instance.pk)
+        if clash.exists():
+            raise serializers.ValidationError("A grading scale already exists for this academic year and grade level")
+        return data
+    
+    @transaction.atomic
+    def create(self, validated_data):
+        bands = validated_data.pop('bands')
+        scale = GradingScale.objects.create(**validated_data)
+        GradingBand.objects.bulk_create([GradingBand(scale=scale, **band) for band in bands])
+        return scale
+    
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        bands = validated_data.pop('bands', None)
+        instance = super().update(instance, validated_data)
+        if bands is not None:
+            instance.bands.all().delete()
+            GradingBand.objects.bulk_create([GradingBand(scale=instance, **band) for band in bands])
+        return instance
+
+
+
+class AssessmentWeightingSerializer(serializers.ModelSerializer):
+    """Serializer for AssessmentWeighting"""
+    
+    academic_year_id = serializers.IntegerField()
+    subject_id = serializers.IntegerField(required=False, allow_null=True)
+    
+    class Meta:
+        model = AssessmentWeighting
+        fields = ['id', 'academic_year_id', 'subject_id', 'weights', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'created_at', 'updated_at']
+    
+    def validate_weights(self, weights):
+        if not isinstance(weights, dict) or not weights:
+            raise serializers.ValidationError("weights must map grade types to percentages")
+        unknown = set(weights) - set(Grade.GradeType.values)
+        if unknown:
+            raise serializers.ValidationError(f"Unknown grade types: {', '.join(sorted(unknown))}")
+        try:
+            weights = {grade_type: Decimal(str(weight)) for grade_type, weight in weights.items()}
+        except InvalidOperation:
+            raise serializers.ValidationError("Weights must be numbers")
+        if any(weight < 0 for weight in weights.values()):
+            raise serializers.ValidationError("Weights cannot be negative")
+        if sum(weights.values()) != 100:
+            raise serializers.ValidationError("Weights must add up to 100")
+        return {grade_type: float(weight) for grade_type, weight in weights.items()}
+    
+    def validate(self, data):
+        academic_year_id = data.get('academic_year_id', getattr(self.instance, 'academic_year_id', None))
+        subject_id = data.get('subject_id', getattr(self.instance, 'subject_id', None))
+        clash = AssessmentWeighting.objects.filter(academic_year_id=academic_year_id, subject_id=subject_id)
+        if self.instance:
+            clash = clash.exclude(pk=self.instance.pk)
+        if clash.exists():
+            raise serializers.ValidationError("A weighting already exists for this academic year and subject")
+        return data
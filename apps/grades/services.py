@@ -0,0 +1,916 @@
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import (
+    Avg, Count, DecimalField, F, FilteredRelation, Max, Min, Q, StdDev, Sum, Value, Window
+)
+from django.db.models.functions import Coalesce, DenseRank, NullIf, Rank, Round
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from decimal import Decimal
+import numpy as np
+from apps.academic.models import AcademicYear, Class, Enrollment, Subject
+from apps.students.models import Student
+from apps.attendance.models import Attendance
+from .pdf import content_hash, render_report_card
+from .cache import statistics_version, bump_statistics_versions, grading_scale_version
+from .models import AssessmentWeighting, Grade, GradeSummary, GradingScale, ReportCard
+
+
+def competition_rank(groups, scores):
+    """
+    Rank scores within groups, highest first, ties sharing a rank (1, 2, 2, 4).
+    
+    Args:
+        groups: int array of group keys
+        scores: float array of scores, same length
+    
+    Returns:
+        int array of ranks aligned with the inputs
+    """
+    count = len(scores)
+    if not count:
+        return np.zeros(0, dtype=np.int64)
+    
+    order = np.lexsort((-scores, groups))
+    sorted_groups = groups[order]
+    sorted_scores = scores[order]
+    positions = np.arange(count)
+    
+    new_group = np.ones(count, dtype=bool)
+    new_group[1:] = sorted_groups[1:] != sorted_groups[:-1]
+    new_run = new_group.copy()
+    new_run[1:] |= sorted_scores[1:] != sorted_scores[:-1]
+    
+    group_start = np.maximum.accumulate(np.where(new_group, positions, 0))
+    run_start = np.maximum.accumulate(np.where(new_run, positions, 0))
+    
+    ranks = np.empty(count, dtype=np.int64)
+    ranks[order] = run_start - group_start + 1
+    return ranks
+
+
+def current_academic_year_id(academic_year_id=None):
+    """The given academic year, or the current one when omitted"""
+    if academic_year_id:
+        return int(academic_year_id)
+    academic_year_id = AcademicYear.objects.filter(is_current=True).values_list('id', flat=True).first()
+    if not academic_year_id:
+        raise ValidationError("No current academic year; pass academic_year_id")
+    return academic_year_id
+
+
+def _letters(percentages, table):
+    """Vectorized GradingScale.letter_for over one scale's (bounds, letters)"""
+    bounds, letters = table
+    return np.array(letters, dtype=object)[np.digitize(percentages, np.array(bounds[1:], dtype=np.float64))]
+
+
+class ReportCardService:
+    """Computes term report cards for a class or a whole school at once"""
+    
+    def build(self, term, academic_year_id=None, class_id=None, weighted=False):
+        """
+        Compute report cards for every active enrollment with grades.
+        
+        Grade summaries in scope are loaded with one values_list() query
+        into NumPy arrays; per-subject and overall percentages, class positions
+        and per-subject ranks are computed with array operations.
+        Positions and ranks use competition ranking within each class.
+        
+        Weighted cards score each subject on its assessment-weighted
+        percentage and the overall as the mean over subjects taken.
+        
+        Args:
+            term: Term ('1', '2' or '3')
+            academic_year_id: Academic year, defaults to the current one
+            class_id: Limit to one class (optional)
+            weighted: Use AssessmentWeighting policies (optional)
+        
+        Returns:
+            list of report card dicts ordered by class and position
+        """
+        if term not in Grade.Term.values:
+            raise ValidationError(f"Invalid term {term}")
+        academic_year_id = current_academic_year_id(academic_year_id)
+        
+        # One precomputed row per (enrollment, subject) however many assessments
+        summaries = GradeSummary.objects.filter(
+            term=term,
+            enrollment__status=Enrollment.EnrollmentStatus.ACTIVE,
+            enrollment__class_obj__academic_year_id=academic_year_id
+        )
+        if class_id:
+            summaries = summaries.filter(enrollment__class_obj_id=class_id)
+        
+        rows = list(summaries.values_list(
+            'enrollment_id', 'enrollment__class_obj_id', 'subject_id', 'total_marks', 'total_max_marks',
+            Coalesce('weighted_percentage', 'percentage')
+        ))
+        if not rows:
+            return []
+        
+        enrollment_ids, class_ids, subject_ids, marks, max_marks, scores = zip(*rows)
+        enrollment_keys, student_index = np.unique(np.array(enrollment_ids, dtype=np.int64), return_inverse=True)
+        subject_keys, subject_index = np.unique(np.array(subject_ids, dtype=np.int64), return_inverse=True)
+        marks = np.array(marks, dtype=np.float64)
+        max_marks = np.array(max_marks, dtype=np.float64)
+        students, subjects = len(enrollment_keys), len(subject_keys)
+        
+        marks_sum = np.zeros((students, subjects))
+        max_sum = np.zeros((students, subjects))
+        np.add.at(marks_sum, (student_index, subject_index), marks)
+        np.add.at(max_sum, (student_index, subject_index), max_marks)
+        taken = max_sum > 0
+        if weighted:
+            subject_pct = np.zeros((students, subjects))
+            subject_pct[student_index, subject_index] = np.array(scores, dtype=np.float64)
+        else:
+            subject_pct = np.where(taken, marks_sum / np.where(taken, max_sum, 1) * 100, 0.0)
+        
+        student_class = np.zeros(students, dtype=np.int64)
+        student_class[student_index] = np.array(class_ids, dtype=np.int64)
+        class_keys, class_index = np.unique(student_class, return_inverse=True)
+        class_size = np.bincount(class_index)[class_index]
+        
+        total_marks = marks_sum.sum(axis=1)
+        total_max = max_sum.sum(axis=1)
+        if weighted:
+            taken_count = taken.sum(axis=1)
+            overall_pct = np.where(taken_count > 0, subject_pct.sum(axis=1) / np.maximum(taken_count, 1), 0.0)
+        else:
+            overall_pct = np.where(total_max > 0, total_marks / np.where(total_max > 0, total_max, 1) * 100, 0.0)
+        position = competition_rank(class_index, np.round(overall_pct, 4))
+        
+        # Rank and class average per (class, subject) over students who took it
+        taken_student, taken_subject = np.nonzero(taken)
+        subject_group = class_index[taken_student] * subjects + taken_subject
+        taken_pct = subject_pct[taken_student, taken_subject]
+        subject_rank = np.zeros((students, subjects), dtype=np.int64)
+        subject_rank[taken_student, taken_subject] = competition_rank(subject_group, np.round(taken_pct, 4))
+        group_keys, group_index = np.unique(subject_group, return_inverse=True)
+        group_count = np.bincount(group_index)
+        group_average = np.bincount(group_index, weights=taken_pct) / group_count
+        subject_average = np.zeros((students, subjects))
+        subject_average[taken_student, taken_subject] = group_average[group_index]
+        subject_takers = np.zeros((students, subjects), dtype=np.int64)
+        subject_takers[taken_student, taken_subject] = group_count[group_index]
+        
+        # Each class is graded on the scale for its year and grade level
+        subject_letters = np.empty((students, subjects), dtype=object)
+        overall_letters = np.empty(students, dtype=object)
+        grade_levels = dict(Class.objects.filter(id__in=class_keys.tolist()).values_list('id', 'grade_level'))
+        for index, class_key in enumerate(class_keys.tolist()):
+            in_class = class_index == index
+            table = GradingScale.table_for(academic_year_id, grade_levels[class_key])
+            subject_letters[in_class] = _letters(subject_pct[in_class], table)
+            overall_letters[in_class] = _letters(overall_pct[in_class], table)
+        
+        enrollment_info = {
+            row[0]: row[1:]
+            for row in Enrollment.objects.filter(id__in=enrollment_keys.tolist()).values_list(
+                'id', 'student_id', 'student__admission_number', 'student__first_name',
+                'student__last_name', 'class_obj__class_name'
+            )
+        }
+        subject_info = dict(
+            (row[0], row[1:]) for row in Subject.objects.filter(id__in=subject_keys.tolist()).values_list(
+                'id', 'subject_code', 'subject_name'
+            )
+        )
+        
+        cards = []
+        for s in np.lexsort((position, class_index)).tolist():
+            student_id, admission_number, first_name, last_name, class_name = enrollment_info[int(enrollment_keys[s])]
+            cards.append({
+                'enrollment_id': int(enrollment_keys[s]),
+                'student_id': student_id,
+                'admission_number': admission_number,
+                'student_name': f"{first_name} {last_name}",
+                'class_id': int(student_class[s]),
+                'class_name': class_name,
+                'term': term,
+                'weighted': weighted,
+                'total_marks': round(float(total_marks[s]), 2),
+                'total_max_marks': round(float(total_max[s]), 2),
+                'overall_percentage': round(float(overall_pct[s]), 2),
+                'letter_grade': overall_letters[s],
+                'position': int(position[s]),
+                'class_size': int(class_size[s]),
+                'subjects': [
+                    {
+                        'subject_id': int(subject_keys[j]),
+                        'subject_code': subject_info[int(subject_keys[j])][0],
+                        'subject_name': subject_info[int(subject_keys[j])][1],
+                        'marks': round(float(marks_sum[s, j]), 2),
+                        'max_marks': round(float(max_sum[s, j]), 2),
+                        'percentage': round(float(subject_pct[s, j]), 2),
+                        'letter_grade': subject_letters[s, j],
+                        'rank': int(subject_rank[s, j]),
+                        'students': int(subject_takers[s, j]),
+                        'class_average': round(float(subject_average[s, j]), 2),
+                    }
+                    for j in np.flatnonzero(taken[s]).tolist()
+                ],
+            })
+        return cards
+    
+    @transaction.atomic
+    def generate(self, term, academic_year_id=None, class_id=None, cards=None, weighted=False):
+        """
+        Compute and persist report cards, replacing earlier ones in scope.
+        
+        Args:
+            cards: Output of build() for the same scope, to skip recomputing
+            weighted: Use assessment-weighted scores when computing
+        
+        Returns:
+            dict with the number of cards written and removed
+        """
+        if cards is None:
+            cards = self.build(term, academic_year_id, class_id, weighted)
+        generated_at = timezone.now()
+        
+        report_cards = [
+            ReportCard(
+                student_id=card['student_id'],
+                enrollment_id=card['enrollment_id'],
+                class_obj_id=card['class_id'],
+                term=term,
+                total_marks=Decimal(str(card['total_marks'])),
+                total_max_marks=Decimal(str(card['total_max_marks'])),
+                overall_percentage=Decimal(str(card['overall_percentage'])),
+                position=card['position'],
+                class_size=card['class_size'],
+                subjects=card['subjects'],
+                generated_at=generated_at
+            )
+            for card in cards
+        ]
+        
+        upsert = {
+            'update_conflicts': True,
+            'update_fields': [
+                'student', 'class_obj', 'total_marks', 'total_max_marks', 'overall_percentage',
+                'position', 'class_size', 'subjects', 'generated_at'
+            ],
+        }
+        # MySQL upserts on any unique key and rejects an explicit conflict target
+        if connection.features.supports_update_conflicts_with_target:
+            upsert['unique_fields'] = ['enrollment', 'term']
+        ReportCard.objects.bulk_create(report_cards, batch_size=500, **upsert)
+        
+        # Cards whose enrollment no longer has grades in scope are stale
+        stale = ReportCard.objects.filter(term=term, generated_at__lt=generated_at)
+        if class_id:
+            stale = stale.filter(class_obj_id=class_id)
+        elif academic_year_id:
+            stale = stale.filter(class_obj__academic_year_id=academic_year_id)
+        else:
+            stale = stale.filter(class_obj__academic_year__is_current=True)
+        stale_pdfs = list(stale.exclude(pdf='').values_list('pdf', flat=True))
+        removed, _ = stale.delete()
+        # Rendered files go once the rows are gone for good
+        transaction.on_commit(lambda: [default_storage.delete(name) for name in stale_pdfs])
+        
+        return {'term': term, 'generated': len(report_cards), 'removed': removed}
+
+
+class ReportCardRenderService:
+    """Renders report cards to PDF in media storage, skipping unchanged ones"""
+    
+    def render(self, term, academic_year_id=None, class_id=None, workers=None, force=False, weighted=False):
+        """
+        Persist and render report cards for a class or the whole school.
+        
+        Grades, enrollments and attendance are read in a handful of bulk
+        queries; documents whose content hash matches the stored PDF are
+        skipped and the rest are rendered across a process pool.
+        
+        Args:
+            term: Term ('1', '2' or '3')
+            academic_year_id: Academic year, defaults to the current one
+            class_id: Limit to one class (optional)
+            workers: Render processes, defaults to REPORT_CARD_RENDER_WORKERS
+            force: Render every card even if unchanged
+            weighted: Use assessment-weighted scores
+        
+        Returns:
+            dict with rendered and unchanged counts and each card's PDF URL
+        """
+        academic_year_id = current_academic_year_id(academic_year_id)
+        academic_year = AcademicYear.objects.get(id=academic_year_id)
+        
+        report_card_service = ReportCardService()
+        cards = report_card_service.build(term, academic_year_id, class_id, weighted)
+        report_card_service.generate(term, academic_year_id, class_id, cards=cards)
+        
+        documents = self.documents(cards, academic_year)
+        stored = {
+            report_card.enrollment_id: report_card
+            for report_card in ReportCard.objects.filter(
+                term=term, enrollment_id__in=[card['enrollment_id'] for card in cards]
+            ).only('id', 'enrollment_id', 'pdf', 'content_hash')
+        }
+        
+        hashes = {document['enrollment_id']: content_hash(document) for document in documents}
+        pending = [
+            document for document in documents
+            if force or not stored[document['enrollment_id']].pdf
+            or stored[document['enrollment_id']].content_hash != hashes[document['enrollment_id']]
+        ]
+        
+        rendered = []
+        for enrollment_id, pdf in self._render_all(pending, workers):
+            report_card = stored[enrollment_id]
+            if report_card.pdf:
+                report_card.pdf.delete(save=False)
+            report_card.content_hash = hashes[enrollment_id]
+            report_card.pdf.name = default_storage.save(
+                self.pdf_path(academic_year, term, report_card, report_card.content_hash),
+                ContentFile(pdf)
+            )
+            rendered.append(report_card)
+        ReportCard.objects.bulk_update(rendered, ['pdf', 'content_hash'], batch_size=500)
+        
+        return {
+            'term': term,
+            'rendered': len(rendered),
+            'unchanged': len(documents) - len(rendered),
+            'report_cards': [
+                {
+                    'enrollment_id': card['enrollment_id'],
+                    'admission_number': card['admission_number'],
+                    'student_name': card['student_name'],
+                    'class_name': card['class_name'],
+                    'pdf': stored[card['enrollment_id']].pdf.url,
+                }
+                for card in cards
+            ],
+        }
+    
+    def documents(self, cards, academic_year):
+        """Report cards joined with attendance for the academic year, one query"""
+        attendance = {
+            row['student_id']: row
+            for row in Attendance.objects.filter(
+                student_id__in={card['student_id'] for card in cards},
+                class_obj_id__in={card['class_id'] for card in cards},
+                attendance_date__range=[academic_year.start_date, academic_year.end_date]
+            ).values('student_id').annotate(
+                total=Count('id'),
+                **{
+                    status: Count('id', filter=Q(status=status))
+                    for status in Attendance.AttendanceStatus.values
+                }
+            ).order_by()
+        }
+        empty = {'total': 0, **{status: 0 for status in Attendance.AttendanceStatus.values}}
+        
+        return [
+            {
+                **card,
+                'school_name': settings.SCHOOL_NAME,
+                'academic_year': academic_year.year_name,
+                'attendance': {
+                    key: attendance.get(card['student_id'], empty)[key] for key in empty
+                },
+            }
+            for card in cards
+        ]
+    
+    @staticmethod
+    def pdf_path(academic_year, term, report_card, digest):
+        year = academic_year.year_name.replace('/', '-')
+        return f"report_cards/{year}/term-{term}/{report_card.enrollment_id}-{digest[:16]}.pdf"
+    
+    @staticmethod
+    def _render_all(documents, workers=None):
+        """Yield (enrollment_id, PDF bytes), fanned out over worker processes"""
+        workers = workers or settings.REPORT_CARD_RENDER_WORKERS
+        if workers <= 1 or len(documents) < 2:
+            yield from map(render_report_card, documents)
+            return
+        
+        workers = min(workers, len(documents))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            yield from pool.map(render_report_card, documents, chunksize=max(1, len(documents) // (workers * 4)))
+
+
+class GradeStatisticsService:
+    """Distribution statistics for a subject's grades"""
+    
+    PERCENTILES = [10, 25, 50, 75, 90]
+    BREAKDOWNS = {
+        'class': ['enrollment__class_obj_id', 'enrollment__class_obj__class_name'],
+        'grade_type': ['grade_type'],
+        'term': ['term'],
+    }
+    CACHE_TIMEOUT = 60 * 60
+    
+    def subject_statistics(self, subject_id, term=None, academic_year_id=None):
+        """
+        Statistics for a subject, cached per (subject, term) slice.
+        
+        Letter buckets are computed in SQL on marks / max_marks with each
+        class's grading scale, so assessments out of any total are graded
+        alike.
+        
+        Args:
+            subject_id: Subject
+            term: Limit to one term (optional)
+            academic_year_id: Limit to classes in one academic year (optional)
+        
+        Returns:
+            dict of overall statistics with breakdowns by class, grade type
+            and term, or None when there are no grades
+        """
+        version = f"{statistics_version(subject_id, term)}.{grading_scale_version()}"
+        cache_key = f"grades:statistics:{version}:{subject_id}:{term or 'all'}:{academic_year_id or 'all'}"
+        statistics = cache.get(cache_key)
+        if statistics is None:
+            statistics = self._build_statistics(subject_id, term, academic_year_id)
+            cache.set(cache_key, statistics, self.CACHE_TIMEOUT)
+        return statistics or None
+    
+    def _build_statistics(self, subject_id, term, academic_year_id):
+        grades = Grade.objects.filter(subject_id=subject_id)
+        if term:
+            grades = grades.filter(term=term)
+        if academic_year_id:
+            grades = grades.filter(enrollment__class_obj__academic_year_id=academic_year_id)
+        grades = Grade.with_letters(grades)
+        letters = GradingScale.letters()
+        
+        # Count, averages, spread and letter buckets in one query
+        overall = grades.aggregate(**self._aggregates(letters))
+        if not overall['count']:
+            return {}
+        
+        # Median and percentiles need the values themselves, fetched once
+        key_fields = [fields[0] for fields in self.BREAKDOWNS.values()]
+        percentages = list(grades.values_list('pct', *key_fields))
+        values = np.array([float(row[0]) for row in percentages])
+        
+        statistics = {
+            'subject_id': subject_id,
+            'term': term,
+            'academic_year_id': academic_year_id,
+            **self._format(overall, letters),
+            **self._spread(values),
+            'breakdowns': {},
+        }
+        
+        for position, (name, fields) in enumerate(self.BREAKDOWNS.items(), start=1):
+            keys = np.array([row[position] for row in percentages], dtype=object)
+            rows = grades.values(*fields).annotate(**self._aggregates(letters)).order_by(*fields)
+            statistics['breakdowns'][name] = [
+                {
+                    **{field.rsplit('__', 1)[-1]: row[field] for field in fields},
+                    **self._format(row, letters),
+                    **self._spread(values[keys == row[fields[0]]]),
+                }
+                for row in rows
+            ]
+        
+        return statistics
+    
+    @staticmethod
+    def _aggregates(letters):
+        aggregates = {
+            'count': Count('id'),
+            'average_marks': Avg('marks'),
+            'average_percentage': Avg('pct'),
+            'std_dev': StdDev('pct'),
+            'lowest': Min('pct'),
+            'highest': Max('pct'),
+        }
+        for index, letter in enumerate(letters):
+            aggregates[f'letter_{index}'] = Count('id', filter=Q(letter=letter))
+        return aggregates
+    
+    @staticmethod
+    def _format(row, letters):
+        def rounded(value):
+            return round(float(value), 2) if value is not None else None
+        
+        return {
+            'total_grades': row['count'],
+            'average_marks': rounded(row['average_marks']),
+            'average_percentage': rounded(row['average_percentage']),
+            'std_dev': rounded(row['std_dev']),
+            'lowest_percentage': rounded(row['lowest']),
+            'highest_percentage': rounded(row['highest']),
+            'grade_distribution': {
+                letter: row[f'letter_{index}'] for index, letter in enumerate(letters)
+            },
+        }
+    
+    def _spread(self, values):
+        if not len(values):
+            return {'median': None, 'percentiles': {}}
+        points = np.percentile(values, self.PERCENTILES)
+        return {
+            'median': round(float(np.median(values)), 2),
+            'percentiles': {f'p{p}': round(float(v), 2) for p, v in zip(self.PERCENTILES, points)},
+        }
+
+
+class GradeEntryService:
+    """Set-based entry of many grades at once"""
+    
+    UPDATE_FIELDS = ['enrollment', 'marks', 'max_marks', 'term', 'remarks', 'entered_by', 'updated_at']
+    
+    @staticmethod
+    def grade_key(data):
+        """Natural key a correction is matched on"""
+        return (data['student_id'], data['subject_id'], data['grade_type'], data['exam_date'])
+    
+    @transaction.atomic
+    def enter(self, rows, entered_by, upsert=False):
+        """
+        Validate and write rows in one transaction, all or nothing.
+        
+        The rows' enrollments and existing grades are read with
+        select_for_update(), so concurrent entries for the same students
+        run one after the other: the second sees the first's grades as
+        existing instead of inserting them again, and corrections apply to
+        fresh values.
+        
+        Returns:
+            (dict with the number of grades created and updated, or None; list of row errors)
+        """
+        existing, errors = self.validate(rows, upsert=upsert, lock=True)
+        if errors:
+            return None, errors
+        return self.save(rows, entered_by, existing), []
+    
+    def validate(self, rows, upsert=False, lock=False):
+        """
+        Check references for every row with one query per model.
+        
+        Args:
+            rows: Validated GradeCreateSerializer data, in request order
+            upsert: Whether rows may correct existing grades
+            lock: Lock the enrollments and existing grades; requires a transaction
+        
+        Returns:
+            (existing grades keyed by natural key, list of row errors)
+        """
+        errors = []
+        student_ids = {row['student_id'] for row in rows}
+        subject_ids = {row['subject_id'] for row in rows}
+        enrollment_ids = {row['enrollment_id'] for row in rows}
+        
+        known_students = set(Student.objects.filter(id__in=student_ids).values_list('id', flat=True))
+        known_subjects = set(Subject.objects.filter(id__in=subject_ids).values_list('id', flat=True))
+        enrollments = Enrollment.objects.filter(id__in=enrollment_ids)
+        if lock:
+            # Serialises entries for the same students before grades are looked up
+            enrollments = enrollments.select_for_update().order_by('id')
+        enrollments = {
+            enrollment_id: (student_id, enrollment_status)
+            for enrollment_id, student_id, enrollment_status in enrollments.values_list('id', 'student_id', 'status')
+        }
+        
+        grades = Grade.objects.filter(
+            student_id__in=student_ids,
+            subject_id__in=subject_ids,
+            grade_type__in={row['grade_type'] for row in rows},
+            exam_date__in={row['exam_date'] for row in rows}
+        ).only(
+            'id', 'student_id', 'enrollment_id', 'subject_id', 'grade_type', 'exam_date',
+            'term', 'marks', 'max_marks'
+        )
+        if lock:
+            grades = grades.select_for_update()
+        # Older data may hold several grades on one key; the earliest is corrected
+        existing = {}
+        for grade in grades.order_by('id'):
+            existing.setdefault(self.grade_key(vars(grade)), grade)
+        
+        seen = set()
+        for index, row in enumerate(rows):
+            row_errors = []
+            if row['student_id'] not in known_students:
+                row_errors.append("Student not found")
+            if row['subject_id'] not in known_subjects:
+                row_errors.append("Subject not found")
+            
+            enrollment = enrollments.get(row['enrollment_id'])
+            if enrollment is None:
+                row_errors.append("Enrollment not found")
+            elif enrollment[0] != row['student_id']:
+                row_errors.append("Enrollment does not belong to this student")
+            elif enrollment[1] != Enrollment.EnrollmentStatus.ACTIVE:
+                row_errors.append("Enrollment is not active")
+            
+            key = self.grade_key(row)
+            if key in seen:
+                row_errors.append("Duplicate grade in request")
+            seen.add(key)
+            if key in existing and not upsert:
+                row_errors.append("Grade already exists; send upsert to correct it")
+            
+            if row_errors:
+                errors.append({'index': index, 'errors': row_errors})
+        
+        return existing, errors
+    
+    @transaction.atomic
+    def save(self, rows, entered_by, existing):
+        """
+        Write validated rows: new grades with bulk_create, corrections with bulk_update.
+        
+        Returns:
+            dict with the number of grades created and updated
+        """
+        now = timezone.now()
+        new_grades = []
+        corrected = []
+        slices = set()
+        deltas = []
+        
+        for row in rows:
+            slices.add((row['subject_id'], row['term']))
+            grade = existing.get(self.grade_key(row))
+            if grade is None:
+                grade = Grade(**row, entered_by=entered_by)
+                new_grades.append(grade)
+                deltas.append(grade.summary_delta())
+                continue
+            
+            # A correction may move the grade to another term
+            slices.add((grade.subject_id, grade.term))
+            deltas.append(grade.summary_delta(-1))
+            grade.enrollment_id = row['enrollment_id']
+            grade.marks = row['marks']
+            grade.max_marks = row['max_marks']
+            grade.term = row['term']
+            grade.remarks = row.get('remarks', '')
+            grade.entered_by = entered_by
+            grade.updated_at = now
+            corrected.append(grade)
+            deltas.append(grade.summary_delta())
+        
+        Grade.objects.bulk_create(new_grades, batch_size=500)
+        Grade.objects.bulk_update(corrected, self.UPDATE_FIELDS, batch_size=500)
+        
+        # bulk writes bypass Grade.save, so summaries and statistics caches are updated here
+        GradeSummary.apply(deltas)
+        transaction.on_commit(lambda: bump_statistics_versions(slices))
+        
+        return {'created': len(new_grades), 'updated': len(corrected)}
+
+
+class GradeSummaryService:
+    """Rebuilds the grade_summaries table from grades"""
+    
+    @transaction.atomic
+    def rebuild(self, term=None, academic_year_id=None):
+        """
+        Recompute grade summaries from grades.
+        
+        Args:
+            term: Limit to one term (optional)
+            academic_year_id: Limit to classes in one academic year (optional)
+        
+        Returns:
+            Number of summary rows written
+        """
+        summaries = GradeSummary.objects.all()
+        grades = Grade.objects.all()
+        if term:
+            summaries = summaries.filter(term=term)
+            grades = grades.filter(term=term)
+        if academic_year_id:
+            summaries = summaries.filter(enrollment__class_obj__academic_year_id=academic_year_id)
+            grades = grades.filter(enrollment__class_obj__academic_year_id=academic_year_id)
+        
+        summaries.delete()
+        
+        rows = grades.values('student_id', 'enrollment_id', 'subject_id', 'term').annotate(
+            grade_count=Count('id'), total_marks=Sum('marks'), total_max_marks=Sum('max_marks')
+        ).order_by()
+        new_summaries = [
+            GradeSummary(
+                **row, percentage=GradeSummary.percentage_of(row['total_marks'], row['total_max_marks'])
+            )
+            for row in rows
+        ]
+        GradeSummary.objects.bulk_create(new_summaries, batch_size=1000)
+        if AssessmentWeighting.policies():
+            GradeSummary.refresh_weighted(academic_year_id=academic_year_id, term=term)
+        return len(new_summaries)
+
+
+class GradebookService:
+    """A class's marks in one subject and term as a students x assessments matrix"""
+    
+    def build(self, class_id, subject_id, term):
+        """
+        Build the gradebook from one values_list() query.
+        
+        Active enrollments are joined to their grades for the subject and
+        term, so students without marks still get a row. An assessment
+        column is a (grade type, exam date) pair, the natural key grades
+        are entered on.
+        
+        Args:
+            class_id: Class
+            subject_id: Subject
+            term: Term ('1', '2' or '3')
+        
+        Returns:
+            dict with ordered students, ordered assessment columns and a
+            2-D list of marks with None where a student has no grade
+        """
+        if term not in Grade.Term.values:
+            raise ValidationError(f"Invalid term {term}")
+        
+        rows = Enrollment.objects.filter(
+            class_obj_id=class_id,
+            status=Enrollment.EnrollmentStatus.ACTIVE
+        ).annotate(
+            term_grades=FilteredRelation(
+                'grades', condition=Q(grades__subject_id=subject_id, grades__term=term)
+            )
+        ).values_list(
+            'student_id', 'student__admission_number', 'student__first_name', 'student__last_name',
+            'term_grades__grade_type', 'term_grades__exam_date', 'term_grades__marks', 'term_grades__max_marks'
+        ).order_by('student__admission_number', 'student_id')
+        
+        students = {}
+        cells = {}
+        columns = {}
+        for student_id, admission_number, first_name, last_name, grade_type, exam_date, marks, max_marks in rows:
+            students.setdefault(student_id, (admission_number, f"{first_name} {last_name}"))
+            if grade_type is None:
+                continue
+            column = (exam_date, grade_type)
+            columns[column] = max(columns.get(column, max_marks), max_marks)
+            cells[student_id, column] = float(marks)
+        
+        student_ids = list(students)
+        column_keys = sorted(columns)
+        return {
+            'class_id': int(class_id),
+            'subject_id': int(subject_id),
+            'term': term,
+            'student_ids': student_ids,
+            'admission_numbers': [students[student_id][0] for student_id in student_ids],
+            'student_names': [students[student_id][1] for student_id in student_ids],
+            'assessments': [
+                {'grade_type': grade_type, 'exam_date': exam_date, 'max_marks': float(columns[exam_date, grade_type])}
+                for exam_date, grade_type in column_keys
+            ],
+            'marks': [
+                [cells.get((student_id, column)) for column in column_keys]
+                for student_id in student_ids
+            ],
+        }
+
+
+class RankingService:
+    """Class, subject and grade-level positions computed with window functions"""
+    
+    STUDENT_FIELDS = [
+        'student_id', 'student__admission_number', 'student__first_name', 'student__last_name',
+        'enrollment_id', 'enrollment__class_obj_id', 'enrollment__class_obj__class_name',
+    ]
+    
+    @staticmethod
+    def format_row(row):
+        """Flatten a ranking row's lookups into API field names"""
+        formatted = {
+            'student_id': row['student_id'],
+            'admission_number': row['student__admission_number'],
+            'student_name': f"{row['student__first_name']} {row['student__last_name']}",
+            'enrollment_id': row['enrollment_id'],
+            'class_id': row['enrollment__class_obj_id'],
+            'class_name': row['enrollment__class_obj__class_name'],
+        }
+        if 'grade_level' in row:
+            formatted['grade_level'] = row['grade_level']
+        if 'subject_id' in row:
+            formatted.update({
+                'subject_id': row['subject_id'],
+                'subject_code': row['subject__subject_code'],
+                'subject_name': row['subject__subject_name'],
+            })
+        if 'subjects' in row:
+            formatted['subjects'] = row['subjects']
+        formatted.update({
+            'total_marks': row['marks'],
+            'total_max_marks': row['max_marks'],
+            'percentage': row['score'],
+            'position': row['position'],
+            'dense_position': row['dense_position'],
+        })
+        return formatted
+    
+    def _summaries(self, term, academic_year_id=None, subject_ids=None):
+        if term not in Grade.Term.values:
+            raise ValidationError(f"Invalid term {term}")
+        academic_year_id = current_academic_year_id(academic_year_id)
+        
+        summaries = GradeSummary.objects.filter(
+            term=term,
+            enrollment__status=Enrollment.EnrollmentStatus.ACTIVE,
+            enrollment__class_obj__academic_year_id=academic_year_id
+        )
+        if subject_ids is not None:
+            summaries = summaries.filter(subject_id__in=subject_ids)
+        return summaries
+    
+    @staticmethod
+    def _positions(partition_by, score):
+        """RANK() and DENSE_RANK() over a partition, best score first"""
+        order_by = score.desc(nulls_last=True)
+        return {
+            'position': Window(Rank(), partition_by=partition_by, order_by=order_by),
+            'dense_position': Window(DenseRank(), partition_by=partition_by, order_by=order_by),
+        }
+    
+    def _overall(self, summaries, partition_by, weighted):
+        if weighted:
+            # Mean of the subjects' weighted scores
+            score = Avg(Coalesce('weighted_percentage', 'percentage'))
+        else:
+            score = Sum('total_marks') * Value(Decimal('100')) / NullIf(Sum('total_max_marks'), Value(Decimal('0')))
+        totals = summaries.values(*self.STUDENT_FIELDS).annotate(
+            subjects=Count('id'),
+            marks=Sum('total_marks'),
+            max_marks=Sum('total_max_marks'),
+            score=Round(score, 2, output_field=DecimalField(max_digits=5, decimal_places=2))
+        )
+        return totals.annotate(**self._positions(partition_by, F('score')))
+    
+    def class_positions(self, term, academic_year_id=None, class_id=None, weighted=False, subject_ids=None):
+        """
+        Position of each student in their class on overall term percentage.
+        
+        subject_ids, when given, limits the ranking to those subjects.
+        
+        Returns:
+            values() queryset, one row per enrollment, ordered by class and position
+        """
+        summaries = self._summaries(term, academic_year_id, subject_ids)
+        if class_id:
+            summaries = summaries.filter(enrollment__class_obj_id=class_id)
+        
+        return self._overall(summaries, [F('enrollment__class_obj_id')], weighted).order_by(
+            'enrollment__class_obj__class_name', 'enrollment__class_obj_id', 'position', 'enrollment_id'
+        )
+    
+    def grade_level_positions(self, term, academic_year_id=None, grade_level=None, weighted=False,
+                              subject_ids=None):
+        """
+        Position of each student across every class of their grade level.
+        
+        subject_ids, when given, limits the ranking to those subjects.
+        
+        Returns:
+            values() queryset, one row per enrollment, ordered by grade level and position
+        """
+        summaries = self._summaries(term, academic_year_id, subject_ids)
+        if grade_level:
+            summaries = summaries.filter(enrollment__class_obj__grade_level=grade_level)
+        
+        return self._overall(summaries, [F('enrollment__class_obj__grade_level')], weighted).annotate(
+            grade_level=F('enrollment__class_obj__grade_level')
+        ).order_by('grade_level', 'position', 'enrollment_id')
+    
+    def subject_positions(self, term, academic_year_id=None, class_id=None, subject_id=None, weighted=False,
+                          subject_ids=None):
+        """
+        Position of each student in a subject within their class.
+        
+        subject_ids, when given, limits the rows to those subjects.
+        
+        Returns:
+            values() queryset, one row per (enrollment, subject), ordered by
+            class, subject and position
+        """
+        summaries = self._summaries(term, academic_year_id, subject_ids)
+        if class_id:
+            summaries = summaries.filter(enrollment__class_obj_id=class_id)
+        if subject_id:
+            summaries = summaries.filter(subject_id=subject_id)
+        
+        return summaries.values(
+            *self.STUDENT_FIELDS, 'subject_id', 'subject__subject_code', 'subject__subject_name',
+            marks=F('total_marks'),
+            max_marks=F('total_max_marks'),
+            score=Coalesce('weighted_percentage', 'percentage') if weighted else F('percentage')
+        ).annotate(
+            **self._positions([F('enrollment__class_obj_id'), F('subject_id')], F('score'))
+        ).order_by(
+            'enrollment__class_obj__class_name', 'enrollment__class_obj_id',
+            'subject__subject_code', 'position', 'enrollment_id'
+        )
+
+
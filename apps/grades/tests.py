@@ -1,3 +1,978 @@
+import re
+import tempfile
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+import numpy as np
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import QuerySet
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.test import APIClient
+from apps.accounts.models import User
+from apps.academic.models import AcademicYear, Class, Enrollment, Subject, SubjectAssignment
+from apps.attendance.models import Attendance
+from apps.staff.models import Staff
+from apps.students.models import Student
+from .models import AssessmentWeighting, Grade, GradeSummary, GradingBand, GradingScale, ReportCard
+from .pdf import render_report_card
+from .serializers import GradeCreateSerializer
+from .services import (
+    GradebookService, GradeEntryService, GradeStatisticsService, GradeSummaryService, RankingService,
+    ReportCardRenderService, ReportCardService, competition_rank
+)
 
-# Create your tests here.
+
+class GradesTestCase(TestCase):
+    """
+    Two grade 1 classes marked out of 100 in a term 1 midterm.
+
+    Class A: Math 90/80/80 and English 70/60/80, so overall 80%, 70%, 80%.
+    Class B: Math 50/60 and English -/40, so overall 50%, 50%; the third
+    student has no grades.
+    """
+
+    MARKS = {
+        0: {'MATH': 90, 'ENG': 70},
+        1: {'MATH': 80, 'ENG': 60},
+        2: {'MATH': 80, 'ENG': 80},
+        3: {'MATH': 50},
+        4: {'MATH': 60, 'ENG': 40},
+        5: {},
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='password', role='admin'
+        )
+        cls.academic_year = AcademicYear.objects.create(
+            year_name='2024/2025', start_date=date(2024, 9, 1), end_date=date(2025, 7, 31), is_current=True
+        )
+        cls.classes = [
+            Class.objects.create(class_name=f'Grade 1{section}', grade_level=1, academic_year=cls.academic_year)
+            for section in 'AB'
+        ]
+        cls.subjects = {
+            code: Subject.objects.create(subject_name=name, subject_code=code)
+            for code, name in [('MATH', 'Mathematics'), ('ENG', 'English')]
+        }
+        cls.enrollments = []
+        for number, marks in cls.MARKS.items():
+            student = Student.objects.create(
+                admission_number=f'ADM{number + 1:04d}', first_name=f'Student{number + 1}', last_name='Test',
+                date_of_birth=date(2018, 1, 1), gender='male', admission_date=date(2024, 9, 1)
+            )
+            enrollment = Enrollment.objects.create(
+                student=student, class_obj=cls.classes[number // 3], roll_number=number % 3 + 1
+            )
+            cls.enrollments.append(enrollment)
+            for code, mark in marks.items():
+                cls.grade(enrollment, code, mark)
+
+    @classmethod
+    def grade(cls, enrollment, code, marks, max_marks=100, grade_type='midterm',
+              exam_date=date(2024, 10, 15), term='1'):
+        return Grade.objects.create(
+            student_id=enrollment.student_id, enrollment=enrollment, subject=cls.subjects[code],
+            marks=Decimal(str(marks)), max_marks=Decimal(str(max_marks)), grade_type=grade_type,
+            exam_date=exam_date, term=term, entered_by=cls.admin
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def teach(self, *codes):
+        """Sign in as a teacher assigned to the given subjects in class A"""
+        user = User.objects.create_user(
+            username='teacher', email='teacher@example.com', password='password', role='teacher'
+        )
+        staff = Staff.objects.create(user=user, first_name='Teacher', last_name='Test', staff_type='teacher')
+        for code in codes:
+            SubjectAssignment.objects.create(class_obj=self.classes[0], subject=self.subjects[code], teacher=staff)
+        self.client.force_authenticate(user)
+
+
+class ReportCardTests(GradesTestCase):
+
+    def cards_by_enrollment(self, **kwargs):
+        return {card['enrollment_id']: card for card in ReportCardService().build('1', **kwargs)}
+
+    @staticmethod
+    def subject(card, code):
+        return next(subject for subject in card['subjects'] if subject['subject_code'] == code)
+
+    def test_competition_rank_shares_ties_and_skips_within_each_group(self):
+        ranks = competition_rank(np.array([1, 1, 1, 1, 2, 2]), np.array([90., 80., 80., 70., 50., 60.]))
+
+        self.assertEqual(ranks.tolist(), [1, 2, 2, 4, 2, 1])
+        self.assertEqual(competition_rank(np.array([]), np.array([])).tolist(), [])
+
+    def test_build_ranks_students_within_their_class(self):
+        cards = ReportCardService().build('1')
+
+        self.assertEqual(
+            [(card['admission_number'], card['position'], card['class_size']) for card in cards],
+            [('ADM0001', 1, 3), ('ADM0003', 1, 3), ('ADM0002', 3, 3), ('ADM0004', 1, 2), ('ADM0005', 1, 2)]
+        )
+        first, second = cards[0], cards[2]
+        self.assertEqual(first['overall_percentage'], 80.0)
+        self.assertEqual(first['letter_grade'], 'A')
+        self.assertEqual((second['total_marks'], second['total_max_marks']), (140.0, 200.0))
+        self.assertEqual(second['letter_grade'], 'B')
+
+    def test_subject_ranks_and_averages_cover_students_who_took_the_subject(self):
+        cards = self.cards_by_enrollment()
+
+        math = self.subject(cards[self.enrollments[1].id], 'MATH')
+        self.assertEqual((math['rank'], math['students'], math['class_average']), (2, 3, 83.33))
+        self.assertEqual(self.subject(cards[self.enrollments[2].id], 'MATH')['rank'], 2)
+
+        # Class B: only the fifth student took English
+        self.assertEqual([s['subject_code'] for s in cards[self.enrollments[3].id]['subjects']], ['MATH'])
+        english = self.subject(cards[self.enrollments[4].id], 'ENG')
+        self.assertEqual((english['rank'], english['students'], english['class_average']), (1, 1, 40.0))
+        self.assertNotIn(self.enrollments[5].id, cards)
+
+    def test_overall_is_total_marks_over_total_max_marks(self):
+        self.grade(self.enrollments[1], 'MATH', 10, max_marks=20, grade_type='quiz')
+
+        card = self.cards_by_enrollment()[self.enrollments[1].id]
+
+        # (80 + 10 + 60) / (100 + 20 + 100)
+        self.assertEqual(card['overall_percentage'], 68.18)
+        self.assertEqual(self.subject(card, 'MATH')['percentage'], 75.0)
+        self.assertEqual(card['position'], 3)
+
+    def test_inactive_enrollments_and_other_terms_are_left_out(self):
+        Enrollment.objects.filter(pk=self.enrollments[0].pk).update(status=Enrollment.EnrollmentStatus.WITHDRAWN)
+        self.grade(self.enrollments[1], 'MATH', 100, term='2', exam_date=date(2025, 1, 15))
+
+        cards = self.cards_by_enrollment(class_id=self.classes[0].id)
+
+        self.assertEqual(list(cards), [self.enrollments[2].id, self.enrollments[1].id])
+        self.assertEqual(cards[self.enrollments[1].id]['position'], 2)
+        self.assertEqual(cards[self.enrollments[1].id]['class_size'], 2)
+        self.assertEqual(ReportCardService().build('3'), [])
+
+    def test_invalid_term_is_rejected(self):
+        with self.assertRaises(ValidationError):
+            ReportCardService().build('9')
+
+    def test_generate_upserts_and_removes_stale_cards(self):
+        service = ReportCardService()
+
+        self.assertEqual(service.generate('1'), {'term': '1', 'generated': 5, 'removed': 0})
+        first_ids = set(ReportCard.objects.values_list('id', flat=True))
+        self.assertEqual(service.generate('1'), {'term': '1', 'generated': 5, 'removed': 0})
+        self.assertEqual(set(ReportCard.objects.values_list('id', flat=True)), first_ids)
+
+        Grade.objects.get(enrollment=self.enrollments[3]).delete()
+        result = service.generate('1', class_id=self.classes[1].id)
+
+        self.assertEqual(result, {'term': '1', 'generated': 1, 'removed': 1})
+        self.assertFalse(ReportCard.objects.filter(enrollment=self.enrollments[3]).exists())
+        card = ReportCard.objects.get(enrollment=self.enrollments[0])
+        self.assertEqual((card.overall_percentage, card.position, card.class_size), (Decimal('80.00'), 1, 3))
+
+    def test_report_card_endpoints_and_command(self):
+        response = self.client.get('/grades/report_cards/', {'term': '1', 'class_id': self.classes[1].id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+
+        self.assertEqual(self.client.get('/grades/report_cards/', {'term': '9'}).status_code, 400)
+        self.assertEqual(self.client.get('/grades/report_cards/').status_code, 400)
+
+        response = self.client.post('/grades/generate_report_cards/', {'term': '1'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['generated'], 5)
+
+        out = StringIO()
+        call_command('generate_report_cards', '1', stdout=out)
+        self.assertIn("Term 1: 5 report cards generated, 0 stale removed", out.getvalue())
+
+
+class GradeStatisticsTests(GradesTestCase):
+
+    def statistics(self, code='MATH', term='1'):
+        return GradeStatisticsService().subject_statistics(self.subjects[code].id, term)
+
+    def test_statistics_summarise_the_subject(self):
+        statistics = self.statistics()
+
+        # Math: 90, 80, 80, 50, 60
+        self.assertEqual(statistics['total_grades'], 5)
+        self.assertEqual(statistics['average_percentage'], 72.0)
+        self.assertEqual((statistics['lowest_percentage'], statistics['highest_percentage']), (50.0, 90.0))
+        self.assertEqual(statistics['std_dev'], 14.7)
+        self.assertEqual(statistics['median'], 80.0)
+        self.assertEqual(
+            statistics['percentiles'], {'p10': 54.0, 'p25': 60.0, 'p50': 80.0, 'p75': 80.0, 'p90': 86.0}
+        )
+        self.assertEqual(
+            statistics['grade_distribution'], {'A+': 1, 'A': 2, 'B': 0, 'C': 1, 'D': 1, 'F': 0}
+        )
+
+    def test_breakdowns_by_class_grade_type_and_term(self):
+        breakdowns = self.statistics()['breakdowns']
+
+        by_class = {row['class_name']: row for row in breakdowns['class']}
+        self.assertEqual(by_class['Grade 1A']['total_grades'], 3)
+        self.assertEqual(by_class['Grade 1A']['average_percentage'], 83.33)
+        self.assertEqual(by_class['Grade 1B']['median'], 55.0)
+        self.assertEqual(by_class['Grade 1B']['grade_distribution']['D'], 1)
+        self.assertEqual([row['grade_type'] for row in breakdowns['grade_type']], ['midterm'])
+        self.assertEqual([row['term'] for row in breakdowns['term']], ['1'])
+
+    def test_percentages_are_taken_on_each_grades_max_marks(self):
+        self.grade(self.enrollments[3], 'MATH', 45, max_marks=50, grade_type='quiz')
+
+        statistics = self.statistics()
+
+        self.assertEqual(statistics['total_grades'], 6)
+        self.assertEqual(statistics['highest_percentage'], 90.0)
+        self.assertEqual(statistics['grade_distribution']['A+'], 2)
+        self.assertEqual(statistics['average_marks'], 67.5)
+        self.assertEqual(
+            {row['grade_type']: row['average_percentage'] for row in statistics['breakdowns']['grade_type']},
+            {'midterm': 72.0, 'quiz': 90.0}
+        )
+
+    def test_cached_statistics_refresh_when_grades_change(self):
+        self.statistics()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.statistics()['total_grades'], 5)
+
+        grade = Grade.objects.get(enrollment=self.enrollments[3], subject=self.subjects['MATH'])
+        with self.captureOnCommitCallbacks(execute=True):
+            grade.marks = Decimal('100')
+            grade.save()
+        self.assertEqual(self.statistics()['grade_distribution']['A+'], 2)
+
+        # Moving the grade to term 2 changes both slices
+        self.statistics(term='2')
+        with self.captureOnCommitCallbacks(execute=True):
+            grade.term = '2'
+            grade.save()
+        self.assertEqual(self.statistics()['total_grades'], 4)
+        self.assertEqual(self.statistics(term='2')['total_grades'], 1)
+
+    def test_no_grades_gives_none(self):
+        self.assertIsNone(self.statistics(term='3'))
+
+    def test_statistics_endpoint(self):
+        response = self.client.get('/grades/subject_statistics/', {'subject_id': self.subjects['ENG'].id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_grades'], 4)
+
+        self.assertEqual(self.client.get('/grades/subject_statistics/').status_code, 400)
+        response = self.client.get('/grades/subject_statistics/', {'subject_id': self.subjects['ENG'].id, 'term': '3'})
+        self.assertEqual(response.status_code, 404)
+
+
+class BulkGradeEntryTests(GradesTestCase):
+
+    def row(self, number, code, marks, **changes):
+        enrollment = self.enrollments[number]
+        return {
+            'student_id': enrollment.student_id, 'subject_id': self.subjects[code].id,
+            'enrollment_id': enrollment.id, 'marks': str(marks), 'max_marks': '100',
+            'grade_type': 'final', 'exam_date': '2024-12-10', 'term': '1', **changes
+        }
+
+    def bulk_create(self, rows, **data):
+        return self.client.post('/grades/bulk_create/', {'grades': rows, **data}, format='json')
+
+    def summary(self, number, code, term='1'):
+        return GradeSummary.objects.filter(
+            enrollment=self.enrollments[number], subject=self.subjects[code], term=term
+        ).first()
+
+    def test_new_grades_are_created_and_summaries_updated(self):
+        response = self.bulk_create([self.row(5, 'MATH', 70), self.row(5, 'ENG', 30), self.row(0, 'MATH', 50)])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data, {'created': 3, 'updated': 0, 'errors': []})
+        self.assertEqual(Grade.objects.filter(enrollment=self.enrollments[5]).count(), 2)
+        grade = Grade.objects.get(enrollment=self.enrollments[5], subject=self.subjects['MATH'])
+        self.assertEqual(grade.entered_by, self.admin)
+        summary = self.summary(0, 'MATH')
+        self.assertEqual(
+            (summary.grade_count, summary.total_marks, summary.percentage), (2, Decimal('140'), Decimal('70.00'))
+        )
+        self.assertEqual(self.summary(5, 'ENG').percentage, Decimal('30.00'))
+
+    def test_existing_grade_needs_upsert(self):
+        response = self.bulk_create([
+            self.row(5, 'MATH', 70),
+            self.row(0, 'MATH', 95, grade_type='midterm', exam_date='2024-10-15'),
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'][0]['index'], 1)
+        self.assertEqual(response.data['errors'][0]['errors'], ["Grade already exists; send upsert to correct it"])
+        self.assertFalse(Grade.objects.filter(enrollment=self.enrollments[5]).exists())
+
+    def test_upsert_corrects_existing_grades_and_moves_summaries(self):
+        response = self.bulk_create([
+            self.row(0, 'MATH', 95, grade_type='midterm', exam_date='2024-10-15'),
+            self.row(1, 'ENG', 60, grade_type='midterm', exam_date='2024-10-15', term='2'),
+            self.row(5, 'MATH', 70),
+        ], upsert=True)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data, {'created': 1, 'updated': 2, 'errors': []})
+        self.assertEqual(Grade.objects.count(), 10)
+        self.assertEqual(self.summary(0, 'MATH').total_marks, Decimal('95'))
+        self.assertEqual(self.summary(0, 'MATH').grade_count, 1)
+        self.assertIsNone(self.summary(1, 'ENG'))
+        self.assertEqual(self.summary(1, 'ENG', term='2').percentage, Decimal('60.00'))
+
+    def test_invalid_rows_reject_the_whole_request(self):
+        other = self.row(1, 'MATH', 50)
+        Enrollment.objects.filter(pk=self.enrollments[2].pk).update(status=Enrollment.EnrollmentStatus.COMPLETED)
+
+        response = self.bulk_create([
+            self.row(5, 'MATH', 70),
+            dict(self.row(5, 'ENG', 70), student_id=9999),
+            dict(self.row(5, 'ENG', 70), enrollment_id=self.enrollments[4].id),
+            self.row(2, 'MATH', 70),
+            other,
+            other,
+        ], upsert=True)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [(error['index'], error['errors']) for error in response.data['errors']],
+            [
+                (1, ["Student not found", "Enrollment does not belong to this student"]),
+                (2, ["Enrollment does not belong to this student"]),
+                (3, ["Enrollment is not active"]),
+                (5, ["Duplicate grade in request"]),
+            ]
+        )
+        self.assertEqual(response.data['errors'][3]['data'], other)
+        self.assertEqual(Grade.objects.count(), 9)
+
+    def test_serializer_errors_and_empty_requests_are_rejected(self):
+        response = self.bulk_create([self.row(5, 'MATH', 70), self.row(5, 'ENG', 101)])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1])
+        self.assertEqual(self.bulk_create([]).status_code, 400)
+        self.assertEqual(Grade.objects.count(), 9)
+
+    def test_existing_grades_are_locked_while_validating(self):
+        rows = GradeCreateSerializer(
+            data=[self.row(0, 'MATH', 95, grade_type='midterm', exam_date='2024-10-15')], many=True
+        )
+        rows.is_valid(raise_exception=True)
+
+        lock_rows = mock.patch.object(QuerySet, 'select_for_update', autospec=True, side_effect=lambda qs, **kwargs: qs)
+        with lock_rows as lock:
+            GradeEntryService().validate(rows.validated_data, upsert=True)
+            lock.assert_not_called()
+
+            result, errors = GradeEntryService().enter(rows.validated_data, self.admin, upsert=True)
+
+        self.assertEqual((result, errors), ({'created': 0, 'updated': 1}, []))
+        self.assertEqual(
+            [call.args[0].model for call in lock.call_args_list], [Enrollment, Grade, GradeSummary]
+        )
+
+    def test_a_repeated_submission_finds_the_grades_already_entered(self):
+        rows = [self.row(5, 'MATH', 70), self.row(5, 'ENG', 30)]
+        self.assertEqual(self.bulk_create(rows).status_code, 201)
+
+        response = self.bulk_create(rows)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [error['errors'] for error in response.data['errors']],
+            [["Grade already exists; send upsert to correct it"]] * 2
+        )
+        self.assertEqual(self.summary(5, 'MATH').grade_count, 1)
+
+    def test_upsert_corrects_the_earliest_of_several_grades_on_one_key(self):
+        # Two quizzes on the same day are allowed
+        first = self.grade(self.enrollments[5], 'MATH', 10, max_marks=20, grade_type='quiz')
+        second = self.grade(self.enrollments[5], 'MATH', 12, max_marks=20, grade_type='quiz')
+
+        response = self.bulk_create(
+            [self.row(5, 'MATH', 15, max_marks='20', grade_type='quiz', exam_date='2024-10-15')], upsert=True
+        )
+
+        self.assertEqual(response.data, {'created': 0, 'updated': 1, 'errors': []})
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.marks, second.marks), (Decimal('15'), Decimal('12')))
+        self.assertEqual(self.summary(5, 'MATH').total_marks, Decimal('27'))
+
+    def test_single_create_allows_a_second_assessment_on_the_same_day(self):
+        response = self.client.post(
+            '/grades/', self.row(0, 'MATH', 95, grade_type='midterm', exam_date='2024-10-15'), format='json'
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.summary(0, 'MATH').grade_count, 2)
+
+
+class GradeSummaryTests(GradesTestCase):
+
+    def snapshot(self):
+        return sorted(GradeSummary.objects.values_list(
+            'student_id', 'enrollment_id', 'subject_id', 'term', 'grade_count',
+            'total_marks', 'total_max_marks', 'percentage'
+        ))
+
+    def test_summaries_follow_grade_changes_like_a_rebuild(self):
+        quiz = self.grade(self.enrollments[0], 'MATH', Decimal('7.5'), max_marks=10, grade_type='quiz')
+        quiz.marks = Decimal('9.5')
+        quiz.save()
+        moved = Grade.objects.get(enrollment=self.enrollments[1], subject=self.subjects['ENG'])
+        moved.subject = self.subjects['MATH']
+        moved.term = '2'
+        moved.exam_date = date(2025, 1, 15)
+        moved.save()
+        Grade.objects.get(enrollment=self.enrollments[3]).delete()
+        incremental = self.snapshot()
+
+        rows = GradeSummaryService().rebuild()
+
+        self.assertEqual(rows, 8)
+        self.assertEqual(self.snapshot(), incremental)
+        summary = GradeSummary.objects.get(enrollment=self.enrollments[0], subject=self.subjects['MATH'])
+        # (90 + 9.5) / (100 + 10)
+        self.assertEqual((summary.grade_count, summary.percentage), (2, Decimal('90.45')))
+        self.assertFalse(GradeSummary.objects.filter(enrollment=self.enrollments[3]).exists())
+
+    def test_apply_combines_deltas_and_drops_emptied_summaries(self):
+        grade = Grade.objects.get(enrollment=self.enrollments[4], subject=self.subjects['ENG'])
+        key = (grade.student_id, grade.enrollment_id, grade.subject_id, '1')
+        new_key = (grade.student_id, grade.enrollment_id, grade.subject_id, '3')
+
+        GradeSummary.apply([
+            (key, (-1, Decimal('-40'), Decimal('-100'))),
+            (new_key, (1, Decimal('15'), Decimal('20'))),
+            (new_key, (1, Decimal('5'), Decimal('20'))),
+        ])
+
+        self.assertFalse(GradeSummary.objects.filter(enrollment_id=key[1], subject_id=key[2], term='1').exists())
+        summary = GradeSummary.objects.get(enrollment_id=key[1], subject_id=key[2], term='3')
+        self.assertEqual(
+            (summary.grade_count, summary.total_marks, summary.percentage), (2, Decimal('20'), Decimal('50.00'))
+        )
+        with self.assertNumQueries(0):
+            GradeSummary.apply([])
+
+    def test_summary_rows_are_locked_while_applying(self):
+        lock_rows = mock.patch.object(QuerySet, 'select_for_update', autospec=True, side_effect=lambda qs, **kwargs: qs)
+        with lock_rows as lock:
+            self.grade(self.enrollments[5], 'MATH', 70)
+
+        self.assertEqual([call.args[0].model for call in lock.call_args_list], [GradeSummary])
+
+    def test_rebuild_is_limited_to_its_scope(self):
+        self.grade(self.enrollments[0], 'MATH', 50, term='2', exam_date=date(2025, 1, 15))
+        GradeSummary.objects.all().update(total_marks=0)
+
+        self.assertEqual(GradeSummaryService().rebuild(term='1'), 9)
+
+        self.assertEqual(GradeSummary.objects.get(term='2').total_marks, 0)
+        self.assertEqual(GradeSummary.objects.filter(term='1', total_marks=0).count(), 0)
+
+    def test_rebuild_command(self):
+        GradeSummary.objects.all().delete()
+        out = StringIO()
+
+        call_command('rebuild_grade_summaries', '--term', '1', stdout=out)
+
+        self.assertIn("Rebuilt 9 grade summaries for term 1", out.getvalue())
+        self.assertEqual(GradeSummary.objects.count(), 9)
+
+    def test_reports_read_term_totals_from_summaries(self):
+        self.grade(self.enrollments[0], 'MATH', 10, max_marks=20, grade_type='quiz')
+
+        response = self.client.get(
+            '/grades/student_report/', {'student_id': self.enrollments[0].student_id, 'term': '1'}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Decimal(str(response.data['total_marks'])), Decimal('170'))
+        self.assertEqual(Decimal(str(response.data['overall_percentage'])), Decimal('77.27'))
+        self.assertEqual(len(response.data['grades']), 3)
+
+        response = self.client.get('/grades/class_report/', {
+            'class_id': self.classes[0].id, 'subject_id': self.subjects['MATH'].id, 'term': '1'
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_students'], 3)
+        self.assertEqual(response.data['highest_score']['percentage'], 83.33)
+        self.assertEqual(response.data['lowest_score']['percentage'], 80.0)
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertEqual(len(response.data['grades']), 4)
+        response = self.client.get(
+            '/grades/student_report/', {'student_id': self.enrollments[5].student_id, 'term': '1'}
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class RankingTests(GradesTestCase):
+
+    @staticmethod
+    def positions(rows):
+        return [(row['student__admission_number'], row['position'], row['dense_position']) for row in rows]
+
+    def test_class_positions_share_ties(self):
+        rows = RankingService().class_positions('1')
+
+        self.assertEqual(self.positions(rows), [
+            ('ADM0001', 1, 1), ('ADM0003', 1, 1), ('ADM0002', 3, 2), ('ADM0004', 1, 1), ('ADM0005', 1, 1),
+        ])
+        self.assertEqual(rows[2]['score'], Decimal('70.00'))
+        self.assertEqual(
+            (rows[2]['marks'], rows[2]['max_marks'], rows[2]['subjects']), (Decimal('140'), Decimal('200'), 2)
+        )
+
+    def test_grade_level_positions_span_classes(self):
+        rows = RankingService().grade_level_positions('1', grade_level=1)
+
+        self.assertEqual(self.positions(rows), [
+            ('ADM0001', 1, 1), ('ADM0003', 1, 1), ('ADM0002', 3, 2), ('ADM0004', 4, 3), ('ADM0005', 4, 3),
+        ])
+        self.assertEqual({row['grade_level'] for row in rows}, {1})
+
+    def test_subject_positions_rank_within_class_and_subject(self):
+        rows = RankingService().subject_positions('1', class_id=self.classes[0].id, subject_id=self.subjects['MATH'].id)
+
+        self.assertEqual(self.positions(rows), [('ADM0001', 1, 1), ('ADM0002', 2, 2), ('ADM0003', 2, 2)])
+
+    def test_inactive_enrollments_are_not_ranked(self):
+        Enrollment.objects.filter(pk=self.enrollments[0].pk).update(status=Enrollment.EnrollmentStatus.WITHDRAWN)
+
+        rows = RankingService().class_positions('1', class_id=self.classes[0].id)
+
+        self.assertEqual(self.positions(rows), [('ADM0003', 1, 1), ('ADM0002', 2, 2)])
+
+    def test_invalid_term_is_rejected(self):
+        with self.assertRaises(ValidationError):
+            RankingService().class_positions('9')
+
+    def test_endpoint_positions_are_computed_before_paging(self):
+        with mock.patch.object(PageNumberPagination, 'page_size', 2):
+            response = self.client.get('/grades/rankings/', {'term': '1', 'scope': 'grade_level', 'page': 2})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(
+            [(row['admission_number'], row['position']) for row in response.data['results']],
+            [('ADM0002', 3), ('ADM0004', 4)]
+        )
+        self.assertEqual(response.data['results'][0]['percentage'], Decimal('70.00'))
+
+    def test_endpoint_subject_scope_and_errors(self):
+        response = self.client.get(
+            '/grades/rankings/', {'term': '1', 'scope': 'subject', 'class_id': self.classes[1].id}
+        )
+
+        self.assertEqual(
+            [(row['subject_code'], row['student_name'], row['position']) for row in response.data['results']],
+            [('ENG', 'Student5 Test', 1), ('MATH', 'Student5 Test', 1), ('MATH', 'Student4 Test', 2)]
+        )
+        self.assertEqual(self.client.get('/grades/rankings/').status_code, 400)
+        self.assertEqual(self.client.get('/grades/rankings/', {'term': '1', 'scope': 'school'}).status_code, 400)
+        self.assertEqual(self.client.get('/grades/rankings/', {'term': '9'}).status_code, 400)
+
+    def test_teachers_are_ranked_over_their_assigned_subjects(self):
+        self.teach('ENG')
+
+        def ranked(**params):
+            response = self.client.get('/grades/rankings/', {'term': '1', **params})
+            self.assertEqual(response.status_code, 200)
+            return response.data['results']
+
+        rows = ranked(class_id=self.classes[0].id)
+        self.assertEqual(
+            [(row['admission_number'], row['percentage'], row['position']) for row in rows],
+            [('ADM0003', Decimal('80.00'), 1), ('ADM0001', Decimal('70.00'), 2), ('ADM0002', Decimal('60.00'), 3)]
+        )
+        self.assertEqual({row['subject_code'] for row in ranked(scope='subject')}, {'ENG'})
+        self.assertEqual(ranked(scope='subject', subject_id=self.subjects['MATH'].id), [])
+        self.assertEqual(
+            [(row['admission_number'], row['position']) for row in ranked(scope='grade_level')],
+            [('ADM0003', 1), ('ADM0001', 2), ('ADM0002', 3), ('ADM0005', 4)]
+        )
+
+
+class GradingScaleTests(GradesTestCase):
+
+    def scale(self, name, bands, academic_year=None, grade_level=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            scale = GradingScale.objects.create(name=name, academic_year=academic_year, grade_level=grade_level)
+            for letter, min_percentage in bands.items():
+                GradingBand.objects.create(scale=scale, letter=letter, min_percentage=min_percentage)
+        return scale
+
+    def test_default_bands_apply_without_a_scale(self):
+        self.assertEqual(
+            [GradingScale.letter_for(pct) for pct in [100, 90, Decimal('89.99'), 50, Decimal('49.99'), 0]],
+            ['A+', 'A+', 'A', 'D', 'F', 'F']
+        )
+        self.assertEqual(GradingScale.letters(), ['A+', 'A', 'B', 'C', 'D', 'F'])
+
+    def test_most_specific_scale_applies(self):
+        self.scale('Primary', {'P': 50, 'U': 0}, grade_level=1)
+        self.scale('Year', {'Y': 0}, academic_year=self.academic_year)
+        self.scale(
+            'Year primary', {'Merit': 75, 'Pass': 40, 'Fail': 10}, academic_year=self.academic_year, grade_level=1
+        )
+
+        self.assertEqual(GradingScale.letter_for(80, self.academic_year.id, 1), 'Merit')
+        # Below the lowest band still gets the lowest letter
+        self.assertEqual(GradingScale.letter_for(5, self.academic_year.id, 1), 'Fail')
+        self.assertEqual(GradingScale.letter_for(80, self.academic_year.id, 2), 'Y')
+        self.assertEqual(GradingScale.letter_for(80, None, 1), 'P')
+        self.assertEqual(GradingScale.letter_for(80), 'A')
+
+    def test_sql_letters_match_the_python_scale(self):
+        Class.objects.filter(pk=self.classes[1].pk).update(grade_level=2)
+        self.scale('Upper', {'P': 55, 'U': 0}, grade_level=2)
+
+        grades = list(Grade.with_letters().select_related('enrollment__class_obj').order_by('id'))
+
+        self.assertEqual(
+            [grade.letter for grade in grades],
+            [GradingScale.letter_for_enrollment(grade.pct, grade) for grade in grades]
+        )
+        self.assertEqual(
+            sorted(grade.letter for grade in grades if grade.enrollment.class_obj_id == self.classes[1].id),
+            ['P', 'U', 'U']
+        )
+
+    def test_letters_read_without_annotation_avoid_per_row_queries(self):
+        grade = Grade.objects.get(enrollment=self.enrollments[0], subject=self.subjects['MATH'])
+        GradingScale.compiled()
+        with self.assertNumQueries(0):
+            self.assertEqual(grade.letter_grade, 'A+')
+
+        self.scale('Primary', {'P': 50, 'U': 0}, grade_level=1)
+        grade = Grade.objects.select_related('enrollment__class_obj').get(pk=grade.pk)
+        GradingScale.compiled()
+        with self.assertNumQueries(0):
+            self.assertEqual(grade.letter_grade, 'P')
+
+    def test_grade_list_letters_are_computed_in_sql(self):
+        def list_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get('/grades/')
+            self.assertEqual(response.status_code, 200)
+            return len(queries)
+
+        self.scale('Primary', {'P': 50, 'U': 0}, grade_level=1)
+        list_queries()
+        before = list_queries()
+        for number in range(6):
+            self.grade(self.enrollments[number], 'MATH', 30, grade_type='quiz')
+
+        self.assertEqual(list_queries(), before)
+        response = self.client.get('/grades/', {'letter': 'U'})
+        self.assertEqual(response.data['count'], 7)
+        self.assertEqual({grade['letter_grade'] for grade in response.data['results']}, {'U'})
+
+    def test_report_cards_use_the_class_scale(self):
+        self.scale('Primary', {'P': 75, 'U': 0}, academic_year=self.academic_year, grade_level=1)
+
+        cards = ReportCardService().build('1', class_id=self.classes[0].id)
+
+        self.assertEqual([card['letter_grade'] for card in cards], ['P', 'P', 'U'])
+        self.assertEqual([subject['letter_grade'] for subject in cards[0]['subjects']], ['P', 'U'])
+
+    def test_scale_endpoint_validates_bands_and_scope(self):
+        data = {'name': 'Primary', 'grade_level': 1, 'bands': [
+            {'letter': 'U', 'min_percentage': '0'}, {'letter': 'P', 'min_percentage': '50'},
+        ]}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/grading-scales/', data, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([band['letter'] for band in response.data['bands']], ['P', 'U'])
+        self.assertEqual(GradingScale.letter_for(60, self.academic_year.id, 1), 'P')
+
+        self.assertEqual(self.client.post('/grading-scales/', data, format='json').status_code, 400)
+        duplicate_letters = {**data, 'grade_level': 2, 'bands': [
+            {'letter': 'P', 'min_percentage': '0'}, {'letter': 'P', 'min_percentage': '50'},
+        ]}
+        self.assertEqual(self.client.post('/grading-scales/', duplicate_letters, format='json').status_code, 400)
+        no_bands = {**data, 'grade_level': 2, 'bands': []}
+        self.assertEqual(self.client.post('/grading-scales/', no_bands, format='json').status_code, 400)
+
+
+class ReportCardRenderTests(GradesTestCase):
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media = self.settings(MEDIA_ROOT=media_root.name)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def render(self, **kwargs):
+        return ReportCardRenderService().render('1', class_id=self.classes[0].id, workers=1, **kwargs)
+
+    def pdf_names(self):
+        return dict(ReportCard.objects.values_list('enrollment_id', 'pdf'))
+
+    def test_render_writes_a_pdf_per_card_and_skips_unchanged_ones(self):
+        result = self.render()
+
+        self.assertEqual((result['rendered'], result['unchanged']), (3, 0))
+        names = self.pdf_names()
+        self.assertEqual(len(names), 3)
+        for name in names.values():
+            self.assertTrue(name.startswith('report_cards/2024-2025/term-1/'))
+            with default_storage.open(name) as pdf:
+                self.assertEqual(pdf.read(4), b'%PDF')
+        self.assertEqual(result['report_cards'][0]['pdf'], default_storage.url(names[self.enrollments[0].id]))
+
+        result = self.render()
+        self.assertEqual((result['rendered'], result['unchanged']), (0, 3))
+        self.assertEqual(self.pdf_names(), names)
+
+    def test_changed_cards_are_rendered_again_and_the_old_file_removed(self):
+        self.render()
+        names = self.pdf_names()
+        Attendance.objects.create(
+            student_id=self.enrollments[1].student_id, class_obj=self.classes[0],
+            attendance_date=date(2024, 10, 1), status='absent'
+        )
+
+        result = self.render()
+
+        self.assertEqual((result['rendered'], result['unchanged']), (1, 2))
+        new_name = self.pdf_names()[self.enrollments[1].id]
+        self.assertNotEqual(new_name, names[self.enrollments[1].id])
+        self.assertFalse(default_storage.exists(names[self.enrollments[1].id]))
+        self.assertTrue(default_storage.exists(new_name))
+
+        self.assertEqual(self.render(force=True)['rendered'], 3)
+
+    def test_documents_count_attendance_in_the_academic_year(self):
+        student_id = self.enrollments[0].student_id
+        for day, status in [(1, 'present'), (2, 'absent'), (3, 'late')]:
+            Attendance.objects.create(
+                student_id=student_id, class_obj=self.classes[0], attendance_date=date(2024, 10, day), status=status
+            )
+        Attendance.objects.create(
+            student_id=student_id, class_obj=self.classes[0], attendance_date=date(2025, 8, 1), status='absent'
+        )
+        cards = ReportCardService().build('1', class_id=self.classes[0].id)
+
+        documents = ReportCardRenderService().documents(cards, self.academic_year)
+
+        self.assertEqual(
+            documents[0]['attendance'], {'total': 3, 'present': 1, 'absent': 1, 'late': 1, 'excused': 0}
+        )
+        self.assertEqual(documents[2]['attendance']['total'], 0)
+        self.assertEqual(documents[0]['academic_year'], '2024/2025')
+
+    def test_long_subject_lists_continue_on_further_pages(self):
+        cards = ReportCardService().build('1', class_id=self.classes[0].id)
+        document = ReportCardRenderService().documents(cards, self.academic_year)[0]
+        subject = document['subjects'][0]
+
+        for count, pages in [(20, 1), (60, 2)]:
+            document['subjects'] = [
+                {**subject, 'subject_name': f'Subject {number}'} for number in range(count)
+            ]
+            _, pdf = render_report_card(document)
+
+            self.assertEqual(int(re.search(rb'/Count (\d+)', pdf).group(1)), pages)
+
+    def test_stale_card_pdfs_are_deleted_once_committed(self):
+        self.render()
+        name = self.pdf_names()[self.enrollments[1].id]
+        for grade in Grade.objects.filter(enrollment=self.enrollments[1]):
+            grade.delete()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            result = ReportCardService().generate('1', class_id=self.classes[0].id)
+            self.assertEqual(result['removed'], 1)
+        self.assertTrue(default_storage.exists(name))
+
+        for callback in callbacks:
+            callback()
+        self.assertFalse(default_storage.exists(name))
+
+    def test_render_endpoint_is_limited_to_one_class(self):
+        response = self.client.post('/grades/render_report_cards/', {'term': '1'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(
+            '/grades/render_report_cards/', {'term': '1', 'class_id': self.classes[1].id}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['rendered'], 2)
+
+    def test_render_command(self):
+        out = StringIO()
+
+        call_command('render_report_cards', '1', '--workers', '1', stdout=out)
+
+        self.assertIn("Term 1: 5 report cards rendered, 0 unchanged", out.getvalue())
+
+
+class AssessmentWeightingTests(GradesTestCase):
+
+    def weighted(self, number, code):
+        return GradeSummary.objects.get(
+            enrollment=self.enrollments[number], subject=self.subjects[code], term='1'
+        ).weighted_percentage
+
+    def test_policy_weights_each_assessment_type(self):
+        AssessmentWeighting.objects.create(academic_year=self.academic_year, weights={'quiz': 40, 'midterm': 60})
+        # Only the midterm is in so far, so it carries the whole score
+        self.assertEqual(self.weighted(0, 'MATH'), Decimal('90.00'))
+
+        self.grade(self.enrollments[0], 'MATH', 5, max_marks=10, grade_type='quiz')
+
+        # 40% of 50 + 60% of 90, against 95 / 110 unweighted
+        summary = GradeSummary.objects.get(enrollment=self.enrollments[0], subject=self.subjects['MATH'])
+        self.assertEqual((summary.weighted_percentage, summary.percentage), (Decimal('74.00'), Decimal('86.36')))
+
+    def test_subject_policy_overrides_the_year_default(self):
+        AssessmentWeighting.objects.create(academic_year=self.academic_year, weights={'quiz': 40, 'midterm': 60})
+        AssessmentWeighting.objects.create(
+            academic_year=self.academic_year, subject=self.subjects['MATH'], weights={'quiz': 50, 'midterm': 50}
+        )
+        self.grade(self.enrollments[0], 'MATH', 5, max_marks=10, grade_type='quiz')
+        self.grade(self.enrollments[0], 'ENG', 5, max_marks=10, grade_type='quiz')
+
+        self.assertEqual(self.weighted(0, 'MATH'), Decimal('70.00'))
+        self.assertEqual(self.weighted(0, 'ENG'), Decimal('62.00'))
+
+    def test_unweighted_types_are_ignored_and_removing_the_policy_clears_scores(self):
+        policy = AssessmentWeighting.objects.create(academic_year=self.academic_year, weights={'quiz': 100})
+        self.assertIsNone(self.weighted(0, 'MATH'))
+        self.grade(self.enrollments[0], 'MATH', 5, max_marks=10, grade_type='quiz')
+        self.assertEqual(self.weighted(0, 'MATH'), Decimal('50.00'))
+
+        policy.delete()
+
+        self.assertFalse(GradeSummary.objects.filter(weighted_percentage__isnull=False).exists())
+
+    def test_rebuild_keeps_weighted_scores(self):
+        AssessmentWeighting.objects.create(academic_year=self.academic_year, weights={'quiz': 40, 'midterm': 60})
+        self.grade(self.enrollments[0], 'MATH', 5, max_marks=10, grade_type='quiz')
+
+        GradeSummaryService().rebuild(term='1')
+
+        self.assertEqual(self.weighted(0, 'MATH'), Decimal('74.00'))
+
+    def test_weighted_report_cards_and_rankings_average_subject_scores(self):
+        AssessmentWeighting.objects.create(academic_year=self.academic_year, weights={'quiz': 50, 'midterm': 50})
+        # A full-marks quiz lifts the second student's weighted Math score from 80 to 90
+        self.grade(self.enrollments[1], 'MATH', 10, max_marks=10, grade_type='quiz')
+
+        cards = {
+            card['enrollment_id']: card
+            for card in ReportCardService().build('1', class_id=self.classes[0].id, weighted=True)
+        }
+        rows = RankingService().class_positions('1', class_id=self.classes[0].id, weighted=True)
+
+        # Mean of 90 (Math) and 60 (English)
+        self.assertEqual(cards[self.enrollments[1].id]['overall_percentage'], 75.0)
+        self.assertEqual(cards[self.enrollments[1].id]['position'], 3)
+        self.assertEqual(
+            {row['enrollment_id']: row['score'] for row in rows}[self.enrollments[1].id], Decimal('75.00')
+        )
+        unweighted = ReportCardService().build('1', class_id=self.classes[0].id)
+        self.assertEqual(
+            {card['enrollment_id']: card['overall_percentage'] for card in unweighted}[self.enrollments[1].id],
+            71.43
+        )
+
+    def test_weighting_endpoint_validates_weights(self):
+        data = {'academic_year_id': self.academic_year.id, 'weights': {'quiz': 40, 'midterm': 60}}
+
+        response = self.client.post('/assessment-weightings/', data, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.weighted(0, 'MATH'), Decimal('90.00'))
+        self.assertEqual(self.client.post('/assessment-weightings/', data, format='json').status_code, 400)
+        for weights in [{'quiz': 40, 'midterm': 50}, {'quiz': 40, 'oral': 60}, {'quiz': -10, 'midterm': 110}, {}]:
+            response = self.client.post('/assessment-weightings/', {
+                'academic_year_id': self.academic_year.id, 'subject_id': self.subjects['MATH'].id, 'weights': weights
+            }, format='json')
+            self.assertEqual(response.status_code, 400, weights)
+
+
+class GradebookTests(GradesTestCase):
+
+    def build(self, class_index=0, code='MATH', term='1'):
+        return GradebookService().build(self.classes[class_index].id, self.subjects[code].id, term)
+
+    def test_gradebook_is_one_row_per_student_and_one_column_per_assessment(self):
+        self.grade(self.enrollments[0], 'MATH', 18, max_marks=20, grade_type='quiz', exam_date=date(2024, 9, 20))
+        self.grade(self.enrollments[2], 'MATH', 9, max_marks=10, grade_type='quiz', exam_date=date(2024, 9, 20))
+
+        with self.assertNumQueries(1):
+            gradebook = self.build()
+
+        self.assertEqual(gradebook['admission_numbers'], ['ADM0001', 'ADM0002', 'ADM0003'])
+        self.assertEqual(gradebook['student_names'][0], 'Student1 Test')
+        self.assertEqual(gradebook['assessments'], [
+            {'grade_type': 'quiz', 'exam_date': date(2024, 9, 20), 'max_marks': 20.0},
+            {'grade_type': 'midterm', 'exam_date': date(2024, 10, 15), 'max_marks': 100.0},
+        ])
+        self.assertEqual(gradebook['marks'], [[18.0, 90.0], [None, 80.0], [9.0, 80.0]])
+
+    def test_students_without_marks_keep_their_row(self):
+        gradebook = self.build(class_index=1, code='ENG')
+
+        self.assertEqual(gradebook['admission_numbers'], ['ADM0004', 'ADM0005', 'ADM0006'])
+        self.assertEqual(gradebook['marks'], [[None], [40.0], [None]])
+
+    def test_other_terms_and_inactive_enrollments_are_left_out(self):
+        self.grade(self.enrollments[0], 'MATH', 70, term='2', exam_date=date(2025, 1, 15))
+        Enrollment.objects.filter(pk=self.enrollments[1].pk).update(status=Enrollment.EnrollmentStatus.WITHDRAWN)
+
+        gradebook = self.build()
+
+        self.assertEqual(gradebook['student_ids'], [self.enrollments[0].student_id, self.enrollments[2].student_id])
+        self.assertEqual(gradebook['marks'], [[90.0], [80.0]])
+        self.assertEqual(self.build(term='3')['assessments'], [])
+        with self.assertRaises(ValidationError):
+            self.build(term='9')
+
+    def test_gradebook_endpoint(self):
+        params = {'class_id': self.classes[0].id, 'subject_id': self.subjects['ENG'].id, 'term': '1'}
+
+        response = self.client.get('/grades/gradebook/', params)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['marks'], [[70.0], [60.0], [80.0]])
+        self.assertEqual(self.client.get('/grades/gradebook/', {**params, 'term': '9'}).status_code, 400)
+        self.assertEqual(self.client.get('/grades/gradebook/', {'term': '1'}).status_code, 400)
+
+    def test_teachers_open_only_gradebooks_for_their_subjects(self):
+        self.teach('ENG')
+        params = {'class_id': self.classes[0].id, 'term': '1'}
+
+        response = self.client.get('/grades/gradebook/', {**params, 'subject_id': self.subjects['ENG'].id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['marks'], [[70.0], [60.0], [80.0]])
+
+        response = self.client.get('/grades/gradebook/', {**params, 'subject_id': self.subjects['MATH'].id})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.client.get('/grades/gradebook/', {**params, 'subject_id': 'x'}).status_code, 400)
@@ -1,34 +1,49 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
 from django.db.models import Q, Sum, Avg
-from .models import Grade
-from .serializers import GradeSerializer, GradeCreateSerializer, StudentGradeReportSerializer
-from apps.accounts.permissions import CanManageGrades
+from .models import AssessmentWeighting, Grade, GradeSummary, GradingScale
+from .serializers import (
+    AssessmentWeightingSerializer, GradeSerializer, GradeCreateSerializer,
+    GradeSummarySerializer, GradingScaleSerializer, StudentGradeReportSerializer
+)
+from .services import (
+    GradebookService, GradeEntryService, GradeStatisticsService, RankingService,
+    ReportCardRenderService, ReportCardService
+)
+from apps.accounts.permissions import CanManageGrades, IsAdminOrHeadmaster
+from config.pagination import OptionalKeysetPaginationMixin
 
 
-class GradeViewSet(viewsets.ModelViewSet):
+class GradeViewSet(OptionalKeysetPaginationMixin, viewsets.ModelViewSet):
     """ViewSet for Grade management"""
     
-    queryset = Grade.objects.select_related('student', 'subject', 'enrollment', 'entered_by').all()
+    queryset = Grade.objects.select_related('student', 'subject', 'enrollment__class_obj', 'entered_by').all()
     permission_classes = [IsAuthenticated, CanManageGrades]
+    keyset_ordering = ('-exam_date', '-id')
     
     def get_serializer_class(self):
         if self.action == 'create':
             return GradeCreateSerializer
         return GradeSerializer
     
+    def teacher_subject_ids(self):
+        """Subjects assigned to a teacher, or None for users who see every subject"""
+        if self.request.user.role != 'teacher':
+            return None
+        from apps.academic.models import SubjectAssignment
+        return SubjectAssignment.objects.filter(
+            teacher__user=self.request.user
+        ).values_list('subject_id', flat=True)
+    
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = Grade.with_letters(super().get_queryset())
         
         # Teachers can only see grades for their assigned subjects
-        if self.request.user.role == 'teacher':
-            # Get teacher's subject assignments
-            from apps.academic.models import SubjectAssignment
-            teacher_subjects = SubjectAssignment.objects.filter(
-                teacher__user=self.request.user
-            ).values_list('subject_id', flat=True)
+        teacher_subjects = self.teacher_subject_ids()
+        if teacher_subjects is not None:
             queryset = queryset.filter(subject_id__in=teacher_subjects)
         
         # Filter by student
@@ -56,6 +71,11 @@ class GradeViewSet(viewsets.ModelViewSet):
         if enrollment_id:
             queryset = queryset.filter(enrollment_id=enrollment_id)
         
+        # Filter by letter grade, evaluated in SQL on each class's scale
+        letter = self.request.query_params.get('letter', None)
+        if letter:
+            queryset = queryset.filter(letter=letter)
+        
         return queryset
     
     def perform_create(self, serializer):
@@ -63,36 +83,37 @@ class GradeViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['post'])
     def bulk_create(self, request):
-        """Create multiple grades at once"""
+        """
+        Create multiple grades at once, all or nothing.
+        
+        With upsert true, rows matching an existing grade on (student,
+        subject, grade_type, exam_date) correct it instead of failing.
+        """
         grades_data = request.data.get('grades', [])
+        upsert = str(request.data.get('upsert', '')).lower() == 'true'
         
-        if not grades_data:
+        if not grades_data or not isinstance(grades_data, list):
             return Response(
                 {'error': 'grades array is required'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        created_grades = []
-        errors = []
+        serializer = GradeCreateSerializer(data=grades_data, many=True)
+        if not serializer.is_valid():
+            errors = [
+                {'index': index, 'data': grades_data[index], 'errors': row_errors}
+                for index, row_errors in enumerate(serializer.errors) if row_errors
+            ]
+            return Response({'created': 0, 'updated': 0, 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
         
-        for grade_data in grades_data:
-            serializer = GradeCreateSerializer(data=grade_data)
-            if serializer.is_valid():
-                grade = Grade.objects.create(
-                    **serializer.validated_data,
-                    entered_by=request.user
-                )
-                created_grades.append(grade)
-            else:
-                errors.append({
-                    'data': grade_data,
-                    'errors': serializer.errors
-                })
+        service = GradeEntryService()
+        result, errors = service.enter(serializer.validated_data, request.user, upsert=upsert)
+        if errors:
+            for error in errors:
+                error['data'] = grades_data[error['index']]
+            return Response({'created': 0, 'updated': 0, 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
         
-        return Response({
-            'created': GradeSerializer(created_grades, many=True).data,
-            'errors': errors
-        }, status=status.HTTP_201_CREATED if created_grades else status.HTTP_400_BAD_REQUEST)
+        return Response({**result, 'errors': []}, status=status.HTTP_201_CREATED)
     
     @action(detail=False, methods=['get'])
     def student_report(self, request):
@@ -106,33 +127,39 @@ class GradeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get all grades for student in the term
-        grades = Grade.objects.filter(
+        # Term totals come from one summary row per subject
+        summaries = list(GradeSummary.with_letters().filter(
             student_id=student_id,
             term=term
-        ).select_related('subject')
+        ).select_related('student', 'subject'))
         
-        if not grades.exists():
+        if not summaries:
             return Response(
                 {'error': 'No grades found for this student and term'},
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Calculate totals
-        total_marks = sum(grade.marks for grade in grades)
-        total_max_marks = sum(grade.max_marks for grade in grades)
-        overall_percentage = (total_marks / total_max_marks * 100) if total_max_marks > 0 else 0
+        grades = Grade.with_letters().filter(
+            student_id=student_id,
+            term=term
+        ).select_related('subject')
         
-        from apps.students.models import Student
-        student = Student.objects.get(id=student_id)
+        total_marks = sum(summary.total_marks for summary in summaries)
+        total_max_marks = sum(summary.total_max_marks for summary in summaries)
         
         report_data = {
-            'student': student,
+            'student': summaries[0].student,
             'term': term,
             'grades': grades,
+            'subjects': summaries,
             'total_marks': total_marks,
             'total_max_marks': total_max_marks,
-            'overall_percentage': round(overall_percentage, 2)
+            'overall_percentage': GradeSummary.percentage_of(total_marks, total_max_marks),
+            # Mean of subject scores weighted by assessment type
+            'weighted_percentage': round(sum(
+                summary.percentage if summary.weighted_percentage is None else summary.weighted_percentage
+                for summary in summaries
+            ) / len(summaries), 2)
         }
         
         serializer = StudentGradeReportSerializer(report_data)
@@ -151,86 +178,277 @@ class GradeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get all enrollments for the class
+        # One summary row per active student in the class
         from apps.academic.models import Enrollment
-        enrollments = Enrollment.objects.filter(
-            class_obj_id=class_id,
-            status='active'
-        ).values_list('id', flat=True)
-        
-        # Get grades for all students in this class for the subject and term
-        grades = Grade.objects.filter(
-            enrollment_id__in=enrollments,
+        summaries = list(GradeSummary.with_letters().filter(
+            enrollment__class_obj_id=class_id,
+            enrollment__status=Enrollment.EnrollmentStatus.ACTIVE,
             subject_id=subject_id,
             term=term
-        ).select_related('student', 'subject')
+        ).select_related('student', 'subject').order_by('-percentage', 'student__admission_number'))
         
         # Calculate class statistics
-        if grades.exists():
-            avg_percentage = sum(grade.percentage for grade in grades) / len(grades)
-            highest = max(grades, key=lambda g: g.percentage)
-            lowest = min(grades, key=lambda g: g.percentage)
+        if summaries:
+            grades = Grade.with_letters().filter(
+                enrollment__class_obj_id=class_id,
+                enrollment__status=Enrollment.EnrollmentStatus.ACTIVE,
+                subject_id=subject_id,
+                term=term
+            ).select_related('student', 'subject')
+            avg_percentage = sum(summary.percentage for summary in summaries) / len(summaries)
+            highest = summaries[0]
+            lowest = summaries[-1]
             
             return Response({
                 'class_id': class_id,
                 'subject_id': subject_id,
                 'term': term,
-                'total_students': len(grades),
+                'total_students': len(summaries),
                 'average_percentage': round(avg_percentage, 2),
                 'highest_score': {
                     'student': highest.student.full_name,
-                    'marks': float(highest.marks),
+                    'marks': float(highest.total_marks),
                     'percentage': float(highest.percentage)
                 },
                 'lowest_score': {
                     'student': lowest.student.full_name,
-                    'marks': float(lowest.marks),
+                    'marks': float(lowest.total_marks),
                     'percentage': float(lowest.percentage)
                 },
-                'grades': GradeSerializer(grades, many=True).data
+                'grades': GradeSerializer(grades, many=True).data,
+                'results': GradeSummarySerializer(summaries, many=True).data
             })
         
         return Response({'error': 'No grades found'}, status=status.HTTP_404_NOT_FOUND)
     
+    @action(detail=False, methods=['get'])
+    def gradebook(self, request):
+        """Marks for a class, subject and term as a students x assessments matrix"""
+        class_id = request.query_params.get('class_id')
+        subject_id = request.query_params.get('subject_id')
+        term = request.query_params.get('term')
+        
+        if not class_id or not subject_id or not term:
+            return Response(
+                {'error': 'class_id, subject_id, and term are required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        service = GradebookService()
+        try:
+            # Teachers can only open gradebooks for their assigned subjects
+            teacher_subjects = self.teacher_subject_ids()
+            if teacher_subjects is not None and not teacher_subjects.filter(subject_id=subject_id).exists():
+                return Response(
+                    {'error': 'You are not assigned to this subject'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            gradebook = service.build(class_id, subject_id, term)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(gradebook)
+    
     @action(detail=False, methods=['get'])
     def subject_statistics(self, request):
         """Get statistics for a subject across all classes"""
         subject_id = request.query_params.get('subject_id')
         term = request.query_params.get('term')
         
-        if not subject_id or not term:
+        if not subject_id:
             return Response(
-                {'error': 'subject_id and term are required'},
+                {'error': 'subject_id is required'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        grades = Grade.objects.filter(subject_id=subject_id, term=term)
+        service = GradeStatisticsService()
+        statistics = service.subject_statistics(
+            subject_id=subject_id,
+            term=term,
+            academic_year_id=request.query_params.get('academic_year_id')
+        )
         
-        if grades.exists():
-            total_students = grades.count()
-            avg_marks = grades.aggregate(Avg('marks'))['marks__avg']
-            
-            # Grade distribution
-            a_plus = grades.filter(marks__gte=90).count()
-            a = grades.filter(marks__gte=80, marks__lt=90).count()
-            b = grades.filter(marks__gte=70, marks__lt=80).count()
-            c = grades.filter(marks__gte=60, marks__lt=70).count()
-            d = grades.filter(marks__gte=50, marks__lt=60).count()
-            f = grades.filter(marks__lt=50).count()
-            
-            return Response({
-                'subject_id': subject_id,
-                'term': term,
-                'total_students': total_students,
-                'average_marks': round(float(avg_marks), 2),
-                'grade_distribution': {
-                    'A+': a_plus,
-                    'A': a,
-                    'B': b,
-                    'C': c,
-                    'D': d,
-                    'F': f
-                }
-            })
+        if statistics:
+            return Response(statistics)
+        
+        return Response({'error': 'No grades found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    @action(detail=False, methods=['get'])
+    def rankings(self, request):
+        """
+        Paginated positions for a term, ties sharing a position.
+        
+        scope is 'class' (overall percentage within each class), 'subject'
+        (each subject within each class) or 'grade_level' (overall
+        percentage across all classes of a grade level). weighted=true
+        ranks on assessment-weighted scores. Teachers only see positions
+        computed over the subjects they are assigned to.
+        """
+        term = request.query_params.get('term')
+        scope = request.query_params.get('scope', 'class')
+        academic_year_id = request.query_params.get('academic_year_id')
+        class_id = request.query_params.get('class_id')
+        weighted = request.query_params.get('weighted', '').lower() == 'true'
+        
+        if not term:
+            return Response(
+                {'error': 'term is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Teachers are ranked over their assigned subjects only
+        subject_ids = self.teacher_subject_ids()
+        service = RankingService()
+        try:
+            if scope == 'class':
+                rows = service.class_positions(term, academic_year_id, class_id, weighted, subject_ids)
+            elif scope == 'subject':
+                rows = service.subject_positions(
+                    term, academic_year_id, class_id, request.query_params.get('subject_id'), weighted, subject_ids
+                )
+            elif scope == 'grade_level':
+                rows = service.grade_level_positions(
+                    term, academic_year_id, request.query_params.get('grade_level'), weighted, subject_ids
+                )
+            else:
+                return Response(
+                    {'error': 'scope must be class, subject or grade_level'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        return Response({'error': 'No grades found'}, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+        # Positions are computed over the whole partition before the page is cut
+        paginator = PageNumberPagination()
+        page = paginator.paginate_queryset(rows, request, view=self)
+        return paginator.get_paginated_response([service.format_row(row) for row in page])
+    
+    @action(detail=False, methods=['get'])
+    def report_cards(self, request):
+        """Report cards with class positions for a term, computed on the fly"""
+        term = request.query_params.get('term')
+        
+        if not term:
+            return Response(
+                {'error': 'term is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        service = ReportCardService()
+        try:
+            cards = service.build(
+                term=term,
+                academic_year_id=request.query_params.get('academic_year_id'),
+                class_id=request.query_params.get('class_id'),
+                weighted=request.query_params.get('weighted', '').lower() == 'true'
+            )
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({'term': term, 'count': len(cards), 'report_cards': cards})
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated, IsAdminOrHeadmaster])
+    def generate_report_cards(self, request):
+        """Compute and store report cards for a term"""
+        term = request.data.get('term')
+        
+        if not term:
+            return Response(
+                {'error': 'term is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        service = ReportCardService()
+        try:
+            result = service.generate(
+                term=str(term),
+                academic_year_id=request.data.get('academic_year_id'),
+                class_id=request.data.get('class_id'),
+                weighted=str(request.data.get('weighted', '')).lower() == 'true'
+            )
+            return Response(result, status=status.HTTP_201_CREATED)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated, IsAdminOrHeadmaster])
+    def render_report_cards(self, request):
+        """
+        Render report card PDFs for one class.
+        
+        Rendering runs in the request without a process pool, so it is
+        limited to a class; whole-school runs belong to the
+        render_report_cards management command.
+        """
+        term = request.data.get('term')
+        class_id = request.data.get('class_id')
+        
+        if not term or not class_id:
+            return Response(
+                {'error': 'term and class_id are required; use the render_report_cards command for the whole school'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        service = ReportCardRenderService()
+        try:
+            result = service.render(
+                term=str(term),
+                academic_year_id=request.data.get('academic_year_id'),
+                class_id=class_id,
+                workers=1,
+                force=str(request.data.get('force', '')).lower() == 'true',
+                weighted=str(request.data.get('weighted', '')).lower() == 'true'
+            )
+            return Response(result, status=status.HTTP_201_CREATED)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class GradingScaleViewSet(viewsets.ModelViewSet):
+    """ViewSet for GradingScale management"""
+    
+    queryset = GradingScale.objects.prefetch_related('bands').all()
+    serializer_class = GradingScaleSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_permissions(self):
+        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+            return [IsAuthenticated(), IsAdminOrHeadmaster()]
+        return [IsAuthenticated()]
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        
+        # Filter by academic year
+        academic_year_id = self.request.query_params.get('academic_year_id', None)
+        if academic_year_id:
+            queryset = queryset.filter(academic_year_id=academic_year_id)
+        
+        return queryset
+
+
+class AssessmentWeightingViewSet(viewsets.ModelViewSet):
+    """ViewSet for AssessmentWeighting management"""
+    
+    queryset = AssessmentWeighting.objects.all()
+    serializer_class = AssessmentWeightingSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_permissions(self):
+        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+            return [IsAuthenticated(), IsAdminOrHeadmaster()]
+        return [IsAuthenticated()]
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        
+        # Filter by academic year
+        academic_year_id = self.request.query_params.get('academic_year_id', None)
+        if academic_year_id:
+            queryset = queryset.filter(academic_year_id=academic_year_id)
+        
+        # Filter by subject
+        subject_id = self.request.query_params.get('subject_id', None)
+        if subject_id:
+            queryset = queryset.filter(subject_id=subject_id)
+        
+        return queryset
@@ -0,0 +1,19 @@
+from django.core.cache import cache
+
+
+SALARY_STRUCTURE_VERSION_KEY = 'staff:salary-structure-version'
+SALARY_STRUCTURE_CACHE_KEY = 'staff:salary-structures:{version}:{as_of}'
+SALARY_STRUCTURE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def salary_structure_version():
+    """Current cache version for resolved salary structures"""
+    return cache.get_or_set(SALARY_STRUCTURE_VERSION_KEY, 1, timeout=None)
+
+
+def bump_salary_structure_version():
+    """Invalidate every cached as-of salary structure resolution"""
+    try:
+        cache.incr(SALARY_STRUCTURE_VERSION_KEY)
+    except ValueError:
+        cache.set(SALARY_STRUCTURE_VERSION_KEY, 1, timeout=None)
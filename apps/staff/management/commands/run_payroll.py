@@ -0,0 +1,42 @@
+import logging
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from apps.staff.services import SalaryService
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Process salaries for every active staff member for a payment period"
+
+    def add_arguments(self, parser):
+        parser.add_argument('payment_period', help="Period label, e.g. 'January 2025'")
+        parser.add_argument('--processed-by', help="Username recorded as processing the payroll")
+        parser.add_argument('--dry-run', action='store_true', help="Report totals without creating payments")
+
+    def handle(self, *args, **options):
+        processed_by = None
+        if options['processed_by']:
+            try:
+                processed_by = get_user_model().objects.get(username=options['processed_by'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"User '{options['processed_by']}' not found")
+
+        try:
+            report = SalaryService().run_payroll(
+                payment_period=options['payment_period'],
+                processed_by=processed_by,
+                dry_run=options['dry_run']
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        message = (
+            f"Payroll {report['payment_period']}{' (dry run)' if report['dry_run'] else ''}: "
+            f"{report['staff_count']} staff, gross {report['total_gross']}, tax {report['total_tax']}, "
+            f"net {report['total_net']}; {len(report['already_processed'])} already processed, "
+            f"{len(report['missing_structure'])} without a salary structure"
+        )
+        logger.info(message)
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-17 06:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='salarystructure',
+            index=models.Index(fields=['effective_from', 'effective_to'], name='salary_stru_effecti_2ca60f_idx'),
+        ),
+    ]
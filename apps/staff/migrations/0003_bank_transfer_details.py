@@ -0,0 +1,44 @@
+# Generated by Django 6.0.1 on 2026-10-17 06:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0002_salarystructure_period_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salarypayment',
+            name='bank_batch_reference',
+            field=models.CharField(blank=True, help_text='Bank transfer file this payment was sent in', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='staff',
+            name='bank_account_name',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='staff',
+            name='bank_account_number',
+            field=models.CharField(blank=True, max_length=34),
+        ),
+        migrations.AddField(
+            model_name='staff',
+            name='bank_code',
+            field=models.CharField(blank=True, help_text='Bank/branch sort code or SWIFT', max_length=11),
+        ),
+        migrations.AddField(
+            model_name='staff',
+            name='bank_name',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='salarypayment',
+            index=models.Index(fields=['bank_batch_reference'], name='salary_paym_bank_ba_4006f3_idx'),
+        ),
+    ]
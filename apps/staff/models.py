@@ -1,6 +1,15 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
+from bisect import bisect_right
+from datetime import timedelta
 from apps.accounts.models import User
+from .cache import (
+    SALARY_STRUCTURE_CACHE_KEY, SALARY_STRUCTURE_CACHE_TIMEOUT,
+    salary_structure_version, bump_salary_structure_version
+)
 
 
 class Staff(models.Model):
@@ -56,6 +65,11 @@ class Staff(models.Model):
     )
     photo_url = models.URLField(blank=True, max_length=255)
     
+    bank_name = models.CharField(max_length=100, blank=True)
+    bank_code = models.CharField(max_length=11, blank=True, help_text="Bank/branch sort code or SWIFT")
+    bank_account_name = models.CharField(max_length=100, blank=True)
+    bank_account_number = models.CharField(max_length=34, blank=True)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -94,11 +108,146 @@ class SalaryStructure(models.Model):
         ordering = ['-effective_from']
         indexes = [
             models.Index(fields=['staff', 'effective_from']),
+            models.Index(fields=['effective_from', 'effective_to']),
         ]
     
     def __str__(self):
         return f"{self.staff.full_name} - {self.base_salary} (from {self.effective_from})"
     
+    def clean(self):
+        self.validate_period()
+    
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            # Serialize structure changes per staff member so overlap checks hold
+            Staff.objects.select_for_update().filter(pk=self.staff_id).first()
+            self.validate_period()
+            if self.pk is None:
+                # A new structure supersedes the open-ended one it follows
+                SalaryStructure.objects.filter(
+                    staff_id=self.staff_id,
+                    effective_to__isnull=True,
+                    effective_from__lt=self.effective_from
+                ).update(effective_to=self.effective_from - timedelta(days=1))
+            super().save(*args, **kwargs)
+            transaction.on_commit(bump_salary_structure_version)
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            transaction.on_commit(bump_salary_structure_version)
+        return result
+    
+    def validate_period(self):
+        """
+        Reject periods that would make as-of resolution ambiguous.
+        
+        An open-ended structure that starts before a new one is not a
+        conflict: save() closes it the day before the new one starts.
+        """
+        if self.effective_to and self.effective_to < self.effective_from:
+            raise ValidationError("effective_to cannot be before effective_from")
+        
+        overlapping = SalaryStructure.objects.filter(staff_id=self.staff_id).filter(
+            Q(effective_to__isnull=True) | Q(effective_to__gte=self.effective_from)
+        )
+        if self.effective_to:
+            overlapping = overlapping.filter(effective_from__lte=self.effective_to)
+        if self.pk is None:
+            overlapping = overlapping.exclude(effective_to__isnull=True, effective_from__lt=self.effective_from)
+        else:
+            overlapping = overlapping.exclude(pk=self.pk)
+        
+        conflict = overlapping.order_by('effective_from').first()
+        if conflict:
+            raise ValidationError(
+                f"Salary structure overlaps the one effective from {conflict.effective_from}"
+                f"{f' to {conflict.effective_to}' if conflict.effective_to else ''}"
+            )
+    
+    # Columns read when resolving, and cached as plain tuples
+    RESOLVE_FIELDS = (
+        'id', 'staff_id', 'base_salary', 'housing_allowance', 'transport_allowance',
+        'other_allowances', 'effective_from', 'effective_to'
+    )
+    
+    @classmethod
+    def resolve(cls, staff_ids, as_of, use_cache=True):
+        """
+        Salary structure in force on a date for each staff member.
+        
+        The whole school's resolution for a date is cached per date, as
+        RESOLVE_FIELDS tuples, and invalidated whenever a structure is
+        saved or deleted. The returned instances carry only those fields.
+        
+        Args:
+            staff_ids: Staff IDs to resolve, or None for everyone
+            as_of: Date to resolve at
+            use_cache: Read and fill the per-date cache
+        
+        Returns:
+            dict mapping staff_id to SalaryStructure
+        """
+        if not use_cache:
+            return cls.resolve_series(staff_ids, [as_of])[as_of]
+        
+        key = SALARY_STRUCTURE_CACHE_KEY.format(version=salary_structure_version(), as_of=as_of.isoformat())
+        rows = cache.get(key)
+        if rows is None:
+            rows = cls._resolve_rows(None, [as_of])[as_of]
+            cache.set(key, rows, SALARY_STRUCTURE_CACHE_TIMEOUT)
+        
+        if staff_ids is not None:
+            rows = {staff_id: rows[staff_id] for staff_id in set(staff_ids) if staff_id in rows}
+        return {staff_id: cls.from_db(None, cls.RESOLVE_FIELDS, row) for staff_id, row in rows.items()}
+    
+    @classmethod
+    def resolve_series(cls, staff_ids, dates):
+        """
+        Salary structures in force on each of several dates, in one query.
+        
+        Args:
+            staff_ids: Staff IDs to resolve, or None for everyone
+            dates: Iterable of dates
+        
+        Returns:
+            dict mapping each date to {staff_id: SalaryStructure}, the
+            instances carrying only RESOLVE_FIELDS
+        """
+        return {
+            as_of: {staff_id: cls.from_db(None, cls.RESOLVE_FIELDS, row) for staff_id, row in rows.items()}
+            for as_of, rows in cls._resolve_rows(staff_ids, dates).items()
+        }
+    
+    @classmethod
+    def _resolve_rows(cls, staff_ids, dates):
+        """{date: {staff_id: RESOLVE_FIELDS tuple}} from one values_list() query"""
+        dates = sorted(set(dates))
+        if not dates:
+            return {}
+        
+        structures = cls.objects.filter(effective_from__lte=dates[-1]).filter(
+            Q(effective_to__isnull=True) | Q(effective_to__gte=dates[0])
+        ).order_by('staff_id', 'effective_from', 'id')
+        if staff_ids is not None:
+            structures = structures.filter(staff_id__in=staff_ids)
+        
+        by_staff = {}
+        for row in structures.values_list(*cls.RESOLVE_FIELDS):
+            by_staff.setdefault(row[1], []).append(row)
+        
+        resolved = {as_of: {} for as_of in dates}
+        for staff_id, history in by_staff.items():
+            starts = [row[6] for row in history]
+            for as_of in dates:
+                position = bisect_right(starts, as_of) - 1
+                if position < 0:
+                    continue
+                row = history[position]
+                if row[7] is None or row[7] >= as_of:
+                    resolved[as_of][staff_id] = row
+        return resolved
+    
     @property
     def total_salary(self):
         return (
@@ -136,6 +285,11 @@ class SalaryPayment(models.Model):
     status = models.CharField(max_length=10, choices=PaymentStatus.choices, default=PaymentStatus.PENDING)
     processed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='processed_salaries')
     remarks = models.TextField(blank=True)
+    bank_batch_reference = models.CharField(
+        max_length=20,
+        blank=True,
+        help_text="Bank transfer file this payment was sent in"
+    )
     
     class Meta:
         db_table = 'salary_payments'
@@ -144,6 +298,7 @@ class SalaryPayment(models.Model):
         indexes = [
             models.Index(fields=['staff', 'payment_period']),
             models.Index(fields=['status']),
+            models.Index(fields=['bank_batch_reference']),
         ]
     
     def __str__(self):
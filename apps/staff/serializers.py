@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from django.core.exceptions import ValidationError as DjangoValidationError
 from .models import Staff, SalaryStructure, SalaryPayment, StaffAttendance, LeaveRequest
 from apps.accounts.serializers import UserSerializer
 
@@ -18,7 +19,8 @@ class StaffSerializer(serializers.ModelSerializer):
             'date_of_birth', 'phone_number', 'email', 'address',
             'gender', 'gender_display', 'staff_type', 'staff_type_display',
             'specialization', 'employment_date', 'national_id',
-            'health_info', 'photo_url', 'created_at', 'updated_at'
+            'health_info', 'photo_url', 'bank_name', 'bank_code',
+            'bank_account_name', 'bank_account_number', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
@@ -61,7 +63,8 @@ class StaffUpdateSerializer(serializers.ModelSerializer):
         fields = [
             'first_name', 'last_name', 'date_of_birth', 'phone_number',
             'email', 'address', 'gender', 'specialization',
-            'national_id', 'health_info', 'photo_url'
+            'national_id', 'health_info', 'photo_url', 'bank_name',
+            'bank_code', 'bank_account_name', 'bank_account_number'
         ]
 
 
@@ -79,6 +82,23 @@ class SalaryStructureSerializer(serializers.ModelSerializer):
             'total_salary', 'effective_from', 'effective_to'
         ]
         read_only_fields = ['id']
+    
+    def validate(self, attrs):
+        # Same overlap rules the model enforces on save
+        def value(field):
+            return attrs[field] if field in attrs else getattr(self.instance, field, None)
+        
+        structure = SalaryStructure(
+            pk=getattr(self.instance, 'pk', None),
+            staff=value('staff'),
+            effective_from=value('effective_from'),
+            effective_to=value('effective_to')
+        )
+        try:
+            structure.validate_period()
+        except DjangoValidationError as e:
+            raise serializers.ValidationError({'effective_from': e.messages})
+        return attrs
 
 
 class SalaryPaymentSerializer(serializers.ModelSerializer):
@@ -96,9 +116,9 @@ class SalaryPaymentSerializer(serializers.ModelSerializer):
             'base_salary', 'allowances', 'deductions', 'tax', 'net_salary',
             'payment_date', 'payment_method', 'payment_method_display',
             'status', 'status_display', 'processed_by', 'processed_by_username',
-            'remarks'
+            'remarks', 'bank_batch_reference'
         ]
-        read_only_fields = ['id']
+        read_only_fields = ['id', 'bank_batch_reference']
 
 
 class StaffAttendanceSerializer(serializers.ModelSerializer):
@@ -3,7 +3,11 @@ from django.core.exceptions import ValidationError
 from apps.accounts.models import User
 from apps.accounts.services import UserService
 from .models import Staff, SalaryStructure, SalaryPayment
-from datetime import datetime
+from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from django.db.models import Sum
+from django.utils import timezone
+import secrets
 
 
 class StaffService:
@@ -165,6 +169,127 @@ class StaffService:
 class SalaryService:
     """Service layer for salary operations"""
     
+    TAX_RATE = Decimal('0.10')
+    
+    @classmethod
+    def calculate_pay(cls, salary_structure):
+        """
+        Salary components for one month of a salary structure.
+        
+        Tax is a simplified flat rate of gross pay, rounded to cents.
+        
+        Returns:
+            dict with base_salary, allowances, gross_salary, tax, net_salary
+        """
+        base_salary = salary_structure.base_salary
+        allowances = (
+            salary_structure.housing_allowance +
+            salary_structure.transport_allowance +
+            salary_structure.other_allowances
+        )
+        gross_salary = base_salary + allowances
+        tax = (gross_salary * cls.TAX_RATE).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        
+        return {
+            'base_salary': base_salary,
+            'allowances': allowances,
+            'gross_salary': gross_salary,
+            'tax': tax,
+            'net_salary': gross_salary - tax,
+        }
+    
+    @staticmethod
+    def period_end_date(payment_period):
+        """Last day of a period like 'January 2025', raising ValueError if it cannot be parsed"""
+        try:
+            start = datetime.strptime(payment_period.strip(), '%B %Y').date()
+        except ValueError:
+            raise ValueError(f"Invalid payment period '{payment_period}', expected e.g. 'January 2025'")
+        next_month = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+        return next_month - timedelta(days=1)
+    
+    def run_payroll(self, payment_period, processed_by, dry_run=False):
+        """
+        Process salaries for every active staff member for a period.
+        
+        Staff already paid for the period are skipped, so the run can be
+        repeated safely; staff without an effective salary structure are
+        reported rather than failing the whole run. The staff rows are
+        locked for the run, so concurrent runs for the same staff wait and
+        then see each other's payments as already processed.
+        
+        Args:
+            payment_period: String like "January 2025"
+            processed_by: User running the payroll
+            dry_run: Compute and return totals without writing anything
+        
+        Returns:
+            dict with totals, per-staff lines and skipped staff
+        
+        Raises:
+            ValueError: if payment_period is not like "January 2025"
+        """
+        as_of = self.period_end_date(payment_period)
+        with transaction.atomic():
+            return self._run_payroll(payment_period, as_of, processed_by, dry_run)
+    
+    def _run_payroll(self, payment_period, as_of, processed_by, dry_run):
+        staff_members = Staff.objects.filter(user__is_active=True).order_by('last_name', 'first_name', 'id')
+        if not dry_run:
+            staff_members = staff_members.select_for_update(of=('self',))
+        staff_members = list(staff_members)
+        staff_ids = [staff.id for staff in staff_members]
+        
+        already_processed = set(SalaryPayment.objects.filter(
+            payment_period=payment_period,
+            staff_id__in=staff_ids
+        ).values_list('staff_id', flat=True))
+        structures = SalaryStructure.resolve(staff_ids, as_of)
+        
+        report = {
+            'payment_period': payment_period,
+            'as_of': as_of,
+            'dry_run': dry_run,
+            'staff_count': 0,
+            'total_gross': Decimal('0.00'),
+            'total_tax': Decimal('0.00'),
+            'total_net': Decimal('0.00'),
+            'lines': [],
+            'already_processed': [],
+            'missing_structure': [],
+        }
+        payments = []
+        for staff in staff_members:
+            if staff.id in already_processed:
+                report['already_processed'].append(staff.id)
+                continue
+            if staff.id not in structures:
+                report['missing_structure'].append(staff.id)
+                continue
+            
+            pay = self.calculate_pay(structures[staff.id])
+            report['staff_count'] += 1
+            report['total_gross'] += pay['gross_salary']
+            report['total_tax'] += pay['tax']
+            report['total_net'] += pay['net_salary']
+            report['lines'].append({'staff_id': staff.id, 'staff_name': staff.full_name, **pay})
+            payments.append(SalaryPayment(
+                staff=staff,
+                payment_period=payment_period,
+                base_salary=pay['base_salary'],
+                allowances=pay['allowances'],
+                deductions=0,
+                tax=pay['tax'],
+                net_salary=pay['net_salary'],
+                status=SalaryPayment.PaymentStatus.PENDING,
+                processed_by=processed_by
+            ))
+        
+        if not dry_run and payments:
+            SalaryPayment.objects.bulk_create(payments, batch_size=500)
+        
+        return report
+    
     @transaction.atomic
     def process_monthly_salary(self, staff_id, payment_period, processed_by):
         """
@@ -176,7 +301,8 @@ class SalaryService:
             processed_by: User who is processing the payment
         """
         try:
-            staff = Staff.objects.get(id=staff_id)
+            # Locked so a concurrent payroll run for the same staff waits
+            staff = Staff.objects.select_for_update().get(id=staff_id)
         except Staff.DoesNotExist:
             raise ValidationError("Staff not found")
         
@@ -184,45 +310,88 @@ class SalaryService:
         if SalaryPayment.objects.filter(staff=staff, payment_period=payment_period).exists():
             raise ValidationError(f"Salary already processed for {payment_period}")
         
-        # Get current salary structure
-        salary_structure = SalaryStructure.objects.filter(
-            staff=staff,
-            effective_from__lte=datetime.now().date()
-        ).order_by('-effective_from').first()
+        # Get the salary structure in force for the period
+        salary_structure = SalaryStructure.resolve([staff.id], self.period_end_date(payment_period)).get(staff.id)
         
         if not salary_structure:
             raise ValidationError("No salary structure found for this staff")
         
         # Calculate salary components
-        base_salary = salary_structure.base_salary
-        allowances = (
-            salary_structure.housing_allowance +
-            salary_structure.transport_allowance +
-            salary_structure.other_allowances
-        )
-        
-        # Calculate tax (simplified - 10% of gross)
-        gross_salary = base_salary + allowances
-        tax = gross_salary * 0.10
-        
-        # Calculate net salary
-        net_salary = gross_salary - tax
+        pay = self.calculate_pay(salary_structure)
         
         # Create salary payment record
         salary_payment = SalaryPayment.objects.create(
             staff=staff,
             payment_period=payment_period,
-            base_salary=base_salary,
-            allowances=allowances,
+            base_salary=pay['base_salary'],
+            allowances=pay['allowances'],
             deductions=0,
-            tax=tax,
-            net_salary=net_salary,
+            tax=pay['tax'],
+            net_salary=pay['net_salary'],
             status=SalaryPayment.PaymentStatus.PENDING,
             processed_by=processed_by
         )
         
         return salary_payment
     
+    @transaction.atomic
+    def create_bank_batch(self, payment_period):
+        """
+        Assign every pending, unbatched payment for a period to a new bank batch.
+        
+        Staff without a bank account number are left out of the batch.
+        
+        Returns:
+            dict with batch_reference, count, total and excluded count
+        """
+        pending = SalaryPayment.objects.filter(
+            payment_period=payment_period,
+            status=SalaryPayment.PaymentStatus.PENDING,
+            bank_batch_reference=''
+        )
+        excluded = pending.filter(staff__bank_account_number='').count()
+        
+        batch_reference = f"SAL{timezone.now().strftime('%Y%m%d%H%M')}{secrets.token_hex(2).upper()}"
+        count = SalaryPayment.objects.filter(
+            id__in=pending.exclude(staff__bank_account_number='').values('id')
+        ).update(bank_batch_reference=batch_reference)
+        
+        if not count:
+            raise ValidationError(f"No pending salary payments with bank details for {payment_period}")
+        
+        return {
+            'batch_reference': batch_reference,
+            'payment_period': payment_period,
+            'count': count,
+            'total': self.batch_payments(batch_reference).aggregate(total=Sum('net_salary'))['total'],
+            'excluded_without_bank_details': excluded,
+        }
+    
+    @staticmethod
+    def batch_payments(batch_reference):
+        """Payments sent in a bank batch"""
+        return SalaryPayment.objects.filter(bank_batch_reference=batch_reference)
+    
+    def confirm_bank_batch(self, batch_reference, payment_date):
+        """
+        Mark a whole bank batch paid in one UPDATE once the bank confirms it.
+        
+        Returns:
+            Number of payments marked paid
+        """
+        updated = self.batch_payments(batch_reference).filter(
+            status=SalaryPayment.PaymentStatus.PENDING
+        ).update(
+            status=SalaryPayment.PaymentStatus.PAID,
+            payment_date=payment_date,
+            payment_method=SalaryPayment.PaymentMethod.BANK_TRANSFER
+        )
+        
+        if not updated and not self.batch_payments(batch_reference).exists():
+            raise ValidationError(f"Bank batch {batch_reference} not found")
+        
+        return updated
+    
     @transaction.atomic
     def mark_salary_as_paid(self, salary_payment_id, payment_date, payment_method):
         """Mark a salary payment as paid"""
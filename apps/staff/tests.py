@@ -1,3 +1,302 @@
+import csv
+import hashlib
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import QuerySet
 from django.test import TestCase
+from rest_framework.test import APIClient
+from apps.accounts.models import User
+from .bankfile import FIXED_WIDTH_DETAIL, HASH_TOTAL_MODULUS, bank_file_records
+from .cache import SALARY_STRUCTURE_CACHE_KEY, salary_structure_version
+from .models import Staff, SalaryStructure, SalaryPayment
+from .services import SalaryService
 
-# Create your tests here.
+
+class StaffTestCase(TestCase):
+    """Five teachers; the first four got a raise on 1 February 2025, the fifth has no salary structure"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='password', role='admin'
+        )
+        cls.staff = []
+        for number in range(1, 6):
+            user = User.objects.create_user(
+                username=f'teacher{number}', email=f'teacher{number}@example.com', password='password', role='teacher'
+            )
+            staff = Staff.objects.create(
+                user=user, first_name=f'Teacher{number}', last_name='Test', staff_type='teacher',
+                email=user.email, bank_name='Test Bank', bank_code='TB001',
+                bank_account_name=f'Teacher{number} Test', bank_account_number=f'00012345{number}'
+            )
+            if number < 5:
+                SalaryStructure.objects.create(
+                    staff=staff, base_salary=Decimal('1000.05'), housing_allowance=Decimal('100.00'),
+                    effective_from=date(2024, 1, 1), effective_to=date(2025, 1, 31)
+                )
+                SalaryStructure.objects.create(
+                    staff=staff, base_salary=Decimal('2000.05'), housing_allowance=Decimal('100.00'),
+                    effective_from=date(2025, 2, 1)
+                )
+            cls.staff.append(staff)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+
+class PayrollRunTests(StaffTestCase):
+
+    def test_run_uses_the_structure_in_force_at_period_end(self):
+        report = SalaryService().run_payroll('January 2025', self.admin)
+
+        self.assertEqual(report['as_of'], date(2025, 1, 31))
+        self.assertEqual(report['staff_count'], 4)
+        # 10% of 1100.05 rounds half up to 110.01
+        self.assertEqual(report['lines'][0]['tax'], Decimal('110.01'))
+        self.assertEqual(report['lines'][0]['net_salary'], Decimal('990.04'))
+        self.assertEqual(report['total_net'], Decimal('3960.16'))
+        self.assertEqual(report['missing_structure'], [self.staff[4].id])
+        self.assertEqual(SalaryPayment.objects.filter(payment_period='January 2025').count(), 4)
+
+        february = SalaryService().run_payroll('February 2025', self.admin, dry_run=True)
+        self.assertEqual(february['total_gross'], Decimal('8400.20'))
+
+    def test_dry_run_writes_nothing(self):
+        report = SalaryService().run_payroll('January 2025', self.admin, dry_run=True)
+
+        self.assertEqual(report['staff_count'], 4)
+        self.assertFalse(SalaryPayment.objects.exists())
+
+    def test_repeat_run_reports_staff_already_processed(self):
+        SalaryService().process_monthly_salary(self.staff[0].id, 'January 2025', self.admin)
+        first = SalaryService().run_payroll('January 2025', self.admin)
+
+        second = SalaryService().run_payroll('January 2025', self.admin)
+
+        self.assertEqual(first['already_processed'], [self.staff[0].id])
+        self.assertEqual(first['staff_count'], 3)
+        self.assertEqual(second['staff_count'], 0)
+        self.assertEqual(second['total_net'], Decimal('0.00'))
+        self.assertEqual(len(second['already_processed']), 4)
+        self.assertEqual(SalaryPayment.objects.count(), 4)
+
+    def test_inactive_staff_are_left_out(self):
+        User.objects.filter(id=self.staff[1].user_id).update(is_active=False)
+
+        report = SalaryService().run_payroll('January 2025', self.admin)
+
+        self.assertEqual(report['staff_count'], 3)
+
+    def test_staff_rows_are_locked_for_the_run(self):
+        with mock.patch.object(QuerySet, 'select_for_update', autospec=True, side_effect=lambda qs, **kwargs: qs) as lock:
+            SalaryService().run_payroll('January 2025', self.admin)
+            self.assertEqual(lock.call_args.kwargs, {'of': ('self',)})
+
+            lock.reset_mock()
+            SalaryService().run_payroll('February 2025', self.admin, dry_run=True)
+            lock.assert_not_called()
+
+    def test_single_salary_checks_for_an_existing_payment(self):
+        service = SalaryService()
+        payment = service.process_monthly_salary(self.staff[0].id, 'February 2025', self.admin)
+
+        self.assertEqual(payment.net_salary, Decimal('1890.04'))
+        with self.assertRaises(ValidationError):
+            service.process_monthly_salary(self.staff[0].id, 'February 2025', self.admin)
+        with self.assertRaises(ValidationError):
+            service.process_monthly_salary(self.staff[4].id, 'February 2025', self.admin)
+
+    def test_invalid_period_is_rejected(self):
+        with self.assertRaises(ValueError):
+            SalaryService().run_payroll('Janaury 2025', self.admin)
+        with self.assertRaises(CommandError):
+            call_command('run_payroll', 'Janaury 2025')
+
+        response = self.client.post('/salary-payments/run_payroll/', {'payment_period': 'Janaury 2025'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("expected e.g. 'January 2025'", response.data['error'])
+
+    def test_endpoint_and_command(self):
+        preview = self.client.post(
+            '/salary-payments/run_payroll/', {'payment_period': 'March 2025', 'dry_run': 'true'}, format='json'
+        )
+        run = self.client.post('/salary-payments/run_payroll/', {'payment_period': 'March 2025'}, format='json')
+        out = StringIO()
+        call_command('run_payroll', 'March 2025', stdout=out)
+
+        self.assertEqual(preview.status_code, 200)
+        self.assertEqual(run.status_code, 201)
+        self.assertEqual(run.data['total_net'], preview.data['total_net'])
+        self.assertIn("0 staff", out.getvalue())
+        self.assertIn("4 already processed, 1 without a salary structure", out.getvalue())
+
+
+class SalaryStructureResolutionTests(StaffTestCase):
+
+    def test_new_structure_closes_the_open_ended_one(self):
+        teacher = self.staff[4]
+        with self.captureOnCommitCallbacks(execute=True):
+            SalaryStructure.objects.create(staff=teacher, base_salary=Decimal('900.00'), effective_from=date(2024, 1, 1))
+            SalaryStructure.objects.create(staff=teacher, base_salary=Decimal('950.00'), effective_from=date(2025, 1, 1))
+
+        self.assertEqual(
+            list(SalaryStructure.objects.filter(staff=teacher).order_by('effective_from').values_list(
+                'effective_from', 'effective_to'
+            )),
+            [(date(2024, 1, 1), date(2024, 12, 31)), (date(2025, 1, 1), None)]
+        )
+
+    def test_overlapping_periods_are_rejected(self):
+        with self.assertRaisesMessage(ValidationError, "overlaps the one effective from 2024-01-01 to 2025-01-31"):
+            SalaryStructure.objects.create(
+                staff=self.staff[0], base_salary=Decimal('1.00'),
+                effective_from=date(2024, 6, 1), effective_to=date(2024, 7, 1)
+            )
+        with self.assertRaises(ValidationError):
+            SalaryStructure.objects.create(
+                staff=self.staff[0], base_salary=Decimal('1.00'),
+                effective_from=date(2025, 3, 1), effective_to=date(2025, 2, 1)
+            )
+
+        response = self.client.post('/salary-structures/', {
+            'staff': self.staff[1].id, 'base_salary': '5.00',
+            'effective_from': '2024-05-01', 'effective_to': '2024-06-01'
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_resolve_picks_the_structure_in_force(self):
+        resolved = SalaryStructure.resolve(None, date(2025, 1, 31))
+        later = SalaryStructure.resolve([self.staff[0].id], date(2025, 2, 1))
+
+        self.assertEqual(sorted(resolved), [staff.id for staff in self.staff[:4]])
+        self.assertEqual(resolved[self.staff[0].id].base_salary, Decimal('1000.05'))
+        self.assertEqual(list(later), [self.staff[0].id])
+        self.assertEqual(later[self.staff[0].id].base_salary, Decimal('2000.05'))
+        self.assertEqual(SalaryStructure.resolve(None, date(2023, 12, 31)), {})
+
+    def test_series_resolves_several_dates_in_one_query(self):
+        with self.assertNumQueries(1):
+            series = SalaryStructure.resolve_series(None, [date(2023, 12, 31), date(2025, 1, 31), date(2025, 2, 1)])
+
+        self.assertEqual(
+            {as_of: sorted({structure.base_salary for structure in resolved.values()}) for as_of, resolved in series.items()},
+            {date(2023, 12, 31): [], date(2025, 1, 31): [Decimal('1000.05')], date(2025, 2, 1): [Decimal('2000.05')]}
+        )
+
+    def test_cache_holds_value_tuples_and_is_invalidated_on_save(self):
+        SalaryStructure.resolve(None, date(2025, 1, 31))
+        with self.assertNumQueries(0):
+            resolved = SalaryStructure.resolve(None, date(2025, 1, 31))
+        self.assertEqual(resolved[self.staff[0].id].total_salary, Decimal('1100.05'))
+
+        cached = cache.get(SALARY_STRUCTURE_CACHE_KEY.format(version=salary_structure_version(), as_of='2025-01-31'))
+        self.assertEqual(len(cached), 4)
+        self.assertTrue(all(type(row) is tuple for row in cached.values()))
+
+        structure = SalaryStructure.objects.get(staff=self.staff[0], effective_from=date(2024, 1, 1))
+        structure.base_salary = Decimal('999.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            structure.save()
+
+        self.assertEqual(
+            SalaryStructure.resolve([self.staff[0].id], date(2025, 1, 31))[self.staff[0].id].base_salary,
+            Decimal('999.00')
+        )
+
+    def test_as_of_endpoint(self):
+        response = self.client.get('/salary-structures/as_of/', {'dates': '2025-01-31,2025-03-01'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['date'], len(row['structures'])) for row in response.data],
+            [(date(2025, 1, 31), 4), (date(2025, 3, 1), 4)]
+        )
+
+
+class BankBatchTests(StaffTestCase):
+
+    def setUp(self):
+        super().setUp()
+        Staff.objects.filter(id=self.staff[3].id).update(bank_account_number='')
+        SalaryService().run_payroll('January 2025', self.admin)
+
+    def create_batch(self):
+        return self.client.post('/salary-payments/create_bank_batch/', {'payment_period': 'January 2025'}, format='json')
+
+    def download(self, batch_reference, file_format='csv'):
+        response = self.client.get(
+            '/salary-payments/bank_file/', {'batch_reference': batch_reference, 'file_format': file_format}
+        )
+        return b''.join(response.streaming_content).decode()
+
+    def test_batch_takes_pending_payments_with_bank_details(self):
+        response = self.create_batch()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(response.data['total'], Decimal('2970.12'))
+        self.assertEqual(response.data['excluded_without_bank_details'], 1)
+        # Nothing left to batch
+        self.assertEqual(self.create_batch().status_code, 400)
+
+    def test_csv_file_carries_control_totals(self):
+        batch_reference = self.create_batch().data['batch_reference']
+
+        rows = list(csv.reader(StringIO(self.download(batch_reference))))
+
+        self.assertEqual(rows[0][:2], ['H', batch_reference])
+        self.assertEqual([row[0] for row in rows], ['H', 'D', 'D', 'D', 'T'])
+        self.assertEqual(rows[1][1:6], ['1', '000123451', 'TB001', 'Teacher1 Test', '99004'])
+        trailer = rows[-1]
+        self.assertEqual(trailer[1:4], ['3', '297012', str(123451 + 123452 + 123453)])
+        digest = hashlib.sha256(b''.join('|'.join(row[1:]).encode() for row in rows[1:-1])).hexdigest()
+        self.assertEqual(trailer[4], digest)
+
+    def test_fixed_width_file(self):
+        batch_reference = self.create_batch().data['batch_reference']
+
+        lines = self.download(batch_reference, 'fixed').split('\r\n')[:-1]
+
+        self.assertEqual([len(line) for line in lines[1:4]], [sum(width for width, _ in FIXED_WIDTH_DETAIL)] * 3)
+        self.assertTrue(lines[1].startswith('D000001000123451'))
+        self.assertEqual(lines[-1][:25], 'T000003000000000000297012')
+
+    def test_hash_total_wraps_and_ignores_separators(self):
+        rows = [
+            (1, '99-9999999999999999999', 'B', 'A', 'F', 'L', Decimal('1.00')),
+            (2, '2', 'B', '', 'F', 'L', Decimal('0.50')),
+        ]
+
+        records = list(bank_file_records('REF', 'January 2025', rows))
+
+        self.assertEqual(records[1][1][3], 'A')
+        self.assertEqual(records[2][1][3], 'F L')
+        self.assertEqual(records[-1][1][:3], [2, 150, (999999999999999999999 + 2) % HASH_TOTAL_MODULUS])
+
+    def test_confirming_a_batch_marks_every_payment_paid(self):
+        batch_reference = self.create_batch().data['batch_reference']
+
+        response = self.client.post('/salary-payments/confirm_bank_batch/', {
+            'batch_reference': batch_reference, 'payment_date': '2025-01-31'
+        }, format='json')
+
+        self.assertEqual(response.data['marked_paid'], 3)
+        self.assertEqual(
+            SalaryPayment.objects.filter(status=SalaryPayment.PaymentStatus.PAID, payment_date=date(2025, 1, 31)).count(), 3
+        )
+        self.assertEqual(SalaryPayment.objects.filter(status=SalaryPayment.PaymentStatus.PENDING).count(), 1)
+
+    def test_unknown_batch(self):
+        self.assertEqual(self.client.get('/salary-payments/bank_file/', {'batch_reference': 'NOPE'}).status_code, 404)
+        self.assertEqual(self.client.post('/salary-payments/confirm_bank_batch/', {
+            'batch_reference': 'NOPE', 'payment_date': '2025-01-31'
+        }, format='json').status_code, 400)
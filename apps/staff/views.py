@@ -3,6 +3,8 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.db.models import Q
+from datetime import datetime
+from decimal import Decimal
 from .models import Staff, SalaryStructure, SalaryPayment, StaffAttendance, LeaveRequest
 from .serializers import (
     StaffSerializer, StaffCreateSerializer, StaffUpdateSerializer,
@@ -10,7 +12,9 @@ from .serializers import (
     StaffAttendanceSerializer, LeaveRequestSerializer, LeaveApprovalSerializer
 )
 from .services import StaffService, SalaryService
+from .bankfile import bank_file_response
 from apps.accounts.permissions import CanManageStaff, IsAdminOrHeadmaster
+from apps.accounts.idempotency import idempotent
 
 
 class StaffViewSet(viewsets.ModelViewSet):
@@ -174,6 +178,56 @@ class SalaryStructureViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(staff_id=staff_id)
         
         return queryset
+    
+    @action(detail=False, methods=['get'])
+    def as_of(self, request):
+        """Salary structures in force on one date (date) or several (dates, comma-separated)"""
+        raw_dates = request.query_params.get('dates') or request.query_params.get('date') or ''
+        staff_ids = request.query_params.get('staff_ids')
+        
+        try:
+            dates = sorted({datetime.strptime(value.strip(), '%Y-%m-%d').date() for value in raw_dates.split(',') if value.strip()})
+            staff_ids = [int(value) for value in staff_ids.split(',') if value.strip()] if staff_ids else None
+        except ValueError:
+            return Response(
+                {'error': 'dates must be YYYY-MM-DD and staff_ids must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if not dates:
+            return Response(
+                {'error': 'date or dates is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(dates) > 366:
+            return Response(
+                {'error': 'At most 366 dates can be resolved at once'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if len(dates) == 1:
+            resolved = {dates[0]: SalaryStructure.resolve(staff_ids, dates[0])}
+        else:
+            resolved = SalaryStructure.resolve_series(staff_ids, dates)
+        
+        # Resolved structures carry only their own columns; attach staff in one query
+        staff = Staff.objects.in_bulk({
+            structure.staff_id for structures in resolved.values() for structure in structures.values()
+        })
+        for structures in resolved.values():
+            for structure in structures.values():
+                structure.staff = staff[structure.staff_id]
+        
+        return Response([
+            {
+                'date': as_of,
+                'total_salary': sum((structure.total_salary for structure in structures.values()), Decimal('0.00')),
+                'structures': SalaryStructureSerializer(
+                    sorted(structures.values(), key=lambda structure: structure.staff_id), many=True
+                ).data,
+            }
+            for as_of, structures in resolved.items()
+        ])
 
 
 class SalaryPaymentViewSet(viewsets.ModelViewSet):
@@ -204,6 +258,7 @@ class SalaryPaymentViewSet(viewsets.ModelViewSet):
         return queryset
     
     @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated, IsAdminOrHeadmaster])
+    @idempotent('salaries.process')
     def process_salary(self, request):
         """Process monthly salary for a staff member"""
         staff_id = request.data.get('staff_id')
@@ -228,6 +283,95 @@ class SalaryPaymentViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated, IsAdminOrHeadmaster])
+    @idempotent('salaries.run_payroll')
+    def run_payroll(self, request):
+        """Process salaries for all active staff for a period (dry_run to preview)"""
+        payment_period = request.data.get('payment_period')
+        dry_run = str(request.data.get('dry_run', '')).lower() == 'true'
+        
+        if not payment_period:
+            return Response(
+                {'error': 'payment_period is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        service = SalaryService()
+        try:
+            report = service.run_payroll(
+                payment_period=payment_period,
+                processed_by=request.user,
+                dry_run=dry_run
+            )
+            return Response(report, status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated, IsAdminOrHeadmaster])
+    @idempotent('salaries.bank_batch')
+    def create_bank_batch(self, request):
+        """Group a period's pending salary payments into a bank transfer batch"""
+        payment_period = request.data.get('payment_period')
+        
+        if not payment_period:
+            return Response(
+                {'error': 'payment_period is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        service = SalaryService()
+        try:
+            batch = service.create_bank_batch(payment_period)
+            return Response(batch, status=status.HTTP_201_CREATED)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated, IsAdminOrHeadmaster])
+    def bank_file(self, request):
+        """Stream a bank batch as a CSV or fixed-width transfer file"""
+        batch_reference = request.query_params.get('batch_reference')
+        file_format = request.query_params.get('file_format', 'csv')
+        
+        if not batch_reference:
+            return Response(
+                {'error': 'batch_reference is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if file_format not in ['csv', 'fixed']:
+            return Response(
+                {'error': 'file_format must be csv or fixed'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        payments = SalaryService.batch_payments(batch_reference)
+        payment_period = payments.values_list('payment_period', flat=True).first()
+        if payment_period is None:
+            return Response(
+                {'error': f'Bank batch {batch_reference} not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        return bank_file_response(payments, batch_reference, payment_period, file_format)
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated, IsAdminOrHeadmaster])
+    def confirm_bank_batch(self, request):
+        """Mark every payment in a bank batch as paid"""
+        batch_reference = request.data.get('batch_reference')
+        payment_date = request.data.get('payment_date')
+        
+        if not batch_reference or not payment_date:
+            return Response(
+                {'error': 'batch_reference and payment_date are required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        service = SalaryService()
+        try:
+            updated = service.confirm_bank_batch(batch_reference, payment_date)
+            return Response({'batch_reference': batch_reference, 'marked_paid': updated})
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, IsAdminOrHeadmaster])
     def mark_as_paid(self, request, pk=None):
         """Mark salary payment as paid"""
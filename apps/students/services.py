@@ -191,7 +191,6 @@ class StudentService:
             student = Student.objects.prefetch_related(
                 'parent_links__parent',
                 'enrollments__class_obj',
-                'grades',
                 'attendance_records'
             ).get(id=student_id)
             
@@ -3,13 +3,14 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.db.models import Q
+from datetime import datetime
 from .models import Student, Parent, StudentParent
 from .serializers import (
     StudentSerializer, StudentCreateSerializer, StudentUpdateSerializer,
     ParentSerializer, StudentParentSerializer, StudentDetailSerializer
 )
 from .services import StudentService, ParentService
-from apps.accounts.permissions import CanManageStudents
+from apps.accounts.permissions import CanManageStudents, CanManageFinance
 
 
 class StudentViewSet(viewsets.ModelViewSet):
@@ -152,6 +153,7 @@ class StudentViewSet(viewsets.ModelViewSet):
         try:
             details = service.get_student_with_details(student.id)
             
+            from apps.grades.models import Grade
             from apps.grades.serializers import GradeSerializer
             from apps.attendance.serializers import AttendanceSerializer
             from apps.academic.serializers import EnrollmentSerializer
@@ -160,12 +162,43 @@ class StudentViewSet(viewsets.ModelViewSet):
                 'student': StudentSerializer(details['student']).data,
                 'parents': ParentSerializer(details['parents'], many=True).data,
                 'current_enrollment': EnrollmentSerializer(details['current_enrollment']).data if details['current_enrollment'] else None,
-                'recent_grades': GradeSerializer(details['grades'][:10], many=True).data,
+                'recent_grades': GradeSerializer(
+                    Grade.with_letters(details['grades'].select_related('subject'))[:10], many=True
+                ).data,
                 'recent_attendance': AttendanceSerializer(details['attendance'][:30], many=True).data,
             })
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated, CanManageFinance])
+    def statement(self, request, pk=None):
+        """Account statement of invoices and payments with running balance"""
+        student = self.get_object()
+        
+        try:
+            start_date = request.query_params.get('start_date')
+            end_date = request.query_params.get('end_date')
+            start_date = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None
+            end_date = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+        except ValueError:
+            return Response(
+                {'error': 'start_date and end_date must be dates in YYYY-MM-DD format'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        from apps.finance.services import StudentStatementService
+        compact = request.query_params.get('compact', '').lower() == 'true'
+        statement = StudentStatementService().statement(
+            student_id=student.id,
+            start_date=start_date,
+            end_date=end_date,
+            compact=compact
+        )
+        statement['admission_number'] = student.admission_number
+        statement['student_name'] = student.full_name
+        
+        return Response(statement)
 
 class ParentViewSet(viewsets.ModelViewSet):
     """ViewSet for Parent management"""
@@ -0,0 +1,162 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from datetime import date
+from django.db.models import Q
+from django.utils.http import parse_header_parameters
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a composite key.
+
+    Unlike DRF's CursorPagination, the cursor stores every ordering field,
+    including the unique tie-breaker, so a page is always a single range
+    scan with no OFFSET, however deep the client pages.
+    """
+
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    mode_value = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering):
+        self.ordering = tuple(ordering)
+        self.page_size = api_settings.PAGE_SIZE
+
+    @classmethod
+    def requested(cls, request):
+        """Whether the client opted in via ?pagination=cursor, a cursor or the Accept header"""
+        params = request.query_params
+        if params.get(cls.mode_query_param) == cls.mode_value or cls.cursor_query_param in params:
+            return True
+        accepted = getattr(request, 'accepted_media_type', None) or request.META.get('HTTP_ACCEPT', '')
+        for media_type in accepted.split(','):
+            _, media_params = parse_header_parameters(media_type)
+            if media_params.get(cls.mode_query_param) == cls.mode_value:
+                return True
+        return False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        reverse, position = self.decode_cursor(request)
+
+        ordering = [self._flip(field) for field in self.ordering] if reverse else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = position is not None, has_more
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(False, self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(True, self.page[0])
+
+    def encode_cursor(self, reverse, instance):
+        position = [self._serialize(self._value(instance, field)) for field in self.ordering]
+        token = json.dumps({'r': int(reverse), 'p': position}, separators=(',', ':'))
+        token = urlsafe_b64encode(token.encode()).decode()
+        url = remove_query_param(self.base_url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return False, None
+        try:
+            cursor = json.loads(urlsafe_b64decode(token.encode()).decode())
+            reverse, position = bool(cursor['r']), list(cursor['p'])
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return reverse, position
+
+    @staticmethod
+    def _after(ordering, position):
+        """Q matching rows strictly after position in the given ordering"""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def _value(instance, field):
+        field = instance._meta.get_field(field.lstrip('-'))
+        return getattr(instance, field.attname)
+
+    @staticmethod
+    def _serialize(value):
+        return value.isoformat() if isinstance(value, date) else value
+
+
+class OptionalKeysetPaginationMixin:
+    """
+    Lets clients opt into KeysetPagination on a viewset.
+
+    Page-number pagination stays the default; ?pagination=cursor or an
+    Accept parameter such as "application/json; pagination=cursor"
+    switches to keyset pages ordered by keyset_ordering.
+    """
+
+    keyset_ordering = ('-created_at', '-id')
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if self.pagination_class is None:
+                self._paginator = None
+            elif KeysetPagination.requested(self.request):
+                self._paginator = KeysetPagination(self.keyset_ordering)
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
@@ -1,6 +1,7 @@
 from pathlib import Path
 import os
 from decouple import config
+from corsheaders.defaults import default_headers
 from datetime import timedelta
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
@@ -160,6 +161,16 @@ SIMPLE_JWT = {
 # CORS
 CORS_ALLOWED_ORIGINS = config('CORS_ALLOWED_ORIGINS', default='http://localhost:3000').split(',')
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed']
+
+# Idempotency keys on money-moving POSTs
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+IDEMPOTENCY_IN_PROGRESS_TIMEOUT = timedelta(minutes=5)
+
+# Report card PDFs
+SCHOOL_NAME = config('SCHOOL_NAME', default='School Management System')
+REPORT_CARD_RENDER_WORKERS = config('REPORT_CARD_RENDER_WORKERS', default=os.cpu_count() or 1, cast=int)
 
 # CSRF
 CSRF_TRUSTED_ORIGINS = config('CSRF_TRUSTED_ORIGINS', default='http://localhost:8000').split(',')
@@ -17,7 +17,7 @@ from apps.academic.views import (
     AcademicYearViewSet, SubjectViewSet, ClassViewSet,
     EnrollmentViewSet, SubjectAssignmentViewSet
 )
-from apps.grades.views import GradeViewSet
+from apps.grades.views import GradeViewSet, GradingScaleViewSet, AssessmentWeightingViewSet
 from apps.attendance.views import AttendanceViewSet
 from apps.finance.views import (
     FeeStructureViewSet, InvoiceViewSet, PaymentViewSet,
@@ -44,6 +44,8 @@ router.register(r'classes', ClassViewSet, basename='class')
 router.register(r'enrollments', EnrollmentViewSet, basename='enrollment')
 router.register(r'subject-assignments', SubjectAssignmentViewSet, basename='subject-assignment')
 router.register(r'grades', GradeViewSet, basename='grade')
+router.register(r'grading-scales', GradingScaleViewSet, basename='grading-scale')
+router.register(r'assessment-weightings', AssessmentWeightingViewSet, basename='assessment-weighting')
 router.register(r'attendance', AttendanceViewSet, basename='attendance')
 router.register(r'fee-structures', FeeStructureViewSet, basename='fee-structure')
 router.register(r'invoices', InvoiceViewSet, basename='invoice')